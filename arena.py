@@ -0,0 +1,256 @@
+"""Headless arena running many games between players and reporting their results.
+
+Every pair of players meets ``--games`` times on each requested board geometry, alternating who plays first.
+Games can be spread over worker processes, and the report with win/draw/loss counts, confidence intervals,
+throughput and per-move latencies can be written as JSON and CSV.
+The process pool and the shared solution cache are only imported by the runs that use them.
+"""
+
+import argparse
+import csv
+from itertools import combinations
+import json
+import math
+import random
+import time
+
+from board import BOARD_TYPES, PLAYER_ONE, PLAYER_TWO
+import registry
+from registry import parse_player_options
+from tic_tac_toe import TicTacToe
+
+
+def play_single_game(task):
+    """Play the game described by ``task`` and return its outcome and move timings."""
+    random.seed(task['seed'])
+    if task['shared_memory'] is not None:
+        from solution_cache import use_shared_memory
+
+        use_shared_memory(task['shared_memory'])
+    rows, cols, connections_to_win = task['geometry']
+    game = TicTacToe(player_one=task['player_one'], player_two=task['player_two'], display_board=False,
+                     board_type=task['board_type'], rows=rows, cols=cols, connections_to_win=connections_to_win,
+                     gravity=task['gravity'], player_options=task['player_options'],
+                     time_budget_ms=task['time_budget_ms'])
+    winner = game.play_game()
+    return dict(task, winner=winner, move_times=game.move_times, over_budget=game.over_budget)
+
+
+def schedule_games(*, players, games, geometries, board_type='bitboard', seed=0, player_options=None,
+                   gravity=False, time_budget_ms=None, shared_memory=None):
+    """Build the list of games of a round robin between ``players``, alternating colours within each pairing."""
+    pairs = list(combinations(players, 2)) if len(players) > 1 else [(players[0], players[0])]
+    tasks = []
+    for geometry in geometries:
+        for first, second in pairs:
+            for game_number in range(games):
+                player_one, player_two = (first, second) if game_number % 2 == 0 else (second, first)
+                tasks.append({
+                    'pair': (first, second),
+                    'first_plays_one': game_number % 2 == 0,
+                    'player_one': player_one,
+                    'player_two': player_two,
+                    'geometry': tuple(geometry),
+                    'board_type': board_type,
+                    'gravity': gravity,
+                    'time_budget_ms': time_budget_ms,
+                    'shared_memory': shared_memory,
+                    'player_options': player_options or {},
+                    'seed': seed * 1000003 + len(tasks),
+                })
+    return tasks
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Return the Wilson score confidence interval for a binomial proportion."""
+    if not trials:
+        return 0.0, 1.0
+    proportion = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (proportion + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(proportion * (1 - proportion) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def percentile(sorted_values, fraction):
+    """Return the ``fraction`` percentile of an already sorted list, interpolating between neighbours."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarise(results, elapsed):
+    """Aggregate game results into per-pairing and per-player statistics."""
+    pairings = {}
+    player_stats = {}
+    for result in results:
+        first, second = result['pair']
+        key = (result['geometry'], first, second)
+        pairing = pairings.setdefault(key, {'first_wins': 0, 'draws': 0, 'second_wins': 0})
+        names = {PLAYER_ONE: result['player_one'], PLAYER_TWO: result['player_two']}
+        if result['winner'] is None:
+            pairing['draws'] += 1
+        elif (result['winner'] == PLAYER_ONE) == result['first_plays_one']:
+            pairing['first_wins'] += 1
+        else:
+            pairing['second_wins'] += 1
+
+        for position, name in names.items():
+            stats = player_stats.setdefault(name, {'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'over_budget': 0,
+                                                   'latencies': []})
+            stats['games'] += 1
+            if result['winner'] is None:
+                stats['draws'] += 1
+            elif result['winner'] == position:
+                stats['wins'] += 1
+            else:
+                stats['losses'] += 1
+        for position, seconds in result['move_times']:
+            player_stats[names[position]]['latencies'].append(seconds * 1000)
+        for position, _ in result['over_budget']:
+            player_stats[names[position]]['over_budget'] += 1
+
+    pairing_rows = []
+    for (geometry, first, second), counts in pairings.items():
+        games = counts['first_wins'] + counts['draws'] + counts['second_wins']
+        pairing_rows.append({
+            'geometry': 'x'.join(str(value) for value in geometry),
+            'player': first,
+            'opponent': second,
+            'games': games,
+            'wins': counts['first_wins'],
+            'draws': counts['draws'],
+            'losses': counts['second_wins'],
+            'win_rate_ci': wilson_interval(counts['first_wins'], games),
+            'draw_rate_ci': wilson_interval(counts['draws'], games),
+            'loss_rate_ci': wilson_interval(counts['second_wins'], games),
+        })
+
+    player_rows = []
+    for name, stats in sorted(player_stats.items()):
+        latencies = sorted(stats.pop('latencies'))
+        player_rows.append(dict(
+            stats,
+            player=name,
+            moves=len(latencies),
+            latency_ms={label: percentile(latencies, fraction)
+                        for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+        ))
+
+    return {
+        'games': len(results),
+        'elapsed_seconds': elapsed,
+        'games_per_second': len(results) / elapsed if elapsed > 0 else float('inf'),
+        'pairings': pairing_rows,
+        'players': player_rows,
+    }
+
+
+def run_arena(*, players, games, geometries, board_type='bitboard', workers=None, seed=0, player_options=None,
+              gravity=False, time_budget_ms=None, shared_cache=False, shared_capacity=2 ** 20):
+    """Run a round robin between ``players`` and return the summary produced by :func:`summarise`.
+
+    With ``shared_cache`` the players supporting it keep their solved positions in the process-wide solution
+    cache, backed by a shared memory table of ``shared_capacity`` slots that every worker reads and writes.
+    """
+    player_options = {name: dict(options) for name, options in (player_options or {}).items()}
+    table = None
+    if shared_cache:
+        for name in players:
+            if registry.player_accepts(name, 'shared_cache'):
+                player_options.setdefault(name, {}).setdefault('shared_cache', True)
+        from solution_cache import SharedSolutionTable, use_shared_memory
+
+        table = SharedSolutionTable.create(capacity=shared_capacity)
+    tasks = schedule_games(players=players, games=games, geometries=geometries, board_type=board_type, seed=seed,
+                           player_options=player_options, gravity=gravity, time_budget_ms=time_budget_ms,
+                           shared_memory=None if table is None else table.name)
+    start = time.perf_counter()
+    try:
+        if workers:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(play_single_game, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+        else:
+            results = [play_single_game(task) for task in tasks]
+    finally:
+        if table is not None:
+            use_shared_memory(None)
+            table.unlink()
+    return summarise(results, time.perf_counter() - start)
+
+
+def write_csv(report, path):
+    fields = ['geometry', 'player', 'opponent', 'games', 'wins', 'draws', 'losses',
+              'win_low', 'win_high', 'draw_low', 'draw_high', 'loss_low', 'loss_high']
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fields)
+        writer.writeheader()
+        for row in report['pairings']:
+            writer.writerow({
+                **{field: row[field] for field in fields[:7]},
+                'win_low': row['win_rate_ci'][0], 'win_high': row['win_rate_ci'][1],
+                'draw_low': row['draw_rate_ci'][0], 'draw_high': row['draw_rate_ci'][1],
+                'loss_low': row['loss_rate_ci'][0], 'loss_high': row['loss_rate_ci'][1],
+            })
+
+
+def print_report(report):
+    print(f"{'geometry':>8} {'player':>18} {'opponent':>18} {'W':>4} {'D':>4} {'L':>4}  win rate 95% CI")
+    for row in report['pairings']:
+        low, high = row['win_rate_ci']
+        print(f"{row['geometry']:>8} {row['player']:>18} {row['opponent']:>18} {row['wins']:>4} {row['draws']:>4} "
+              f"{row['losses']:>4}  [{low:.2f}, {high:.2f}]")
+    print()
+    print(f"{'player':>18} {'games':>6} {'W':>4} {'D':>4} {'L':>4} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+          f"{'over':>5}")
+    for row in report['players']:
+        latency = row['latency_ms']
+        print(f"{row['player']:>18} {row['games']:>6} {row['wins']:>4} {row['draws']:>4} {row['losses']:>4} "
+              f"{latency['p50']:>9.2f} {latency['p90']:>9.2f} {latency['p99']:>9.2f} {row['over_budget']:>5}")
+    print(f"\n{report['games']} games in {report['elapsed_seconds']:.2f}s ({report['games_per_second']:.1f} games/s)")
+
+
+def main():
+    automatic_players = registry.player_names(interactive=False)
+    parser = argparse.ArgumentParser(description='Run a headless Tic-Tac-Toe tournament')
+    parser.add_argument('--players', nargs='+', default=automatic_players,
+                        help=f"Players taking part (default: {' '.join(automatic_players)})")
+    parser.add_argument('--games', type=int, default=10, help='Games per pairing and geometry')
+    parser.add_argument('--geometry', action='append', default=None,
+                        help='rows,cols,connections_to_win (repeatable, default 3,3,3)')
+    parser.add_argument('--board-type', choices=BOARD_TYPES.keys(), default='bitboard')
+    parser.add_argument('--gravity', action='store_true', help='Play every geometry with Connect-Four rules')
+    parser.add_argument('--time-budget-ms', type=int, default=None,
+                        help='Per-move time budget handed to every player supporting it')
+    parser.add_argument('--shared-cache', action='store_true',
+                        help='Share solved positions between games and worker processes')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--option', action='append', default=[], metavar='NAME.OPTION=VALUE',
+                        help='Constructor option for a player type, e.g. mc_player.num_simulations=200')
+    parser.add_argument('--json', help='Write the full report to this JSON file')
+    parser.add_argument('--csv', help='Write the pairing table to this CSV file')
+    args = parser.parse_args()
+    for name in args.players:
+        if not registry.is_registered(name) or registry.is_interactive(name):
+            parser.error(f"unknown player {name!r}, expected one of {', '.join(automatic_players)}")
+
+    geometries = [tuple(int(value) for value in geometry.split(',')) for geometry in (args.geometry or ['3,3,3'])]
+    report = run_arena(players=args.players, games=args.games, geometries=geometries, board_type=args.board_type,
+                       workers=args.workers, seed=args.seed, player_options=parse_player_options(args.option),
+                       gravity=args.gravity, time_budget_ms=args.time_budget_ms, shared_cache=args.shared_cache)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+    if args.csv:
+        write_csv(report, args.csv)
+
+
+if __name__ == '__main__':
+    main()
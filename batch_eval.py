@@ -0,0 +1,108 @@
+"""Evaluate many positions of one board geometry in a single call.
+
+The positions are transposed into bit planes: for every cell, one Python integer holds a lane per position telling
+whether a player has a piece there. A line check is then a handful of big-integer ANDs and ORs covering every
+position at once, instead of one ``game_has_ended`` call per board, and the per-position work is limited to
+converting the input and output. Each lane is a byte, so planes convert to and from ``bytes`` without a loop.
+
+Cells are numbered ``col * rows + row`` like the masks of ``BitBoard`` and ``rollout.encode_position``, and the
+legal moves of a position are returned as such a mask.
+"""
+
+from itertools import chain
+
+from board import EMPTY_CELL, PLAYER_ONE, PLAYER_TWO, line_masks
+from rollout import encode_position
+
+_ASCII_BITS = bytes.maketrans(b'01', b'\x00\x01')
+_BITS_ASCII = bytes.maketrans(b'\x00\x01', b'01')
+
+
+def _lanes(flags):
+    """Turn ``bytes`` of 0/1 flags into a plane with one byte lane per flag."""
+    return int.from_bytes(flags, 'little')
+
+
+class BatchEvaluator(object):
+    """Terminal flags, winners and legal moves of many positions of a ``rows`` x ``cols`` board at once.
+
+    States are given like ``Board.board``, as ``cols`` lists of ``rows`` cell values, or as ``(mask_one, mask_two)``
+    pairs of player masks. The result is three lists with one item per state: whether the game has ended, the
+    winner (``EMPTY_CELL`` when there is none) and the mask of the cells a move can go to. As with
+    ``Board.available_moves()``, the legal moves of an ended game are its empty cells, and with ``gravity`` only
+    the lowest empty cell of every column.
+    """
+
+    def __init__(self, *, rows, cols, connections_to_win, gravity=False):
+        self.rows = rows
+        self.cols = cols
+        self.connections_to_win = connections_to_win
+        self.gravity = gravity
+        self.cells = rows * cols
+        _, all_lines = line_masks(rows, cols, connections_to_win)
+        self._lines = tuple(tuple(cell for cell in range(self.cells) if line >> cell & 1) for line in all_lines)
+        self._player_one_flags = bytes(value == PLAYER_ONE for value in range(256))
+        self._player_two_flags = bytes(value == PLAYER_TWO for value in range(256))
+        self._winner_values = bytes([EMPTY_CELL, PLAYER_ONE, PLAYER_TWO]) + bytes(253)
+
+    def evaluate(self, states):
+        """Evaluate a sequence of cell grids shaped ``(N, cols, rows)``."""
+        cells = bytes(chain.from_iterable(chain.from_iterable(states)))
+        count = len(cells) // self.cells
+        if count * self.cells != len(cells):
+            raise ValueError(f"Every state must have {self.cols} columns of {self.rows} cells")
+        return self._evaluate_flags(cells.translate(self._player_one_flags),
+                                    cells.translate(self._player_two_flags), count)
+
+    def evaluate_masks(self, masks):
+        """Evaluate a sequence of ``(mask_one, mask_two)`` pairs."""
+        masks = list(masks)
+        bits = f'0{self.cells}b'
+        # format() writes the highest cell first, so reversing the joined text puts the states in reverse order
+        ones = ''.join([format(mask_one, bits) for mask_one, _ in reversed(masks)])[::-1]
+        twos = ''.join([format(mask_two, bits) for _, mask_two in reversed(masks)])[::-1]
+        if len(ones) != len(masks) * self.cells or len(twos) != len(ones):
+            raise ValueError(f"Masks must only use the {self.cells} cells of the board")
+        return self._evaluate_flags(ones.encode().translate(_ASCII_BITS), twos.encode().translate(_ASCII_BITS),
+                                    len(masks))
+
+    def evaluate_boards(self, boards):
+        """Evaluate a sequence of ``Board`` objects of this geometry."""
+        return self.evaluate_masks([encode_position(board)[3:5] for board in boards])
+
+    def _evaluate_flags(self, ones, twos, count):
+        """Evaluate states given as per-cell 0/1 flags of each player, ``self.cells`` bytes per state."""
+        if not count:
+            return [], [], []
+        size = self.cells
+        all_lanes = _lanes(b'\x01' * count)
+        player_one = [_lanes(ones[cell::size]) for cell in range(size)]
+        player_two = [_lanes(twos[cell::size]) for cell in range(size)]
+        occupied = [one | two for one, two in zip(player_one, player_two)]
+
+        wins = []
+        for planes in (player_one, player_two):
+            won = 0
+            for line in self._lines:
+                present = all_lanes
+                for cell in line:
+                    present &= planes[cell]
+                won |= present
+            wins.append(won)
+        full = all_lanes
+        for plane in occupied:
+            full &= plane
+        win_one, win_two = wins
+        terminal = (win_one | win_two | full).to_bytes(count, 'little')
+        winners = (win_one | (win_two & ~win_one) << 1).to_bytes(count, 'little').translate(self._winner_values)
+
+        legal = bytearray(size * count)
+        for cell in range(size):
+            playable = all_lanes & ~occupied[cell]
+            if self.gravity and (cell + 1) % self.rows:
+                playable &= occupied[cell + 1]  # The cell below must be taken
+            legal[cell::size] = playable.to_bytes(count, 'little')
+        # Reversed, every state's flags read as a binary number with the highest cell first
+        legal = legal[::-1].translate(_BITS_ASCII)
+        legal_masks = [int(legal[start:start + size], 2) for start in range(size * (count - 1), -1, -size)]
+        return [flag == 1 for flag in terminal], list(winners), legal_masks
@@ -0,0 +1,104 @@
+"""Compare uniform and adaptive simulation allocation of the Monte Carlo player.
+
+Run with ``python benchmarks/bench_mc_allocation.py --positions 200 --simulations 500``. Random mid-game positions
+of 3x4 (3 to win) and 4x4 Connect-Four (3 to win) boards are solved exactly with ``solver.py``, and the player is
+asked for a move in each with ``allocation='uniform'`` and ``allocation='halving'`` at the same
+``num_simulations``. The table shows the rollouts spent per move and how often the move chosen is a
+game-theoretically best one, i.e. the playing strength of both settings.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import BitBoard
+from instrumentation import measure_move
+from players import MonteCarloPlayer
+import solver
+
+GEOMETRIES = ((3, 4, 3, False), (4, 4, 3, True))
+
+
+def best_moves(book, board):
+    """Return the moves reaching the best exact result, ignoring how fast."""
+    results = {}
+    for row, col in board.available_moves():
+        board.play_move(row=row, col=col)
+        board.next_player()
+        child_result, _ = solver.decode_book_value(book.get(board.zobrist_key()))
+        board.undo_move(row=row, col=col)
+        results[row, col] = -child_result
+    best = max(results.values())
+    return {move for move, result in results.items() if result == best}
+
+
+def sample_positions(book, rows, cols, connections_to_win, gravity, count, rng):
+    """Yield ``count`` random positions that are not over and where some move is worse than the best."""
+    while count:
+        board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+        for _ in range(rng.randrange(1, rows * cols - 3)):
+            row, col = board.random_move(rng)
+            board.play_move(row=row, col=col)
+            if board.game_has_ended()[0]:
+                break
+            board.next_player()
+        else:
+            best = best_moves(book, board)
+            if len(best) < len(board.available_moves()):
+                count -= 1
+                yield board, best
+
+
+def run(*, positions, simulations, seed):
+    rows_out = []
+    for rows, cols, connections_to_win, gravity in GEOMETRIES:
+        with tempfile.TemporaryDirectory() as work_dir:
+            book_path = os.path.join(work_dir, 'book.bin')
+            solver.solve(rows=rows, cols=cols, connections_to_win=connections_to_win, book_path=book_path,
+                         gravity=gravity)
+            book = solver.open_book(book_path, rows, cols, connections_to_win, gravity)
+            totals = {allocation: [0, 0] for allocation in MonteCarloPlayer.ALLOCATIONS}  # rollouts, best moves
+            rng = random.Random(seed)
+            samples = list(sample_positions(book, rows, cols, connections_to_win, gravity, positions, rng))
+            for number, (board, best) in enumerate(samples):
+                for allocation, total in totals.items():
+                    player = MonteCarloPlayer(position=board.current_player, num_simulations=simulations,
+                                              seed=seed * 100003 + number, allocation=allocation)
+                    with measure_move(player, board) as stats:
+                        move = player.play(board=board)
+                    total[0] += stats.rollouts
+                    total[1] += move in best
+            book.close()
+            solver.open_book.cache_clear()
+        name = f"{rows}x{cols}k{connections_to_win}{'g' if gravity else ''}"
+        for allocation, (rollouts, correct) in totals.items():
+            rows_out.append({'geometry': name, 'allocation': allocation, 'positions': len(samples),
+                             'rollouts_per_move': rollouts / len(samples), 'best_move_rate': correct / len(samples)})
+    return rows_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--positions', type=int, default=200, help='Positions per geometry')
+    parser.add_argument('--simulations', type=int, default=500, help='num_simulations of both players')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(positions=args.positions, simulations=args.simulations, seed=args.seed)
+    print(f"{'geometry':>8} {'allocation':>10} {'rollouts/move':>14} {'best move':>10}")
+    for row in results:
+        print(f"{row['geometry']:>8} {row['allocation']:>10} {row['rollouts_per_move']:>14.0f} "
+              f"{row['best_move_rate']:>10.1%}")
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
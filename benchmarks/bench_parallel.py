@@ -0,0 +1,55 @@
+"""Measure the scaling of parallel Monte Carlo rollouts from 1 to N worker processes.
+
+Run with ``python benchmarks/bench_parallel.py --max-workers 4``. Every worker count evaluates the same
+positions with the same seed, so all runs do identical work and return identical results.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import BitBoard
+from rollout import encode_position, get_pool, run_batches, shutdown_pools
+import utils
+
+
+def opening_positions(rows, cols, connections_to_win):
+    board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win)
+    positions = []
+    for row, col in utils.get_available_moves(board):
+        board.play_move(row=row, col=col)
+        board.next_player()
+        positions.append(encode_position(board))
+        board.undo_move(row=row, col=col)
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--rollouts', type=int, default=20000, help='Rollouts per candidate move')
+    parser.add_argument('--geometry', default='4,4,3', help='rows,cols,connections_to_win')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+    positions = opening_positions(*(int(v) for v in args.geometry.split(',')))
+
+    start = time.perf_counter()
+    reference = run_batches(positions, args.rollouts, seed=0, chunk_size=args.chunk_size)
+    baseline = time.perf_counter() - start
+    print(f"{'workers':>7} {'time s':>8} {'speedup':>8} {'efficiency':>10}")
+    print(f"{'inline':>7} {baseline:>8.3f} {1:>8.2f} {1:>10.2f}")
+    for workers in range(1, args.max_workers + 1):
+        get_pool(workers).submit(int).result()  # Start the pool outside the timed region
+        start = time.perf_counter()
+        results = run_batches(positions, args.rollouts, seed=0, chunk_size=args.chunk_size, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert results == reference
+        print(f"{workers:>7} {elapsed:>8.3f} {baseline / elapsed:>8.2f} {baseline / elapsed / workers:>10.2f}")
+    shutdown_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Reproducible performance benchmarks for the board operations and every player type.
+
+Run with ``python benchmarks/bench_suite.py --out results.json``. Board operations are reported as nanoseconds per
+call on 3x3, 4x4 and 7x6 boards, the players as nodes, iterations, rollouts or episodes per second, batch
+evaluation as positions per second, and the start-up of the command line as the milliseconds a scripted game
+between two random players takes from launching Python to exiting. Every benchmark is warmed up first and then
+sampled ``--repeats`` times with fixed seeds, and the JSON results hold the samples with their median, mean,
+standard deviation and extremes.
+
+``--baseline old.json`` compares the medians with an earlier run and exits with status 1 when a benchmark got
+worse by more than ``--threshold`` (a fraction, 0.1 by default).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from batch_eval import BatchEvaluator
+from board import BOARD_TYPES, BitBoard, PLAYER_ONE
+from instrumentation import measure_move
+from players import (AlphaBetaPlayer, DynamicProgrammingPlayer, MCTSPlayer, MonteCarloPlayer, SimpleMinimaxPlayer,
+                     TDLearningPlayer)
+import utils
+
+GEOMETRIES = ((3, 3, 3), (4, 4, 3), (6, 7, 4))
+BOARD_OPS = ('play_undo', 'game_has_ended', 'get_available_moves', 'zobrist_key')
+
+
+def midgame_board(board_cls, rows, cols, connections_to_win, seed):
+    """Return a board with about a third of its cells filled by random moves and no line completed."""
+    rng = random.Random(seed)
+    board = board_cls(rows=rows, cols=cols, connections_to_win=connections_to_win)
+    for _ in range(rows * cols // 3):
+        row, col = board.random_move(rng)
+        board.play_move(row=row, col=col)
+        if board.game_has_ended()[0]:
+            board.undo_move(row=row, col=col)
+            break
+        board.next_player()
+    return board
+
+
+def board_op(board, op):
+    """Return a function performing ``op`` once on ``board`` and leaving it unchanged."""
+    if op == 'play_undo':
+        row, col = board.available_moves()[0]
+
+        def play_undo():
+            board.play_move(row=row, col=col)
+            board.next_player()
+            board.undo_move(row=row, col=col)
+        return play_undo
+    if op == 'get_available_moves':
+        return lambda: utils.get_available_moves(board)
+    return getattr(board, op)
+
+
+def time_per_call(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def board_benchmarks(calls):
+    benchmarks = {}
+    for type_name, board_cls in sorted(BOARD_TYPES.items()):
+        for rows, cols, connections_to_win in GEOMETRIES:
+            for op in BOARD_OPS:
+                def sample(seed, board_cls=board_cls, geometry=(rows, cols, connections_to_win), op=op):
+                    function = board_op(midgame_board(board_cls, *geometry, seed), op)
+                    return time_per_call(function, calls)
+                benchmarks[f'board.{type_name}.{rows}x{cols}k{connections_to_win}.{op}'] = ('ns/op', False, sample)
+    return benchmarks
+
+
+def search_rate(make_player, counter, rows=3, cols=3, connections_to_win=3, opening=()):
+    """Return a sampler measuring ``counter`` per second over one ``play()`` call of a fresh player."""
+    def sample(seed):
+        random.seed(seed)
+        board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win)
+        for row, col in opening:
+            board.play_move(row=row, col=col)
+            board.next_player()
+        player = make_player(board.current_player, seed)
+        with measure_move(player, board) as stats:
+            player.play(board=board)
+        return getattr(stats, counter) / stats.seconds
+    return sample
+
+
+def td_rate(seed):
+    player = TDLearningPlayer(position=PLAYER_ONE, seed=seed)
+    start = time.perf_counter()
+    player.train(2000)
+    return 2000 / (time.perf_counter() - start)
+
+
+def player_benchmarks():
+    return {
+        'minimax.3x3.nodes_per_s': ('nodes/s', True, search_rate(
+            lambda position, seed: SimpleMinimaxPlayer(position=position), 'nodes', opening=((1, 1),))),
+        'dp.3x3.nodes_per_s': ('nodes/s', True, search_rate(
+            lambda position, seed: DynamicProgrammingPlayer(position=position), 'nodes')),
+        'dp.4x4k3.nodes_per_s': ('nodes/s', True, search_rate(
+            lambda position, seed: DynamicProgrammingPlayer(position=position), 'nodes', 4, 4, 3,
+            opening=((0, 0), (1, 1), (2, 2), (0, 3), (3, 0)))),
+        'alphabeta.4x4k3.nodes_per_s': ('nodes/s', True, search_rate(
+            lambda position, seed: AlphaBetaPlayer(position=position, max_depth=5, time_budget_ms=None),
+            'nodes', 4, 4, 3)),
+        'mcts.3x3.rollouts_per_s': ('rollouts/s', True, search_rate(
+            lambda position, seed: MCTSPlayer(position=position, iterations=5000), 'rollouts')),
+        'mc.board.3x3.rollouts_per_s': ('rollouts/s', True, search_rate(
+            lambda position, seed: MonteCarloPlayer(position=position, num_simulations=300), 'rollouts')),
+        'mc.batch.7x6k4.rollouts_per_s': ('rollouts/s', True, search_rate(
+            lambda position, seed: MonteCarloPlayer(position=position, num_simulations=500, seed=seed),
+            'rollouts', 6, 7, 4)),
+        'td.3x3.episodes_per_s': ('episodes/s', True, td_rate),
+    }
+
+
+def batch_rate(rows, cols, connections_to_win, count=2000):
+    """Return a sampler measuring positions per second evaluated by one ``BatchEvaluator.evaluate`` call."""
+    evaluator = BatchEvaluator(rows=rows, cols=cols, connections_to_win=connections_to_win)
+
+    def sample(seed):
+        states = [midgame_board(BitBoard, rows, cols, connections_to_win, seed * count + index).board
+                  for index in range(count)]
+        start = time.perf_counter()
+        evaluator.evaluate(states)
+        return count / (time.perf_counter() - start)
+    return sample
+
+
+def batch_benchmarks():
+    return {'batch.7x6k4.states_per_s': ('states/s', True, batch_rate(6, 7, 4))}
+
+
+def startup_time(seed):
+    """Return the milliseconds a ``tic_tac_toe.py`` game between two random players takes as a new process."""
+    command = [sys.executable, os.path.join(ROOT, 'tic_tac_toe.py'), '--player-one', 'random_player',
+               '--player-two', 'random_player']
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, env=dict(os.environ, PYTHONHASHSEED=str(seed)))
+    return (time.perf_counter() - start) * 1000
+
+
+def startup_benchmarks():
+    return {'cli.startup.random_game_ms': ('ms', False, startup_time)}
+
+
+def summarise(samples):
+    return {
+        'samples': samples,
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def run_suite(*, repeats=5, warmup=1, seed=0, calls=2000, select=None):
+    """Run the benchmarks whose name contains ``select`` (all by default) and return the JSON-ready results."""
+    benchmarks = dict(board_benchmarks(calls), **player_benchmarks(), **batch_benchmarks(), **startup_benchmarks())
+    results = {}
+    for name, (unit, higher_is_better, sample) in benchmarks.items():
+        if select and select not in name:
+            continue
+        for run in range(warmup):
+            sample(seed + run)
+        samples = [sample(seed + run) for run in range(repeats)]
+        results[name] = dict(summarise(samples), unit=unit, higher_is_better=higher_is_better)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'repeats': repeats,
+            'warmup': warmup,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.1):
+    """Compare the medians of two result sets; return rows ``(name, baseline, current, change, regressed)``.
+
+    ``change`` is the relative slowdown, positive when the current run is worse whatever the unit.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        before, after = old['median'], result['median']
+        change = (before - after) / before if result['higher_is_better'] else (after - before) / before
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+def print_results(report):
+    print(f"{'benchmark':<42} {'unit':>10} {'median':>12} {'stdev':>10}")
+    for name, result in report['results'].items():
+        print(f"{name:<42} {result['unit']:>10} {result['median']:>12.1f} {result['stdev']:>10.1f}")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'benchmark':<42} {'baseline':>12} {'current':>12} {'slowdown':>9}")
+    for name, before, after, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<42} {before:>12.1f} {after:>12.1f} {change:>+8.1%}{flag}")
+    regressions = sum(row[4] for row in rows)
+    print(f"\n{regressions} of {len(rows)} benchmarks slower than the baseline by more than {threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed slowdown before failing')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--calls', type=int, default=2000, help='Calls per board operation sample')
+    parser.add_argument('--select', help='Only run benchmarks whose name contains this text')
+    args = parser.parse_args()
+
+    report = run_suite(repeats=args.repeats, warmup=args.warmup, seed=args.seed, calls=args.calls,
+                       select=args.select)
+    print_results(report)
+    if args.out:
+        with open(args.out, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            rows = compare(report, json.load(json_file), args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
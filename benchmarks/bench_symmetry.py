@@ -0,0 +1,42 @@
+"""Compare DynamicProgrammingPlayer with and without symmetry-canonicalised state keys.
+
+Run with ``python benchmarks/bench_symmetry.py``; it solves each geometry from the empty board and reports the
+number of stored states and the solve time.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import BitBoard, PLAYER_ONE
+from players import DynamicProgrammingPlayer
+
+
+def solve(rows, cols, connections_to_win, use_symmetry):
+    board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win)
+    player = DynamicProgrammingPlayer(position=PLAYER_ONE, use_symmetry=use_symmetry)
+    start = time.perf_counter()
+    player.play(board=board)
+    return len(player.state_values), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--geometry', action='append', default=None,
+                        help='rows,cols,connections_to_win (repeatable, default 3,3,3 and 3,4,3)')
+    args = parser.parse_args()
+    geometries = [tuple(int(v) for v in g.split(',')) for g in (args.geometry or ['3,3,3', '3,4,3'])]
+
+    print(f"{'geometry':>10} {'states':>9} {'sym states':>10} {'ratio':>6} {'time s':>8} {'sym time s':>10}")
+    for rows, cols, connections_to_win in geometries:
+        states, elapsed = solve(rows, cols, connections_to_win, use_symmetry=False)
+        sym_states, sym_elapsed = solve(rows, cols, connections_to_win, use_symmetry=True)
+        print(f"{rows}x{cols}k{connections_to_win:<4} {states:>9} {sym_states:>10} {states / sym_states:>6.2f} "
+              f"{elapsed:>8.3f} {sym_elapsed:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
 """Board implementation for the console Tic-Tac-Toe game."""
 
+from functools import lru_cache
+import random
+
 PLAYER_ONE = 1
 PLAYER_TWO = 2
 EMPTY_CELL = 0
@@ -8,17 +11,138 @@ STR_MAPPING = {
     PLAYER_TWO: 'O',
     EMPTY_CELL: '-',
 }
+ZOBRIST_SEED = 0x5EED
+CELL_BITS = 2  # bits per cell in Board.state_code()
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(rows, cols):
+    """Random 64-bit keys per cell and cell value, plus per side to move, for a board geometry.
+
+    The keys come from a fixed seed so hashes are identical across processes.
+    """
+    rng = random.Random(ZOBRIST_SEED ^ (rows << 16) ^ cols)
+    cell_keys = tuple((0, rng.getrandbits(64), rng.getrandbits(64)) for _ in range(rows * cols))
+    side_keys = (0, 0, rng.getrandbits(64))
+    return cell_keys, side_keys
+
+
+@lru_cache(maxsize=None)
+def cell_moves(rows, cols):
+    """Return the ``(row, col)`` move of every cell index ``col * rows + row``, shared between boards."""
+    return tuple((row, col) for col in range(cols) for row in range(rows))
+
+
+def playable_cells(occupied, *, rows, cols, gravity=False):
+    """Return the cells a piece can go to, given the bit mask of occupied cells.
+
+    Without gravity these are all empty cells. With gravity pieces drop to the bottom (highest row) of their
+    column, so there is at most one playable cell per column, found from the column's height in O(cols).
+    """
+    if not gravity:
+        return [cell for cell in range(rows * cols) if not occupied >> cell & 1]
+    column_mask = (1 << rows) - 1
+    cells = []
+    for col in range(cols):
+        height = (occupied >> col * rows & column_mask).bit_count()
+        if height < rows:
+            cells.append(col * rows + rows - 1 - height)
+    return cells
+
+
+def code_width(rows, cols):
+    """Number of bytes :func:`pack_codes` uses for one ``Board.state_code()`` of a geometry."""
+    return (CELL_BITS * rows * cols + 1 + 7) // 8
+
+
+def pack_codes(codes, *, rows, cols):
+    """Pack state codes into ``bytes``, each one little endian in :func:`code_width` bytes."""
+    width = code_width(rows, cols)
+    return b''.join([code.to_bytes(width, 'little') for code in codes])
+
+
+def unpack_codes(data, *, rows, cols):
+    """Return the state codes packed by :func:`pack_codes` in a bytes-like object, e.g. ``bytes`` or an ``array``."""
+    width = code_width(rows, cols)
+    data = memoryview(data).cast('B')
+    if len(data) % width:
+        raise ValueError(f"Packed codes take {width} bytes each, got {len(data)} bytes")
+    return [int.from_bytes(data[start:start + width], 'little') for start in range(0, len(data), width)]
+
+
+def encode_boards(boards):
+    """Pack the positions of boards sharing one geometry into ``bytes``, for storage or sending to other processes."""
+    boards = list(boards)
+    if not boards:
+        return b''
+    return pack_codes([board.state_code() for board in boards], rows=boards[0].rows, cols=boards[0].cols)
+
+
+def decode_boards(data, *, rows, cols, connections_to_win, board_cls=None, gravity=False):
+    """Rebuild the boards packed by :func:`encode_boards`, as ``board_cls`` (``Board`` by default) objects."""
+    board_cls = Board if board_cls is None else board_cls
+    return [board_cls.from_code(code, rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+            for code in unpack_codes(data, rows=rows, cols=cols)]
+
+
+def _rebuild_board(board_cls, rows, cols, connections_to_win, cells, player_to_move, gravity):
+    return board_cls(rows=rows, cols=cols, connections_to_win=connections_to_win, board=cells,
+                     player_to_move=player_to_move, gravity=gravity)
 
 
 class Board(object):
-    """Represents the game board and handles move logic and win detection."""
+    """Represents the game board and handles move logic and win detection.
+
+    With ``gravity`` the board plays like Connect Four: a piece dropped in a column falls to the lowest empty row
+    (the last one printed), so the only legal move in a column is ``(board.drop_row(col), col)``.
+
+    ``board.board`` holds the cells as plain lists, one per column, for reading. Cells are changed with
+    :meth:`play_move`, :meth:`undo_move` or :meth:`set_cell`, which keep the Zobrist hash, state code, empty cells
+    and column heights up to date; writing to ``board.board`` directly is not supported.
+    """
 
-    def __init__(self, *, rows, cols, connections_to_win, board=None, player_to_move=PLAYER_ONE):
+    stats = None  # instrumentation.SearchStats counting game_has_ended calls, when enabled
+
+    def __init__(self, *, rows, cols, connections_to_win, board=None, player_to_move=PLAYER_ONE, gravity=False):
         self.rows = rows
         self.cols = cols
         self.connections_to_win = connections_to_win
+        self.gravity = gravity
         self.current_player = player_to_move
-        self.board = [[EMPTY_CELL] * self.rows for _ in range(self.cols)] if board is None else board
+        if board is None:
+            self.board = [[EMPTY_CELL] * self.rows for _ in range(self.cols)]
+        else:
+            self.board = [list(column) for column in board]
+        self._zobrist_cells, self._zobrist_side = zobrist_keys(rows, cols)
+        self.zobrist_hash = 0  # Hash of the cell contents, maintained on every cell change
+        self.cell_code = 0  # CELL_BITS bits per cell holding its value, maintained on every cell change
+        self._cell_moves = cell_moves(rows, cols)
+        # Empty cells in no particular order, with the position of every cell in that list (-1 when occupied)
+        self._empty_cells = []
+        self._empty_index = [-1] * (rows * cols)
+        self._heights = [0] * cols  # pieces per column
+        for col in range(self.cols):
+            for row in range(self.rows):
+                cell = col * self.rows + row
+                self.zobrist_hash ^= self._zobrist_cells[cell][self.board[col][row]]
+                self.cell_code |= self.board[col][row] << CELL_BITS * cell
+                if self.board[col][row] == EMPTY_CELL:
+                    self._empty_index[cell] = len(self._empty_cells)
+                    self._empty_cells.append(cell)
+                else:
+                    self._heights[col] += 1
+
+    @classmethod
+    def from_code(cls, code, *, rows, cols, connections_to_win, gravity=False):
+        """Build the board whose :meth:`state_code` is ``code``."""
+        cell_mask = (1 << CELL_BITS) - 1
+        cells = [[code >> 1 + CELL_BITS * (col * rows + row) & cell_mask for row in range(rows)]
+                 for col in range(cols)]
+        if code >> 1 + CELL_BITS * rows * cols or any(value not in STR_MAPPING for column in cells
+                                                      for value in column):
+            raise ValueError(f"{code} is not a state code of a {rows}x{cols} board")
+        return cls(rows=rows, cols=cols, connections_to_win=connections_to_win, board=cells,
+                   player_to_move=PLAYER_TWO if code & 1 else PLAYER_ONE, gravity=gravity)
 
     @staticmethod
     def _cell_to_str(cell):
@@ -34,6 +158,15 @@ class Board(object):
         res_str += 6 * ' ' + ' '.join(letters) + '\n'
         return res_str
 
+    def __reduce__(self):
+        # Rebuilt through the constructor, so the derived state matches the cells again after a copy or pickle
+        return _rebuild_board, (type(self), self.rows, self.cols, self.connections_to_win, self.board,
+                                self.current_player, self.gravity)
+
+    def __deepcopy__(self, memo):
+        rebuild, args = self.__reduce__()
+        return rebuild(*args)
+
     def __repr__(self):
         board_repr = f"{self.current_player}"
         for col in range(self.cols):
@@ -44,13 +177,123 @@ class Board(object):
         self.current_player = PLAYER_ONE if self.current_player == PLAYER_TWO else PLAYER_TWO
 
     def play_move(self, *, row, col):
-        self.board[col][row] = self.current_player
+        column = self.board[col]
+        player = self.current_player
+        if column[row] != EMPTY_CELL:
+            self._set_cell(col, row, player)
+            return
+        column[row] = player
+        cell = col * self.rows + row
+        self.zobrist_hash ^= self._zobrist_cells[cell][player]
+        self.cell_code |= player << CELL_BITS * cell
+        # Inlined _remove_empty, this runs for every move of every search
+        empty_cells = self._empty_cells
+        empty_index = self._empty_index
+        index = empty_index[cell]
+        last = empty_cells.pop()
+        if last != cell:
+            empty_cells[index] = last
+            empty_index[last] = index
+        empty_index[cell] = -1
+        self._heights[col] += 1
+
+    def undo_move(self, *, row, col):
+        """Take back the piece at ``(row, col)`` and give the move back to its owner."""
+        column = self.board[col]
+        owner = column[row]
+        if owner == EMPTY_CELL:
+            raise ValueError(f"Cannot undo a move at empty cell ({row}, {col})")
+        column[row] = EMPTY_CELL
+        cell = col * self.rows + row
+        self.zobrist_hash ^= self._zobrist_cells[cell][owner]
+        self.cell_code ^= owner << CELL_BITS * cell
+        self._empty_index[cell] = len(self._empty_cells)
+        self._empty_cells.append(cell)
+        self._heights[col] -= 1
+        self.current_player = owner
+
+    @property
+    def empty_cells(self):
+        """Live list of the empty cell indices ``col * rows + row``, in no particular order.
+
+        It is updated in place by every move, so copy it before playing moves while iterating over it.
+        """
+        return self._empty_cells
+
+    def drop_row(self, col):
+        """Row a piece dropped in ``col`` lands on in gravity mode, ``-1`` when the column is full."""
+        return self.rows - 1 - self._heights[col]
+
+    def available_moves(self):
+        """Return the legal moves as ``(row, col)`` pairs, column by column like ``utils.get_available_moves``.
+
+        With gravity this reads the column heights, one move per column that is not full.
+        """
+        if self.gravity:
+            rows = self.rows
+            return [(rows - 1 - height, col) for col, height in enumerate(self._heights) if height < rows]
+        moves = self._cell_moves
+        return [moves[cell] for cell in sorted(self._empty_cells)]
+
+    def random_move(self, rng=random):
+        """Return a uniformly random legal move, in O(1) without gravity and O(cols) with it."""
+        if self.gravity:
+            moves = self.available_moves()
+            return moves[int(rng.random() * len(moves))]
+        empty_cells = self._empty_cells
+        return self._cell_moves[empty_cells[int(rng.random() * len(empty_cells))]]
+
+    def _add_empty(self, cell):
+        self._empty_index[cell] = len(self._empty_cells)
+        self._empty_cells.append(cell)
+
+    def _remove_empty(self, cell):
+        empty_cells = self._empty_cells
+        index = self._empty_index[cell]
+        last = empty_cells.pop()
+        if last != cell:
+            empty_cells[index] = last
+            self._empty_index[last] = index
+        self._empty_index[cell] = -1
+
+    def zobrist_key(self):
+        """Return the Zobrist hash of the position, including the side to move."""
+        return self.zobrist_hash ^ self._zobrist_side[self.current_player]
+
+    def state_code(self):
+        """Return a compact integer identifying the position, updated in O(1) by every move.
+
+        The cell values take ``CELL_BITS`` bits each, above a lowest bit set when player two is to move. Unlike the
+        Zobrist key it never collides, and :meth:`from_code` rebuilds the board from it.
+        """
+        return self.cell_code << 1 | (self.current_player == PLAYER_TWO)
+
+    def set_cell(self, *, row, col, value):
+        """Put ``value`` in a cell, e.g. to set up a position, keeping the derived state up to date."""
+        self._set_cell(col, row, value)
+
+    def _set_cell(self, col, row, value):
+        column = self.board[col]
+        old_value = column[row]
+        cell = col * self.rows + row
+        keys = self._zobrist_cells[cell]
+        self.zobrist_hash ^= keys[old_value] ^ keys[value]
+        self.cell_code += (value - old_value) << CELL_BITS * cell
+        if old_value == EMPTY_CELL and value != EMPTY_CELL:
+            self._remove_empty(cell)
+            self._heights[col] += 1
+        elif old_value != EMPTY_CELL and value == EMPTY_CELL:
+            self._add_empty(cell)
+            self._heights[col] -= 1
+        column[row] = value
 
     def game_has_ended(self):
+        if self.stats is not None:
+            self.stats.end_checks += 1
         if (self._horizontal_check() or self._vertical_check() or self._diagonal_increasing_check() or
                 self._diagonal_decreasing_check()):
             return True, True
-        elif all([self.board[col][row] != EMPTY_CELL for col in range(self.cols) for row in range(self.rows)]):
+        elif not self._empty_cells:
             return True, False
         return False, False
 
@@ -88,6 +331,233 @@ class Board(object):
         return False
 
 
+
+@lru_cache(maxsize=None)
+def line_masks(rows, cols, connections_to_win):
+    """Precompute the winning line masks for a board geometry.
+
+    Cell ``(row, col)`` maps to bit ``col * rows + row``. Returns a tuple with, for every cell, the masks of
+    all lines passing through it, and the tuple of all distinct lines on the board.
+    """
+    directions = ((1, 0), (0, 1), (1, 1), (1, -1))  # (d_col, d_row)
+    cell_lines = [[] for _ in range(rows * cols)]
+    all_lines = []
+    for col in range(cols):
+        for row in range(rows):
+            for d_col, d_row in directions:
+                end_col = col + d_col * (connections_to_win - 1)
+                end_row = row + d_row * (connections_to_win - 1)
+                if not (0 <= end_col < cols and 0 <= end_row < rows):
+                    continue
+                cells = [(col + i * d_col) * rows + row + i * d_row for i in range(connections_to_win)]
+                mask = 0
+                for cell in cells:
+                    mask |= 1 << cell
+                all_lines.append(mask)
+                for cell in cells:
+                    cell_lines[cell].append(mask)
+    return tuple(tuple(lines) for lines in cell_lines), tuple(all_lines)
+
+
+class BitBoard(Board):
+    """Board keeping one bit mask per player for fast win detection.
+
+    Only the lines through the last played cell (the dropped piece in gravity mode) are checked after a move, and
+    an occupied-cell counter makes draw detection O(1). The ``board.board`` list-of-lists view stays available
+    for reading.
+    """
+
+    def __init__(self, *, rows, cols, connections_to_win, board=None, player_to_move=PLAYER_ONE, gravity=False):
+        super().__init__(rows=rows, cols=cols, connections_to_win=connections_to_win, board=board,
+                         player_to_move=player_to_move, gravity=gravity)
+        self._cell_lines, self._all_lines = line_masks(rows, cols, connections_to_win)
+        self._size = rows * cols
+        self._masks = [0, 0, 0]  # indexed by cell value, slot EMPTY_CELL unused
+        self._occupied = 0
+        self._pending_cell = None  # cell played since the last check, when _no_line was True
+        self._history = []  # (cell, _no_line, _pending_cell) before each play_move, for undo_move
+        for col in range(cols):
+            for row in range(rows):
+                value = self.board[col][row]
+                if value != EMPTY_CELL:
+                    self._masks[value] |= 1 << (col * rows + row)
+                    self._occupied += 1
+        self._no_line = not self._any_line()  # whether no line is complete, apart from those through _pending_cell
+
+    def play_move(self, *, row, col):
+        cell = col * self.rows + row
+        column = self.board[col]
+        if column[row] != EMPTY_CELL:
+            self._set_cell(col, row, self.current_player)
+            return
+        self._history.append((cell, self._no_line, self._pending_cell))
+        self._masks[self.current_player] |= 1 << cell
+        self._occupied += 1
+        self.zobrist_hash ^= self._zobrist_cells[cell][self.current_player]
+        self.cell_code |= self.current_player << CELL_BITS * cell
+        self._remove_empty(cell)
+        self._heights[col] += 1
+        column[row] = self.current_player
+        if self._no_line:
+            if self._pending_cell is not None:
+                self._check_pending()  # two moves without a check in between, settle the first one now
+            if self._no_line:
+                self._pending_cell = cell
+
+    def undo_move(self, *, row, col):
+        cell = col * self.rows + row
+        if not self._history or self._history[-1][0] != cell:
+            owner = self.board[col][row]
+            if owner == EMPTY_CELL:
+                raise ValueError(f"Cannot undo a move at empty cell ({row}, {col})")
+            self._set_cell(col, row, EMPTY_CELL)
+            self.current_player = owner
+            return
+        _, no_line, pending_cell = self._history.pop()
+        owner = self.board[col][row]
+        self._masks[owner] &= ~(1 << cell)
+        self._occupied -= 1
+        Board._set_cell(self, col, row, EMPTY_CELL)
+        self._no_line = no_line
+        self._pending_cell = pending_cell
+        self.current_player = owner
+
+    def _set_cell(self, col, row, value):
+        old_value = self.board[col][row]
+        if old_value == value:
+            return
+        self._history.clear()  # set_cell calls between play_move/undo_move pairs invalidate the saved flags
+        bit = 1 << (col * self.rows + row)
+        if old_value != EMPTY_CELL:
+            self._masks[old_value] &= ~bit
+            self._occupied -= 1
+        if value != EMPTY_CELL:
+            self._masks[value] |= bit
+            self._occupied += 1
+        super()._set_cell(col, row, value)
+        # Removing a piece from a position without lines cannot create one; anything else needs a rescan.
+        if value == EMPTY_CELL and self._no_line:
+            if self._pending_cell == col * self.rows + row:
+                self._pending_cell = None
+        else:
+            self._no_line = not self._any_line()
+            self._pending_cell = None
+
+    def game_has_ended(self):
+        if self.stats is not None:
+            self.stats.end_checks += 1
+        if self._pending_cell is not None:
+            self._check_pending()
+        if not self._no_line:
+            return True, True
+        elif self._occupied == self._size:
+            return True, False
+        return False, False
+
+    def _check_pending(self):
+        cell = self._pending_cell
+        self._pending_cell = None
+        mask = self._masks[PLAYER_ONE] if self._masks[PLAYER_ONE] >> cell & 1 else self._masks[PLAYER_TWO]
+        for line in self._cell_lines[cell]:
+            if mask & line == line:
+                self._no_line = False
+                return
+
+    def _any_line(self):
+        mask_one = self._masks[PLAYER_ONE]
+        mask_two = self._masks[PLAYER_TWO]
+        for line in self._all_lines:
+            if mask_one & line == line or mask_two & line == line:
+                return True
+        return False
+
+
+BOARD_TYPES = {
+    'list': Board,
+    'bitboard': BitBoard,
+}
+
+
+@lru_cache(maxsize=None)
+def symmetry_transforms(rows, cols, gravity=False):
+    """Return the symmetries of a board geometry as cell permutations.
+
+    Each transform is a tuple mapping cell ``col * rows + row`` to the cell it is moved to. Square boards have the
+    8 rotations and reflections of the square, rectangular boards the 4 that keep their shape. With gravity only
+    the left-right mirror keeps the game the same. The identity is always transform 0, the mirror transform 1.
+    """
+    if gravity:
+        return symmetry_transforms(rows, cols)[:2]
+
+    def cell(row, col):
+        return col * rows + row
+
+    last_row, last_col = rows - 1, cols - 1
+    mappings = [
+        lambda row, col: (row, col),
+        lambda row, col: (row, last_col - col),
+        lambda row, col: (last_row - row, col),
+        lambda row, col: (last_row - row, last_col - col),
+    ]
+    if rows == cols:
+        mappings += [
+            lambda row, col: (col, row),
+            lambda row, col: (col, last_row - row),
+            lambda row, col: (last_col - col, row),
+            lambda row, col: (last_col - col, last_row - row),
+        ]
+    return tuple(
+        tuple(cell(*mapping(row, col)) for col in range(cols) for row in range(rows))
+        for mapping in mappings
+    )
+
+
+@lru_cache(maxsize=None)
+def _inverse_transforms(rows, cols):
+    inverses = []
+    for transform in symmetry_transforms(rows, cols):
+        inverse = [0] * len(transform)
+        for cell, image in enumerate(transform):
+            inverse[image] = cell
+        inverses.append(tuple(inverse))
+    return tuple(inverses)
+
+
+def canonical_key(board):
+    """Return ``(key, transform)`` for the position up to the symmetries of the board.
+
+    The key is the smallest Zobrist key, side to move included, among all symmetric images of the position, so
+    equivalent positions share it. ``transform`` is the index of the symmetry mapping the board onto that image.
+    """
+    rows = board.rows
+    cell_keys = board._zobrist_cells
+    side_key = board._zobrist_side[board.current_player]
+    occupied = [(col * rows + row, value) for col, column in enumerate(board.board)
+                for row, value in enumerate(column) if value != EMPTY_CELL]
+    best_key, best_transform = None, 0
+    for index, transform in enumerate(symmetry_transforms(rows, board.cols, board.gravity)):
+        key = side_key
+        for cell, value in occupied:
+            key ^= cell_keys[transform[cell]][value]
+        if best_key is None or key < best_key:
+            best_key, best_transform = key, index
+    return best_key, best_transform
+
+
+def transform_move(move, transform, *, rows, cols):
+    """Map a ``(row, col)`` move through a transform returned by :func:`canonical_key`."""
+    row, col = move
+    image = symmetry_transforms(rows, cols)[transform][col * rows + row]
+    return image % rows, image // rows
+
+
+def inverse_transform_move(move, transform, *, rows, cols):
+    """Map a ``(row, col)`` move from the canonical image back onto the original board."""
+    row, col = move
+    cell = _inverse_transforms(rows, cols)[transform][col * rows + row]
+    return cell % rows, cell // rows
+
+
 if __name__ == '__main__':
     board = Board(rows=3, cols=4, connections_to_win=3)
     board.play_move(row=2, col=0)
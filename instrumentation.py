@@ -0,0 +1,57 @@
+"""Opt-in counters showing where a player spends its time.
+
+Players and boards carry a ``stats`` attribute that is ``None`` unless instrumentation is enabled. Hot paths read
+it once and only count behind an ``is not None`` test, so a disabled player pays one attribute check per node.
+:func:`measure_move` attaches a :class:`SearchStats` to a player and its board for one ``play()`` call and
+returns the per-move record that ``TicTacToe`` writes as JSON lines.
+"""
+
+from contextlib import contextmanager
+import time
+
+
+class SearchStats(object):
+    """Counters for one move.
+
+    * ``nodes``: positions visited by the search (tree nodes for MCTS, candidate afterstates for TD learning),
+    * ``end_checks``: ``game_has_ended`` calls on the game board,
+    * ``cache_hits`` / ``cache_misses``: transposition table and value store lookups,
+    * ``rollouts``: random playouts,
+    * ``expansions`` / ``children``: positions whose moves were generated and how many moves they had.
+    """
+
+    COUNTERS = ('nodes', 'end_checks', 'cache_hits', 'cache_misses', 'rollouts', 'expansions', 'children')
+
+    __slots__ = COUNTERS + ('seconds',)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for counter in self.COUNTERS:
+            setattr(self, counter, 0)
+        self.seconds = 0.0
+
+    @property
+    def branching_factor(self):
+        """Average number of moves of the expanded positions."""
+        return self.children / self.expansions if self.expansions else 0.0
+
+    def as_dict(self):
+        record = {counter: getattr(self, counter) for counter in self.COUNTERS}
+        record['branching_factor'] = self.branching_factor
+        record['seconds'] = self.seconds
+        return record
+
+
+@contextmanager
+def measure_move(player, board):
+    """Count and time the ``play()`` call made inside the block, yielding the :class:`SearchStats` it fills."""
+    stats = SearchStats()
+    player.stats = board.stats = stats
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        player.stats = board.stats = None
@@ -1,26 +1,36 @@
 """Collection of player strategies for the Tic-Tac-Toe game."""
 
+from array import array
 from copy import deepcopy
+from functools import lru_cache
+import math
 import random
-from board import Board, EMPTY_CELL
+import time
+from board import EMPTY_CELL, PLAYER_ONE, PLAYER_TWO, canonical_key, line_masks, playable_cells, symmetry_transforms
 import utils
 
+# Books, value stores, caches and rollout engines are imported where they are used, so that creating the simple
+# players only loads this module and the board
+
 
 class RandomPlayer(object):
     """Player that selects moves uniformly at random."""
 
+    stats = None
+
     def __init__(self, *, position):
         self.position = position
 
     @staticmethod
     def play(*, board):
-        available_actions = utils.get_available_moves(board)
-        return random.choice(available_actions)
+        return board.random_move()
 
 
 class HumanPlayer(object):
     """Interactive player that prompts a user for each move."""
 
+    stats = None
+
     def __init__(self, *, position):
         self.position = position
 
@@ -28,6 +38,17 @@ class HumanPlayer(object):
     def play(*, board):
         while True:
             try:
+                if board.gravity:
+                    # Only the column matters, the piece drops to the lowest empty row
+                    move = input("Enter the column to drop into (e.g. A): ").strip().upper()
+                    col = ord(move[0]) - ord('A')
+                    if not 0 <= col < board.cols:
+                        raise ValueError(move)
+                    row = board.drop_row(col)
+                    if row >= 0:
+                        return row, col
+                    print("Column is full. Try again please.")
+                    continue
                 # Ask the user for the input value
                 move = input("Enter your move (e.g. A1): ").strip().upper()
                 col = ord(move[0]) - ord('A')
@@ -40,14 +61,87 @@ class HumanPlayer(object):
                 print("Invalid input. Please try again.")
 
 
+class _SearchTimeout(Exception):
+    """Raised inside a search when its time or node budget has run out."""
+
+
+class _SearchBudget(object):
+    """Time and node limits of one move.
+
+    Searches call :meth:`spend` for every node (or batch of playouts). The clock is only read when the node count
+    crosses a multiple of ``check_interval``, so the check costs a counter update on most nodes.
+    """
+
+    def __init__(self, *, time_budget_ms=None, node_budget=None, check_interval=1024):
+        self.deadline = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000
+        self.node_budget = node_budget
+        self.check_interval = check_interval
+        self.nodes = 0
+        self.exhausted = False
+
+    @property
+    def remaining_nodes(self):
+        return None if self.node_budget is None else max(0, self.node_budget - self.nodes)
+
+    def spend(self, nodes=1):
+        """Count ``nodes`` more nodes and return whether the search may go on."""
+        before = self.nodes
+        self.nodes = before + nodes
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            self.exhausted = True
+        elif (self.deadline is not None and before // self.check_interval != self.nodes // self.check_interval
+                and time.perf_counter() > self.deadline):
+            self.exhausted = True
+        return not self.exhausted
+
+
+def _start_budget(player):
+    """Return the budget of a move for a player's ``time_budget_ms`` and ``node_budget``, or ``None``."""
+    if player.time_budget_ms is None and player.node_budget is None:
+        return None
+    return _SearchBudget(time_budget_ms=player.time_budget_ms, node_budget=player.node_budget,
+                         check_interval=player.check_interval)
+
+
 class SimpleMinimaxPlayer(object):
-    """Player that uses a depth-first minimax search to select moves."""
+    """Player that uses a depth-first minimax search to select moves.
+
+    ``book`` names an opening book written by ``solver.py``, consulted before searching. With ``time_budget_ms``
+    or ``node_budget`` the search stops when the budget runs out and plays the best of the moves fully searched
+    so far. With ``shared_cache`` the values of the positions searched are kept in the process-wide
+    ``solution_cache``, shared with the other players and games.
+    """
+
+    stats = None  # instrumentation.SearchStats, set while a move is being measured
 
-    def __init__(self, *, position, debug=False):
+    def __init__(self, *, position, debug=False, book=None, time_budget_ms=None, node_budget=None,
+                 check_interval=1024, shared_cache=False):
         self.position = position
         self.debug = debug
+        self.book = book
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget
+        self.check_interval = check_interval
+        self.shared_cache = shared_cache
+        self._budget = None
+        self._cache = None
+        self._sign = 1
 
     def play(self, *, board):
+        if self.book is not None:
+            from solver import book_move
+
+            move = book_move(self.book, board)
+            if move is not None:
+                return move
+
+        if self.shared_cache:
+            from solution_cache import solution_cache
+            from value_store import KEY_ZOBRIST
+
+            self._cache = solution_cache(rows=board.rows, cols=board.cols, connections_to_win=board.connections_to_win,
+                                         gravity=board.gravity, key_kind=KEY_ZOBRIST)
+            self._sign = 1 if board.current_player == PLAYER_ONE else -1
 
         # Minimax algorithm to choose the optimal move
         best_score = float('-inf')
@@ -58,13 +152,17 @@ class SimpleMinimaxPlayer(object):
         if self.debug:
             print("Evaluating moves:", available_moves)
 
+        self._budget = _start_budget(self)
         for row, col in available_moves:
             # Make the given move
             board.play_move(row=row, col=col)
             board.next_player()  # Switch player for minimax algorithm
-            score = self._minimax(board, is_maximizing=False, depth=1)  # Calculate score using minimax algorithm
-            board.board[col][row] = EMPTY_CELL  # Undo the move
-            board.next_player()  # Switch back to the original player
+            try:
+                score = self._minimax(board, is_maximizing=False, depth=1)  # Calculate score using minimax algorithm
+            except _SearchTimeout:
+                break  # Play the best move among those fully searched
+            finally:
+                board.undo_move(row=row, col=col)
             if self.debug:
                 print(f"Move {(row, col)} -> score {score}")
             if score > best_score:
@@ -74,10 +172,24 @@ class SimpleMinimaxPlayer(object):
         if self.debug:
             print(f"Selected move {best_move} with score {best_score}")
 
-
-        return best_move
+        return available_moves[0] if best_move is None else best_move
 
     def _minimax(self, board, is_maximizing, depth):
+        if self._budget is not None and not self._budget.spend():
+            raise _SearchTimeout()
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+        cache = self._cache
+        if cache is not None:
+            entry = cache.lookup(board.zobrist_key())
+            if stats is not None:
+                if entry is None:
+                    stats.cache_misses += 1
+                else:
+                    stats.cache_hits += 1
+            if entry is not None:
+                return entry[0] * self._sign
         # Check if the game has ended
         game_ended, there_is_winner = board.game_has_ended()
         if game_ended:
@@ -87,15 +199,19 @@ class SimpleMinimaxPlayer(object):
 
         available_moves = utils.get_available_moves(board)
         random.shuffle(available_moves)  # Shuffle moves to add some randomness
+        if stats is not None:
+            stats.expansions += 1
+            stats.children += len(available_moves)
         
         best_score = float('-inf') if is_maximizing else float('inf')
         for row, col in available_moves:
             # Make the given move
             board.play_move(row=row, col=col)
             board.next_player()  # Switch player for minimax algorithm
-            score = self._minimax(board, not is_maximizing, depth + 1)  # Calculate score using minimax algorithm
-            board.board[col][row] = EMPTY_CELL  # Undo the move
-            board.next_player()  # Switch back to the original player
+            try:
+                score = self._minimax(board, not is_maximizing, depth + 1)  # Calculate score using minimax algorithm
+            finally:
+                board.undo_move(row=row, col=col)
             if self.debug:
                 indent = '  ' * depth
                 role = 'Max' if is_maximizing else 'Min'
@@ -104,17 +220,102 @@ class SimpleMinimaxPlayer(object):
                 best_score = max(score, best_score)
             else:
                 best_score = min(score, best_score)
+        if cache is not None:
+            cache.store(board.zobrist_key(), best_score * self._sign, len(available_moves))
         return best_score
     
 
 class DynamicProgrammingPlayer(object):
-    """Minimax player with memoization of board states."""
+    """Minimax player with memoization of board states.
 
-    def __init__(self, *, position):
+    Values are memoized in a fixed-capacity transposition table keyed by the board's Zobrist hash, so memory
+    stays bounded on larger boards; ``replacement`` selects the table's replacement policy. The table is only
+    allocated when a position has to be solved, so a player answering from ``store`` or ``book`` starts at once.
+    With ``use_symmetry`` positions equivalent under a rotation or reflection of the board share a single entry.
+    Stored values are from player one's point of view, whichever side the player is on.
+
+    ``store`` names a file written by :meth:`save_values`; its values are looked up before searching, so a new
+    process can play at once without solving the game again. ``book`` names an opening book written by
+    ``solver.py``, consulted before anything else.
+
+    With ``time_budget_ms`` or ``node_budget`` the search stops when the budget runs out and plays the best of the
+    moves fully searched so far. Only completed subtrees are memoized, so the next move picks up the work.
+
+    With ``shared_cache`` the player memoizes into the process-wide ``solution_cache`` of the geometry instead of
+    a table of its own, so new games and other players start from the positions already solved.
+    """
+
+    stats = None  # instrumentation.SearchStats, set while a move is being measured
+
+    def __init__(self, *, position, table_capacity=2 ** 20, replacement='depth', use_symmetry=False, store=None,
+                 book=None, time_budget_ms=None, node_budget=None, check_interval=1024, shared_cache=False):
         self.position = position
-        self.state_values = {}
+        self.table_capacity = table_capacity
+        self.replacement = replacement
+        self.shared_cache = shared_cache
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget
+        self.check_interval = check_interval
+        self._budget = None
+        self.use_symmetry = use_symmetry
+        self.book = book
+        from transposition import TranspositionTable
+
+        if replacement not in TranspositionTable.REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy {replacement!r}, "
+                             f"expected one of {TranspositionTable.REPLACEMENT_POLICIES}")
+        # Created on the first position solved, or the geometry's solution_cache with shared_cache
+        self.state_values = None
+        self.store_path = store
+        self._store = None
+        self._geometry = None
+        self._sign = 1
+
+    def _key_kind(self):
+        from value_store import KEY_CANONICAL, KEY_ZOBRIST
+
+        return KEY_CANONICAL if self.use_symmetry else KEY_ZOBRIST
+
+    def save_values(self, path):
+        """Write the solved values to a value store file for the geometry last played on."""
+        if self._geometry is None:
+            raise ValueError("No values to save, the player has not played yet")
+        from value_store import write_store
+
+        rows, cols, connections_to_win, gravity = self._geometry
+        values = () if self.state_values is None else self.state_values.items()
+        write_store(path, values, rows=rows, cols=cols, connections_to_win=connections_to_win,
+                    key_kind=self._key_kind(), gravity=gravity)
 
     def play(self, *, board):
+        if self.book is not None:
+            from solver import book_move
+
+            move = book_move(self.book, board)
+            if move is not None:
+                return move
+        geometry = (board.rows, board.cols, board.connections_to_win, board.gravity)
+        if geometry != self._geometry:
+            if self.shared_cache:
+                from solution_cache import solution_cache
+
+                self.state_values = solution_cache(rows=board.rows, cols=board.cols,
+                                                   connections_to_win=board.connections_to_win,
+                                                   gravity=board.gravity, key_kind=self._key_kind(),
+                                                   capacity=self.table_capacity)
+            elif self.state_values is not None:
+                self.state_values.clear()
+            self._geometry = geometry
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+            if self.store_path is not None:
+                from value_store import ValueStore
+
+                self._store = ValueStore(self.store_path, rows=board.rows, cols=board.cols,
+                                         connections_to_win=board.connections_to_win, key_kind=self._key_kind(),
+                                         gravity=board.gravity)
+        self._sign = 1 if board.current_player == PLAYER_ONE else -1
 
         # Use dynamic programming to choose the optimal move
         best_score = float('-inf')
@@ -122,24 +323,45 @@ class DynamicProgrammingPlayer(object):
         available_moves = utils.get_available_moves(board)
         random.shuffle(available_moves)  # Shuffle moves to add some randomness
 
+        self._budget = _start_budget(self)
         for row, col in available_moves:
             # Make the given move
             board.play_move(row=row, col=col)
             board.next_player()  # Switch player for minimax algorithm
-            score = self._minimax_cached(board, is_maximizing=False)  # Calculate score using minimax algorithm
-            board.board[col][row] = EMPTY_CELL  # Undo the move
-            board.next_player()  # Switch back to the original player
+            try:
+                score = self._minimax_cached(board, is_maximizing=False)  # Calculate score using minimax algorithm
+            except _SearchTimeout:
+                break  # Play the best move among those fully searched
+            finally:
+                board.undo_move(row=row, col=col)
             if score > best_score:
                 best_score = score
                 best_move = (row, col)
 
-        return best_move
+        return available_moves[0] if best_move is None else best_move
     
     def _minimax_cached(self, board, is_maximizing):
-        state_key = repr(board)
-        if state_key not in self.state_values:
+        if self._budget is not None and not self._budget.spend():
+            raise _SearchTimeout()
+        stats = self.stats
+        state_key = canonical_key(board)[0] if self.use_symmetry else board.zobrist_key()
+        entry = None if self.state_values is None else self.state_values.lookup(state_key)
+        if entry is None and self._store is not None:
+            stored_value = self._store.get(state_key)
+            if stored_value is not None:
+                if stats is not None:
+                    stats.cache_hits += 1
+                return int(stored_value) * self._sign
+        if stats is not None:
+            stats.nodes += 1
+            if entry is None:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        if entry is None:
             # Check if the game has ended
             game_ended, there_is_winner = board.game_has_ended()
+            available_moves = []
             if game_ended:
                 if there_is_winner:
                     best_score = 1 if not is_maximizing else -1
@@ -148,75 +370,625 @@ class DynamicProgrammingPlayer(object):
             else:
                 available_moves = utils.get_available_moves(board)
                 random.shuffle(available_moves)  # Shuffle moves to add some randomness
+                if stats is not None:
+                    stats.expansions += 1
+                    stats.children += len(available_moves)
 
                 best_score = float('-inf') if is_maximizing else float('inf')
                 for row, col in available_moves:
                     # Make the given move
                     board.play_move(row=row, col=col)
                     board.next_player()  # Switch player for minimax algorithm
-                    score = self._minimax_cached(board, not is_maximizing)  # Calculate score using minimax algorithm
-                    board.board[col][row] = EMPTY_CELL  # Undo the move
-                    board.next_player()  # Switch back to the original player
+                    try:
+                        score = self._minimax_cached(board, not is_maximizing)  # Calculate score using minimax algorithm
+                    finally:
+                        board.undo_move(row=row, col=col)
                     
                     if is_maximizing:
                         best_score = max(score, best_score)
                     else:
                         best_score = min(score, best_score)
             
-            # Update state value dictionary
-            self.state_values[state_key] = best_score
+            # Update the transposition table, using the number of empty cells as the search depth
+            if self.state_values is None:
+                from transposition import TranspositionTable
+
+                self.state_values = TranspositionTable(capacity=self.table_capacity, replacement=self.replacement)
+            self.state_values.store(state_key, best_score * self._sign, len(available_moves))
+            return best_score
+
+        return entry[0] * self._sign
+
+
+class AlphaBetaPlayer(object):
+    """Negamax player with alpha-beta pruning, move ordering and iterative deepening.
+
+    Moves are tried killer moves first, then by history score, then closest to the centre. The search deepens
+    one ply at a time until the game is solved, ``max_depth`` is reached or ``time_budget_ms`` or ``node_budget``
+    runs out, in which case the best move of the last completed iteration is played. Positions at the depth cutoff
+    are scored by counting the lines each player can still complete. ``book`` names an opening book written by
+    ``solver.py``, consulted before searching.
+    """
+
+    WIN_SCORE = 1000000
+    stats = None  # instrumentation.SearchStats, set while a move is being measured
+
+    def __init__(self, *, position, max_depth=None, time_budget_ms=1000, node_budget=None, check_interval=1024,
+                 book=None):
+        self.position = position
+        self.book = book
+        self.max_depth = max_depth
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget
+        self.check_interval = check_interval
+        self.nodes = 0
+        self._budget = None
+        self._killers = {}
+        self._history = {}
+
+    def play(self, *, board):
+        if self.book is not None:
+            from solver import book_move
+
+            move = book_move(self.book, board)
+            if move is not None:
+                return move
+        available_moves = utils.get_available_moves(board)
+        centre_order = self._centre_order(board)
+        best_move = min(available_moves, key=centre_order.__getitem__)
+        # With gravity there are fewer moves than empty cells, and the game can last until every cell is taken
+        remaining = len(board.empty_cells)
+        max_depth = remaining if self.max_depth is None else min(self.max_depth, remaining)
+
+        self.nodes = 0
+        self._killers = {}
+        self._history = {}
+        self._budget = _start_budget(self)
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._search_root(board, depth, available_moves, best_move)
+            except _SearchTimeout:
+                break
+            best_move = move
+            if abs(score) > self.WIN_SCORE - remaining - 1:
+                break  # The game is solved from here, deeper searches cannot change the result
+
+        return best_move
+
+    def _search_root(self, board, depth, available_moves, previous_best):
+        alpha, beta = -self.WIN_SCORE - 1, self.WIN_SCORE + 1
+        best_score, best_move = None, previous_best
+        # Search the previous iteration's best move first, it is the most likely to cause cutoffs
+        ordered = [previous_best] + self._order_moves(board, [m for m in available_moves if m != previous_best], 0)
+        for row, col in ordered:
+            board.play_move(row=row, col=col)
+            board.next_player()
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            finally:
+                board.undo_move(row=row, col=col)
+            if best_score is None or score > best_score:
+                best_score, best_move = score, (row, col)
+            alpha = max(alpha, score)
+        return best_score, best_move
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+        if self._budget is not None and not self._budget.spend():
+            raise _SearchTimeout()
+
+        game_ended, there_is_winner = board.game_has_ended()
+        if game_ended:
+            # The previous move ended the game, so the side to move has lost or drawn
+            return -(self.WIN_SCORE - ply) if there_is_winner else 0
+        if depth == 0:
+            return self._evaluate(board)
+
+        best_score = -self.WIN_SCORE - 1
+        available_moves = utils.get_available_moves(board)
+        if stats is not None:
+            stats.expansions += 1
+            stats.children += len(available_moves)
+        for row, col in self._order_moves(board, available_moves, ply):
+            board.play_move(row=row, col=col)
+            board.next_player()
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.undo_move(row=row, col=col)
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._record_cutoff((row, col), depth, ply)
+                break
+        return best_score
+
+    def _record_cutoff(self, move, depth, ply):
+        killers = self._killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self._history[move] = self._history.get(move, 0) + depth * depth
+
+    def _order_moves(self, board, moves, ply):
+        killers = self._killers.get(ply, ())
+        centre_order = self._centre_order(board)
+        history = self._history
+        return sorted(moves, key=lambda move: (move not in killers, -history.get(move, 0), centre_order[move]))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _centre_order_for(rows, cols):
+        centre_row, centre_col = (rows - 1) / 2, (cols - 1) / 2
+        return {(row, col): abs(row - centre_row) + abs(col - centre_col)
+                for col in range(cols) for row in range(rows)}
+
+    def _centre_order(self, board):
+        return self._centre_order_for(board.rows, board.cols)
+
+    def _evaluate(self, board):
+        """Score a position for the side to move from the lines each player can still complete."""
+        masks = [0, 0, 0]
+        for col in range(board.cols):
+            column = board.board[col]
+            for row in range(board.rows):
+                masks[column[row]] |= 1 << (col * board.rows + row)
+        _, all_lines = line_masks(board.rows, board.cols, board.connections_to_win)
+        own = masks[board.current_player]
+        other = masks[PLAYER_ONE if board.current_player == PLAYER_TWO else PLAYER_TWO]
+        score = 0
+        for line in all_lines:
+            own_cells = own & line
+            other_cells = other & line
+            if own_cells and not other_cells:
+                score += 4 ** bin(own_cells).count('1')
+            elif other_cells and not own_cells:
+                score -= 4 ** bin(other_cells).count('1')
+        return score
+
+
+class MCTSPlayer(object):
+    """Monte Carlo Tree Search player using UCT selection.
+
+    The tree lives in parallel lists indexed by node number, with the children of a node stored contiguously,
+    instead of one object per node. Each move runs ``iterations`` playouts, or fewer when ``time_budget_ms`` or
+    ``node_budget`` (a number of playouts) runs out first. After a move the subtree below it is kept, and on the
+    next call the child matching the opponent's reply becomes the new root, so earlier work carries over between
+    moves.
+    """
+
+    stats = None  # instrumentation.SearchStats, set while a move is being measured
+
+    def __init__(self, *, position, iterations=10000, time_budget_ms=None, node_budget=None, check_interval=64,
+                 exploration=1.4, reuse_tree=True):
+        self.position = position
+        self.iterations = iterations
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget
+        self.check_interval = check_interval
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.reused_visits = 0
+        self._geometry = None
+        self._root_masks = None
+        self._clear_tree()
+
+    def _clear_tree(self):
+        self._move = []  # cell played to reach the node
+        self._first_child = []  # index of the first child, -1 while the node is not expanded
+        self._child_count = []
+        self._visits = []
+        self._wins = []  # playout results for the player who moved into the node, draws count half
+        self._terminal = []  # 0 game goes on, 1 the move into the node won, 2 the move drew
+
+    def _add_node(self, move, terminal):
+        self._move.append(move)
+        self._first_child.append(-1)
+        self._child_count.append(0)
+        self._visits.append(0)
+        self._wins.append(0.0)
+        self._terminal.append(terminal)
+        return len(self._move) - 1
+
+    def play(self, *, board):
+        masks = [0, 0, 0]
+        for col in range(board.cols):
+            column = board.board[col]
+            for row in range(board.rows):
+                masks[column[row]] |= 1 << (col * board.rows + row)
+        masks[EMPTY_CELL] = 0
+        self._prepare_root(board, masks)
+        self.reused_visits = self._visits[0]
+
+        from rollout import RolloutEngine
+
+        engine = RolloutEngine(rows=board.rows, cols=board.cols, connections_to_win=board.connections_to_win,
+                               gravity=board.gravity)
+        self._cell_lines, _ = line_masks(board.rows, board.cols, board.connections_to_win)
+        budget = _start_budget(self)
+        iteration = 0
+        while iteration < self.iterations:
+            if budget is not None and not budget.spend() and iteration:
+                break  # The first playout always runs, so that the root has children to choose from
+            self._iterate(board.current_player, masks, engine)
+            iteration += 1
+
+        first, count = self._first_child[0], self._child_count[0]
+        best = max(range(first, first + count), key=self._visits.__getitem__)
+        cell = self._move[best]
+        row, col = cell % board.rows, cell // board.rows
+
+        # Keep the subtree below the chosen move for the next call
+        masks[board.current_player] |= 1 << cell
+        self._root_masks = (masks[PLAYER_ONE], masks[PLAYER_TWO])
+        if self.reuse_tree:
+            self._reroot(best)
+        return row, col
+
+    def _prepare_root(self, board, masks):
+        geometry = (board.rows, board.cols, board.connections_to_win, board.gravity)
+        position = (masks[PLAYER_ONE], masks[PLAYER_TWO])
+        if self.reuse_tree and self._geometry == geometry and self._root_masks is not None and self._move:
+            if position == self._root_masks:
+                return
+            old_one, old_two = self._root_masks
+            new_cells = (position[0] ^ old_one) | (position[1] ^ old_two)
+            if (position[0] & old_one == old_one and position[1] & old_two == old_two
+                    and new_cells & (new_cells - 1) == 0 and self._first_child[0] >= 0):
+                # Exactly one piece was added since our last move: descend into the matching child
+                cell = new_cells.bit_length() - 1
+                first = self._first_child[0]
+                for child in range(first, first + self._child_count[0]):
+                    if self._move[child] == cell:
+                        self._reroot(child)
+                        self._root_masks = position
+                        return
+        self._geometry = geometry
+        self._root_masks = position
+        self._clear_tree()
+        self._add_node(-1, 0)
+
+    def _reroot(self, root):
+        """Make ``root`` node 0, copying its subtree into fresh lists and dropping everything else."""
+        old_move, old_first, old_count = self._move, self._first_child, self._child_count
+        old_visits, old_wins, old_terminal = self._visits, self._wins, self._terminal
+        self._clear_tree()
+        self._add_node(old_move[root], old_terminal[root])
+        self._visits[0], self._wins[0] = old_visits[root], old_wins[root]
+        queue = [root]
+        for new_index, old_index in enumerate(queue):
+            first = old_first[old_index]
+            if first < 0:
+                continue
+            self._first_child[new_index] = len(self._move)
+            self._child_count[new_index] = old_count[old_index]
+            for child in range(first, first + old_count[old_index]):
+                copied = self._add_node(old_move[child], old_terminal[child])
+                self._visits[copied], self._wins[copied] = old_visits[child], old_wins[child]
+                queue.append(child)
+
+    def _iterate(self, root_player, root_masks, engine):
+        masks = list(root_masks)
+        player = root_player
+        first_child, child_count, visits, wins = self._first_child, self._child_count, self._visits, self._wins
+        node = 0
+        path = [0]
+        while True:
+            terminal = self._terminal[node]
+            if terminal:
+                winner = (3 - player) if terminal == 1 else EMPTY_CELL
+                break
+            if first_child[node] < 0:
+                if node == 0 or visits[node]:
+                    self._expand(node, player, masks)
+                else:
+                    occupied = masks[PLAYER_ONE] | masks[PLAYER_TWO]
+                    empty_cells = [cell for cell in range(engine.rows * engine.cols) if not occupied >> cell & 1]
+                    won, _, lost = engine.run_cells(masks[PLAYER_ONE], masks[PLAYER_TWO], empty_cells, player, 1)
+                    if self.stats is not None:
+                        self.stats.rollouts += 1
+                    winner = (3 - player) if won else (player if lost else EMPTY_CELL)
+                    break
+            # UCT selection, unvisited children first
+            first = first_child[node]
+            log_parent = math.log(visits[node] + 1)
+            best_child, best_value = first, -1.0
+            for child in range(first, first + child_count[node]):
+                child_visits = visits[child]
+                if not child_visits:
+                    best_child = child
+                    break
+                value = wins[child] / child_visits + self.exploration * math.sqrt(log_parent / child_visits)
+                if value > best_value:
+                    best_child, best_value = child, value
+            node = best_child
+            masks[player] |= 1 << self._move[node]
+            player = 3 - player
+            path.append(node)
+
+        # Back-propagate: the node at depth d was entered by the opponent of the player to move at depth d
+        mover = 3 - root_player
+        for node in path:
+            visits[node] += 1
+            if winner == mover:
+                wins[node] += 1.0
+            elif winner == EMPTY_CELL:
+                wins[node] += 0.5
+            mover = 3 - mover
+
+    def _expand(self, node, player, masks):
+        cell_lines = self._cell_lines
+        occupied = masks[PLAYER_ONE] | masks[PLAYER_TWO]
+        size = len(cell_lines)
+        is_last_move = bin(occupied).count('1') + 1 == size
+        self._first_child[node] = len(self._move)
+        count = 0
+        rows, cols, _, gravity = self._geometry
+        for cell in playable_cells(occupied, rows=rows, cols=cols, gravity=gravity):
+            own = masks[player] | 1 << cell
+            terminal = 0
+            for line in cell_lines[cell]:
+                if own & line == line:
+                    terminal = 1
+                    break
+            else:
+                if is_last_move:
+                    terminal = 2
+            self._add_node(cell, terminal)
+            count += 1
+        self._child_count[node] = count
+        if self.stats is not None:
+            self.stats.nodes += count
+            self.stats.expansions += 1
+            self.stats.children += count
 
-        return self.state_values[state_key]
 
 class MonteCarloPlayer(object):
-    def __init__(self, *, position, num_simulations = 5000):
+    """Player estimating each move's value from random playouts.
+
+    ``engine='board'`` plays every simulation on a copied ``Board``; ``engine='batch'`` hands the whole batch of
+    simulations for a move to a ``RolloutEngine``, which is much faster and samples the same distribution.
+
+    Giving a ``seed`` makes the rollouts reproducible, and ``workers`` spreads them over a shared process pool;
+    both imply the batch engine. For a given seed the chosen move does not depend on the number of workers.
+
+    ``time_budget_ms`` and ``node_budget`` (a total number of simulations) cap the work per move. Simulations then
+    run in rounds over all moves, and the move with the best win rate so far is played when the budget runs out.
+    A time budget makes seeded runs depend on the machine's speed.
+
+    ``allocation='halving'`` spends the simulations adaptively instead of ``num_simulations`` on every move: moves
+    compete in rounds of successive halving, and those clearly worse than the best, by ``confidence`` standard
+    errors, stop getting simulations. It usually picks the same move with a fraction of the rollouts.
+    """
+
+    ENGINES = ('board', 'batch')
+    ALLOCATIONS = ('uniform', 'halving')
+    ROUND_SIMULATIONS = 50
+    stats = None  # instrumentation.SearchStats, set while a move is being measured
+
+    def __init__(self, *, position, num_simulations = 5000, engine='board', workers=None, seed=None,
+                 chunk_size=1000, time_budget_ms=None, node_budget=None, allocation='uniform', confidence=1.96):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {self.ENGINES}")
+        if allocation not in self.ALLOCATIONS:
+            raise ValueError(f"Unknown allocation {allocation!r}, expected one of {self.ALLOCATIONS}")
         self.position = position
         self.num_simulations = num_simulations
+        self.engine = engine
+        self.workers = workers
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget
+        self.allocation = allocation
+        self.confidence = confidence
+        self._rollout_engine = None
 
     def play(self, *, board):
         # Monte Carlo simulation to choose the best move
         best_move = None
         best_win_rate = float('-inf')
         available_moves = utils.get_available_moves(board)
+        candidates = []
+        stats = self.stats
+        if stats is not None:
+            stats.expansions += 1
+            stats.children += len(available_moves)
 
         for row, col in available_moves:
-            wins = 0
             board.play_move(row=row, col=col)
             board.next_player()
-
+            if stats is not None:
+                stats.nodes += 1
             game_ended, there_is_winner = board.game_has_ended()
+            board.undo_move(row=row, col=col)
             if game_ended:
                 if there_is_winner:
-                    board.board[col][row] = EMPTY_CELL # Undo the move
-                    board.next_player() # Switch back to orginal player
                     return row, col
                 if best_move is None:
                     best_move = (row, col)
             else:
-                # Run simulations to estimate the win rate
-                for _ in range(self.num_simulations):
-                    wins += self._simulate_game(board)
+                candidates.append((row, col))
 
-                win_rate = wins / self.num_simulations
-                if win_rate > best_win_rate:
+        if candidates:
+            for move, win_rate in zip(candidates, self._evaluate(board, candidates)):
+                if win_rate is not None and win_rate > best_win_rate:
                     best_win_rate = win_rate
-                    best_move = (row, col)
-
-            board.board[col][row] = EMPTY_CELL # Undo the move
-            board.next_player() # Switch back to orginal player
+                    best_move = move
 
         return best_move
 
+    def _evaluate(self, board, moves):
+        """Return the win rate, wins minus losses per game, of the simulations run after each of ``moves``.
+
+        ``None`` marks the moves the adaptive allocation ruled out.
+        """
+        budget = None
+        if self.time_budget_ms is not None or self.node_budget is not None:
+            budget = _SearchBudget(time_budget_ms=self.time_budget_ms, node_budget=self.node_budget, check_interval=1)
+        positions = None
+        seed = None
+        if self.workers is not None or self.seed is not None:
+            from rollout import encode_position
+
+            seed = random.getrandbits(64) if self.seed is None else self.seed
+            positions = []
+            for row, col in moves:
+                board.play_move(row=row, col=col)
+                board.next_player()
+                positions.append(encode_position(board))
+                board.undo_move(row=row, col=col)
+
+        def simulate(indices, games, round_seed):
+            return self._simulate(board, [moves[index] for index in indices],
+                                  None if positions is None else [positions[index] for index in indices],
+                                  games, round_seed)
+
+        if self.allocation == 'halving':
+            return self._allocate_halving(len(moves), simulate, budget, seed)
+        return self._allocate_uniform(len(moves), simulate, budget, seed)
+
+    def _allocate_uniform(self, count, simulate, budget, seed):
+        """Give every move ``num_simulations`` games.
+
+        Without a budget they are played at once. With one, the moves get ``ROUND_SIMULATIONS`` more games each per
+        round until ``num_simulations`` is reached or the budget runs out, so all moves always have the same
+        number of games.
+        """
+        indices = list(range(count))
+        scores = [0] * count
+        games = 0
+        round_number = 0
+        while games < self.num_simulations:
+            size = self.num_simulations - games
+            if budget is not None:
+                size = self._round_size(budget, min(size, self.ROUND_SIMULATIONS), count, round_number)
+                if not size:
+                    break
+            round_seed = seed if budget is None else f'{seed}-{round_number}'
+            for index, (won, lost) in zip(indices, simulate(indices, size, round_seed)):
+                scores[index] += won - lost
+            games += size
+            round_number += 1
+        return [score / games for score in scores]
+
+    def _allocate_halving(self, count, simulate, budget, seed):
+        """Spread up to ``num_simulations`` games per move over the moves by successive halving.
+
+        The ``num_simulations * count`` games are split evenly between ``ceil(log2(count))`` phases, and each phase
+        evenly between the moves still in play, after which the better half goes on to the next phase. Games are
+        played in rounds of ``ROUND_SIMULATIONS``, and after every round the moves whose confidence interval
+        (``confidence`` standard errors, counting one virtual win and loss) lies below the best move's are dropped,
+        so the search stops as soon as one move is clearly the best.
+        """
+        won = [0] * count
+        lost = [0] * count
+        games = [0] * count
+        active = list(range(count))
+        phases = max(1, (count - 1).bit_length())
+        total = self.num_simulations * count
+        round_number = 0
+
+        def win_rate(index):
+            return (won[index] - lost[index]) / games[index] if games[index] else 0.0
+
+        for _ in range(phases):
+            target = games[active[0]] + total // (phases * len(active))
+            while len(active) > 1 and games[active[0]] < target:
+                size = min(self.ROUND_SIMULATIONS, target - games[active[0]])
+                size = self._round_size(budget, size, len(active), round_number)
+                if not size:
+                    return [win_rate(index) if index in active else None for index in range(count)]
+                for index, (round_won, round_lost) in zip(active, simulate(active, size, f'{seed}-{round_number}')):
+                    won[index] += round_won
+                    lost[index] += round_lost
+                    games[index] += size
+                round_number += 1
+                active = self._separate(active, won, lost, games)
+            if len(active) == 1:
+                break
+            active = sorted(active, key=win_rate, reverse=True)[:(len(active) + 1) // 2]
+        return [win_rate(index) if index in active else None for index in range(count)]
+
+    def _separate(self, active, won, lost, games):
+        """Return the moves whose confidence interval reaches the lower end of the best move's interval."""
+        bounds = []
+        for index in active:
+            played = games[index] + 2
+            mean = (won[index] - lost[index]) / played
+            deviation = self.confidence * math.sqrt(max((won[index] + lost[index] + 2) / played - mean * mean, 0.0)
+                                                    / played)
+            bounds.append((mean - deviation, mean + deviation))
+        best_lower = max(lower for lower, _ in bounds)
+        return [index for index, (_, upper) in zip(active, bounds) if upper >= best_lower]
+
+    @staticmethod
+    def _round_size(budget, size, arms, round_number):
+        """Cap a round of ``size`` games for each of ``arms`` moves by the budget; 0 means the budget has run out."""
+        if budget is None:
+            return size
+        if budget.remaining_nodes is not None:
+            size = min(size, budget.remaining_nodes // arms)
+        # The first round always runs, so that every move has a score
+        if round_number and not size:
+            return 0
+        size = max(size, 1)
+        if not budget.spend(size * arms) and round_number:
+            return 0
+        return size
+
+    def _simulate(self, board, moves, positions, games, seed):
+        """Play ``games`` random games after each of ``moves`` and return their ``(wins, losses)``.
+
+        ``positions`` holds the moves' ``encode_position`` tuples when the games are deferred to ``run_batches``.
+        """
+        if self.stats is not None:
+            self.stats.rollouts += games * len(moves)
+        if positions is not None:
+            from rollout import run_batches
+
+            return [(won, lost) for won, _, lost in run_batches(positions, games, seed=seed,
+                                                                chunk_size=self.chunk_size, workers=self.workers)]
+        results = []
+        for row, col in moves:
+            board.play_move(row=row, col=col)
+            board.next_player()
+            # Run simulations to estimate the win rate
+            if self.engine == 'batch':
+                won, _, lost = self._get_rollout_engine(board).run(board, games)
+            else:
+                outcomes = [self._simulate_game(board) for _ in range(games)]
+                won, lost = outcomes.count(1), outcomes.count(-1)
+            board.undo_move(row=row, col=col)
+            results.append((won, lost))
+        return results
+
+    def _get_rollout_engine(self, board):
+        engine = self._rollout_engine
+        if engine is None or (engine.rows, engine.cols, engine.connections_to_win, engine.gravity) != (
+                board.rows, board.cols, board.connections_to_win, board.gravity):
+            from rollout import RolloutEngine
+
+            engine = RolloutEngine(rows=board.rows, cols=board.cols, connections_to_win=board.connections_to_win,
+                                   gravity=board.gravity)
+            self._rollout_engine = engine
+        return engine
+
     def _simulate_game(self, board):
         # Simulate a random game starting with a specific board configuration
-        new_board = Board(rows=board.rows, cols=board.cols, connections_to_win=board.connections_to_win, 
-                            board=deepcopy(board.board), player_to_move=board.current_player)
+        new_board = type(board)(rows=board.rows, cols=board.cols, connections_to_win=board.connections_to_win,
+                                board=deepcopy(board.board), player_to_move=board.current_player,
+                                gravity=board.gravity)
         opponents_move = True
         
         while True:
-            available_moves = utils.get_available_moves(new_board)
-
-            random_move = random.choice(available_moves)  # Pick a move at random
+            random_move = new_board.random_move()  # Pick a move at random
             new_board.play_move(row=random_move[0], col=random_move[1])
             new_board.next_player()
 
@@ -227,4 +999,182 @@ class MonteCarloPlayer(object):
                 if there_is_winner:
                     return 1 if opponents_move else -1
                 return 0  # Draw
-                
\ No newline at end of file
+
+
+class TDLearningPlayer(object):
+    """Player learning afterstate values with TD(0) from self-play.
+
+    Values are stored from player one's point of view (1 win, 0.5 draw, 0 loss) in a preallocated ``array`` indexed
+    by the base-3 encoding of the board, ``sum(cell_value * 3 ** (col * rows + row))``, which is updated
+    incrementally as moves are played. Player one picks the afterstate with the highest value, player two the
+    lowest. ``use_symmetry`` shares the value of all symmetric images of a board.
+
+    The table is created for the geometry of the first board seen, and ``training_episodes`` self-play games are
+    played before the first move. When ``store`` names a file written by :meth:`save_values`, the values are
+    loaded from it instead and no training happens.
+    """
+
+    LEARNING_RATE_SCHEDULES = ('constant', 'linear', 'exponential')
+    MAX_TABLE_SIZE = 3 ** 13
+    stats = None  # instrumentation.SearchStats, set while a move is being measured
+
+    def __init__(self, *, position, training_episodes=50000, learning_rate=0.5, min_learning_rate=0.05,
+                 schedule='linear', epsilon=0.1, use_symmetry=False, seed=None, store=None):
+        if schedule not in self.LEARNING_RATE_SCHEDULES:
+            raise ValueError(f"Unknown learning rate schedule {schedule!r}, "
+                             f"expected one of {self.LEARNING_RATE_SCHEDULES}")
+        self.position = position
+        self.training_episodes = training_episodes
+        self.learning_rate = learning_rate
+        self.min_learning_rate = min_learning_rate
+        self.schedule = schedule
+        self.epsilon = epsilon
+        self.use_symmetry = use_symmetry
+        self.rng = random.Random(seed)
+        self.values = None
+        self.episodes_trained = 0
+        self.store_path = store
+        self._geometry = None
+
+    def _setup(self, rows, cols, connections_to_win, gravity):
+        geometry = (rows, cols, connections_to_win, gravity)
+        if self._geometry == geometry:
+            return
+        size = rows * cols
+        if 3 ** size > self.MAX_TABLE_SIZE:
+            raise ValueError(f"A {rows}x{cols} board needs {3 ** size} table entries, "
+                             f"more than the supported {self.MAX_TABLE_SIZE}")
+        self._geometry = geometry
+        self._cell_lines, _ = line_masks(rows, cols, connections_to_win)
+        transforms = symmetry_transforms(rows, cols, gravity)
+        if not self.use_symmetry:
+            transforms = transforms[:1]
+        # _powers[t][cell] is the weight of ``cell`` in the index of the board's image under transform ``t``
+        self._powers = tuple(tuple(3 ** transform[cell] for cell in range(size)) for transform in transforms)
+        self.values = array('d', [0.5]) * 3 ** size
+        self.episodes_trained = 0
+        if self.store_path is not None:
+            from value_store import ValueStore
+
+            with ValueStore(self.store_path, rows=rows, cols=cols, connections_to_win=connections_to_win,
+                            key_kind=self._key_kind(), gravity=gravity) as store:
+                for key, value in store.items():
+                    self.values[key] = value
+            self.episodes_trained = self.training_episodes
+
+    def _key_kind(self):
+        from value_store import KEY_BASE3, KEY_CANONICAL_BASE3
+
+        return KEY_CANONICAL_BASE3 if self.use_symmetry else KEY_BASE3
+
+    def save_values(self, path):
+        """Write the values that moved away from their initial 0.5 to a value store file."""
+        if self._geometry is None:
+            raise ValueError("No values to save, the player has not been trained yet")
+        from value_store import write_store
+
+        rows, cols, connections_to_win, gravity = self._geometry
+        write_store(path, ((key, value) for key, value in enumerate(self.values) if value != 0.5), rows=rows,
+                    cols=cols, connections_to_win=connections_to_win, key_kind=self._key_kind(), gravity=gravity)
+
+    def learning_rate_at(self, episode, episodes):
+        """Learning rate for ``episode`` out of a training run of ``episodes``."""
+        if self.schedule == 'constant' or episodes <= 1:
+            return self.learning_rate
+        progress = episode / (episodes - 1)
+        if self.schedule == 'linear':
+            return self.learning_rate + (self.min_learning_rate - self.learning_rate) * progress
+        return self.learning_rate * (self.min_learning_rate / self.learning_rate) ** progress
+
+    def train(self, episodes, *, rows=3, cols=3, connections_to_win=3, gravity=False):
+        """Play ``episodes`` epsilon-greedy self-play games, updating the values after every move."""
+        self._setup(rows, cols, connections_to_win, gravity)
+        values = self.values
+        epsilon = self.epsilon
+        rng_random = self.rng.random
+        size = rows * cols
+        start_cells = playable_cells(0, rows=rows, cols=cols, gravity=gravity)
+        for episode in range(episodes):
+            alpha = self.learning_rate_at(episode, episodes)
+            masks = [0, 0, 0]
+            indices = [0] * len(self._powers)
+            candidates = start_cells[:]
+            pieces = 0
+            player = PLAYER_ONE
+            previous = None
+            while True:
+                explore = rng_random() < epsilon
+                cell, key, outcome = self._select(masks, indices, candidates, player, explore, pieces + 1 == size)
+                if previous is not None:
+                    target = values[key] if outcome is None else outcome
+                    values[previous] += alpha * (target - values[previous])
+                if outcome is not None:
+                    break
+                masks[player] |= 1 << cell
+                for transform, powers in enumerate(self._powers):
+                    indices[transform] += player * powers[cell]
+                pieces += 1
+                if gravity and cell % rows:
+                    candidates[candidates.index(cell)] = cell - 1  # The column's next free cell is one row up
+                else:
+                    candidates.remove(cell)
+                previous = key
+                player = PLAYER_TWO if player == PLAYER_ONE else PLAYER_ONE
+        self.episodes_trained += episodes
+
+    def _select(self, masks, indices, playable, player, explore, last_cell):
+        """Pick a move for ``player``: return its cell, afterstate key, and the outcome if it ends the game."""
+        cell_lines = self._cell_lines
+        values = self.values
+        candidates = [self.rng.choice(playable)] if explore else playable
+        own = masks[player]
+        best = None
+        ties = 0
+        for cell in candidates:
+            grown = own | 1 << cell
+            outcome = None
+            for line in cell_lines[cell]:
+                if grown & line == line:
+                    outcome = 1.0 if player == PLAYER_ONE else 0.0
+                    break
+            else:
+                if last_cell:
+                    outcome = 0.5
+            key = min(index + player * powers[cell] for index, powers in zip(indices, self._powers))
+            value = values[key] if outcome is None else outcome
+            score = value if player == PLAYER_ONE else -value
+            if best is None or score > best[0]:
+                best = (score, cell, key, outcome)
+                ties = 1
+            elif score == best[0]:
+                ties += 1
+                if self.rng.randrange(ties) == 0:  # reservoir sampling keeps every tied move equally likely
+                    best = (score, cell, key, outcome)
+        return best[1], best[2], best[3]
+
+    def play(self, *, board):
+        self._setup(board.rows, board.cols, board.connections_to_win, board.gravity)
+        if self.episodes_trained < self.training_episodes:
+            self.train(self.training_episodes - self.episodes_trained, rows=board.rows, cols=board.cols,
+                       connections_to_win=board.connections_to_win, gravity=board.gravity)
+        masks = [0, 0, 0]
+        indices = [0] * len(self._powers)
+        for col in range(board.cols):
+            column = board.board[col]
+            for row in range(board.rows):
+                cell = col * board.rows + row
+                value = column[row]
+                if value == EMPTY_CELL:
+                    continue
+                masks[value] |= 1 << cell
+                for transform, powers in enumerate(self._powers):
+                    indices[transform] += value * powers[cell]
+        candidates = playable_cells(masks[PLAYER_ONE] | masks[PLAYER_TWO], rows=board.rows, cols=board.cols,
+                                    gravity=board.gravity)
+        if self.stats is not None:
+            self.stats.nodes += len(candidates)
+            self.stats.expansions += 1
+            self.stats.children += len(candidates)
+        cell, _, _ = self._select(masks, indices, candidates, board.current_player, explore=False,
+                                  last_cell=len(board.empty_cells) == 1)
+        return cell % board.rows, cell // board.rows
@@ -0,0 +1,115 @@
+"""Registry of the player types, importing each implementation only when a game first asks for it.
+
+Players are registered by name with the location of their class as ``'module:ClassName'``, so starting a game
+only imports the modules of the two players taking part. Other packages can add players with
+:func:`register_player`, or through an entry point in the ``tic_tac_toe.players`` group whose value is such a
+location; entry points are only looked up for names that are not registered already.
+
+Player options are keyword arguments of the player's constructor. :func:`parse_player_options` turns command line
+strings like ``mc_player.num_simulations=200`` into them, so every CLI passes options the same way.
+"""
+
+import importlib
+
+ENTRY_POINT_GROUP = 'tic_tac_toe.players'
+
+_players = {
+    'human_user': 'players:HumanPlayer',
+    'random_player': 'players:RandomPlayer',
+    'minimax_player': 'players:SimpleMinimaxPlayer',
+    'dp_player': 'players:DynamicProgrammingPlayer',
+    'alphabeta_player': 'players:AlphaBetaPlayer',
+    'mc_player': 'players:MonteCarloPlayer',
+    'mcts_player': 'players:MCTSPlayer',
+    'td_player': 'players:TDLearningPlayer',
+}
+_interactive = {'human_user'}
+_classes = {}
+
+
+def register_player(name, target, *, interactive=False):
+    """Register a player class, or the ``'module:ClassName'`` location of one, under ``name``.
+
+    ``interactive`` players need a person at the keyboard and are left out of headless games.
+    """
+    _players[name] = target
+    _classes.pop(name, None)
+    if interactive:
+        _interactive.add(name)
+    else:
+        _interactive.discard(name)
+
+
+def player_names(*, interactive=True):
+    """Return the names of the registered players, without the interactive ones unless ``interactive``."""
+    return [name for name in _players if interactive or name not in _interactive]
+
+
+def is_registered(name):
+    """Return whether ``name`` is a registered player, looking it up in the installed entry points if needed."""
+    return name in _players or _load_entry_point(name)
+
+
+def is_interactive(name):
+    return name in _interactive
+
+
+def _load_entry_point(name):
+    from importlib.metadata import entry_points  # Only scanned for unknown names, it reads every installed package
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name == name:
+            register_player(name, entry_point.value)
+            return True
+    return False
+
+
+def get_player_class(name):
+    """Return the class registered as ``name``, importing its module on first use."""
+    player_cls = _classes.get(name)
+    if player_cls is None:
+        if not is_registered(name):
+            raise ValueError(f"Unknown player {name!r}, expected one of {player_names()}")
+        target = _players[name]
+        if isinstance(target, str):
+            module_name, _, class_name = target.partition(':')
+            target = getattr(importlib.import_module(module_name), class_name)
+        player_cls = _classes[name] = target
+    return player_cls
+
+
+def player_accepts(name, option):
+    """Return whether the constructor of the player ``name`` takes the keyword argument ``option``."""
+    import inspect  # Needed for budgets and caches only, not to start a plain game
+
+    parameters = inspect.signature(get_player_class(name)).parameters
+    return option in parameters or any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values())
+
+
+def create_player(name, *, position, **options):
+    """Create the player ``name`` for ``position`` with constructor ``options``."""
+    return get_player_class(name)(position=position, **options)
+
+
+def parse_player_options(option_strings):
+    """Turn ``name.option=value`` strings into a ``{name: {option: value}}`` mapping.
+
+    Values are read as Python literals when possible (``200``, ``True``, ``None``) and kept as strings otherwise.
+    """
+    options = {}
+    for option in option_strings:
+        target, _, raw_value = option.partition('=')
+        name, _, key = target.partition('.')
+        if not key or not raw_value:
+            raise ValueError(f"Invalid player option {option!r}, expected name.option=value")
+        options.setdefault(name, {})[key] = _literal(raw_value)
+    return options
+
+
+def _literal(raw_value):
+    import ast  # Slow to load, and only needed when options are given
+
+    try:
+        return ast.literal_eval(raw_value)
+    except (ValueError, SyntaxError):
+        return raw_value
@@ -0,0 +1,180 @@
+"""Fast random playouts for the Monte Carlo player."""
+
+import random
+
+from board import PLAYER_ONE, PLAYER_TWO, line_masks
+
+
+class RolloutEngine(object):
+    """Plays batches of uniformly random games from a position without building ``Board`` objects.
+
+    A playout is a random permutation of the empty cells handed out to the players in turn, with the win check
+    limited to the precomputed lines through each placed cell. Results are reported from the point of view of the
+    player who made the last move, i.e. the opponent of ``board.current_player``, like
+    ``MonteCarloPlayer._simulate_game``.
+
+    With ``gravity`` every move drops into a uniformly random column that is not full, tracked with an array of
+    column heights.
+    """
+
+    def __init__(self, *, rows, cols, connections_to_win, rng=None, gravity=False):
+        self.rows = rows
+        self.cols = cols
+        self.connections_to_win = connections_to_win
+        self.gravity = gravity
+        self.rng = random if rng is None else rng
+        self._cell_lines, _ = line_masks(rows, cols, connections_to_win)
+
+    def run(self, board, num_games):
+        """Play ``num_games`` random games from ``board`` and return ``(wins, draws, losses)``."""
+        _, _, _, mask_one, mask_two, player_to_move, _ = encode_position(board)
+        return self.run_cells(mask_one, mask_two, board.empty_cells, player_to_move, num_games)
+
+    def run_cells(self, mask_one, mask_two, empty_cells, player_to_move, num_games):
+        """Same as :meth:`run` for a position given as player masks and the list of empty cells."""
+        if self.gravity:
+            return self._run_gravity(mask_one, mask_two, player_to_move, num_games)
+        cell_lines = self._cell_lines
+        shuffle = self.rng.shuffle
+        order = list(empty_cells)
+        mover_wins = [0, 0]  # indexed by whether the winner is the side to move at the start
+        draws = 0
+        for _ in range(num_games):
+            shuffle(order)
+            own, other = (mask_one, mask_two) if player_to_move == PLAYER_ONE else (mask_two, mask_one)
+            to_move_wins = True
+            for cell in order:
+                own |= 1 << cell
+                for line in cell_lines[cell]:
+                    if own & line == line:
+                        break
+                else:
+                    own, other = other, own
+                    to_move_wins = not to_move_wins
+                    continue
+                mover_wins[to_move_wins] += 1
+                break
+            else:
+                draws += 1
+        return mover_wins[False], draws, mover_wins[True]
+
+    def _run_gravity(self, mask_one, mask_two, player_to_move, num_games):
+        cell_lines = self._cell_lines
+        rows = self.rows
+        random_float = self.rng.random
+        column_mask = (1 << rows) - 1
+        occupied = mask_one | mask_two
+        start_heights = [(occupied >> col * rows & column_mask).bit_count() for col in range(self.cols)]
+        start_open = [col for col in range(self.cols) if start_heights[col] < rows]
+        mover_wins = [0, 0]
+        draws = 0
+        for _ in range(num_games):
+            heights = start_heights[:]
+            open_cols = start_open[:]
+            own, other = (mask_one, mask_two) if player_to_move == PLAYER_ONE else (mask_two, mask_one)
+            to_move_wins = True
+            while open_cols:
+                index = int(random_float() * len(open_cols))
+                col = open_cols[index]
+                height = heights[col] + 1
+                heights[col] = height
+                if height == rows:
+                    open_cols[index] = open_cols[-1]
+                    open_cols.pop()
+                cell = col * rows + rows - height
+                own |= 1 << cell
+                for line in cell_lines[cell]:
+                    if own & line == line:
+                        break
+                else:
+                    own, other = other, own
+                    to_move_wins = not to_move_wins
+                    continue
+                mover_wins[to_move_wins] += 1
+                break
+            else:
+                draws += 1
+        return mover_wins[False], draws, mover_wins[True]
+
+
+def encode_position(board):
+    """Return a compact, cheaply pickled description of a position for the rollout workers."""
+    mask_one = mask_two = 0
+    for col in range(board.cols):
+        column = board.board[col]
+        for row in range(board.rows):
+            if column[row] == PLAYER_ONE:
+                mask_one |= 1 << (col * board.rows + row)
+            elif column[row] == PLAYER_TWO:
+                mask_two |= 1 << (col * board.rows + row)
+    return board.rows, board.cols, board.connections_to_win, mask_one, mask_two, board.current_player, board.gravity
+
+
+_worker_engines = {}
+
+
+def run_encoded(position, num_games, seed):
+    """Play random games from an :func:`encode_position` tuple with an RNG seeded by ``seed``.
+
+    This is the unit of work sent to the rollout pool; it gives the same result in any process.
+    """
+    rows, cols, connections_to_win, mask_one, mask_two, player_to_move, gravity = position
+    engine = _worker_engines.get((rows, cols, connections_to_win, gravity))
+    if engine is None:
+        engine = RolloutEngine(rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+        _worker_engines[rows, cols, connections_to_win, gravity] = engine
+    engine.rng = random.Random(seed)
+    occupied = mask_one | mask_two
+    empty_cells = [cell for cell in range(rows * cols) if not occupied >> cell & 1]
+    return engine.run_cells(mask_one, mask_two, empty_cells, player_to_move, num_games)
+
+
+_pools = {}
+
+
+def get_pool(workers):
+    """Return the process pool with ``workers`` processes, creating it on first use.
+
+    Pools are kept for the lifetime of the process so that consecutive moves and games don't pay the
+    worker start-up cost again.
+    """
+    pool = _pools.get(workers)
+    if pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(max_workers=workers)
+        _pools[workers] = pool
+    return pool
+
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
+
+
+def run_batches(positions, num_games, *, seed, chunk_size=1000, workers=None):
+    """Evaluate several positions with ``num_games`` random games each and return their ``(wins, draws, losses)``.
+
+    Games are split into chunks of ``chunk_size`` whose RNG seeds derive from ``seed``, the position and the chunk
+    number only, so the results are the same for any number of ``workers``. Without workers the chunks run in
+    the calling process.
+    """
+    tasks = []
+    owners = []
+    for index, position in enumerate(positions):
+        for chunk, start in enumerate(range(0, num_games, chunk_size)):
+            tasks.append((position, min(chunk_size, num_games - start), f'{seed}-{position}-{chunk}'))
+            owners.append(index)
+
+    if workers:
+        futures = [get_pool(workers).submit(run_encoded, *task) for task in tasks]
+        chunk_results = [future.result() for future in futures]
+    else:
+        chunk_results = [run_encoded(*task) for task in tasks]
+
+    results = [(0, 0, 0)] * len(positions)
+    for index, (wins, draws, losses) in zip(owners, chunk_results):
+        total = results[index]
+        results[index] = (total[0] + wins, total[1] + draws, total[2] + losses)
+    return results
@@ -0,0 +1,394 @@
+"""Asyncio server hosting many concurrent games between remote humans and the AI players.
+
+Clients talk newline-delimited JSON over TCP. Every request is an object with an ``op`` and an optional ``id``
+echoed in the reply; replies carry ``ok`` and either the result or an ``error``:
+
+* ``{"op": "new", "ai": "mc_player", "ai_options": {}, "human": 1, "rows": 3, "cols": 3, "connect": 3,
+  "gravity": false}`` starts a session, all fields optional. When the AI moves first its move is in the reply.
+* ``{"op": "move", "session": 1, "row": 0, "col": 2}`` plays the human's move and returns the AI's reply.
+* ``{"op": "state", "session": 1}`` and ``{"op": "close", "session": 1}``.
+* ``{"op": "stats"}`` reports sessions, AI moves queued and move latencies, for one session when given one.
+
+Game states are answered with the session, its ``board`` (columns of cell values as in ``Board.board``), the
+``to_move`` player, ``status`` (``playing``, ``won`` or ``draw``), the ``winner`` and the ``ai_move`` just played.
+A request whose AI move fails changes nothing: the session is not created, or the human's move is taken back.
+
+The event loop only checks and applies moves. AI ``play()`` calls go to a process pool as a
+``Board.state_code()``, where every worker keeps its players between moves, and at most ``max_pending`` requests
+are handled at once: the server stops reading from its connections while that many are in progress, so a burst of
+slow Monte Carlo moves pushes back on the clients instead of piling up. Run with
+``python server.py --port 8765 --workers 4``.
+"""
+
+import argparse
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import os
+import threading
+import time
+
+from arena import percentile
+from board import BitBoard, PLAYER_ONE, PLAYER_TWO
+import registry
+
+MAX_CACHED_PLAYERS = 32
+MAX_CELLS = 64
+
+_players = OrderedDict()  # (player, lock) of this worker by name, options, position and geometry, least recent first
+_players_lock = threading.Lock()
+
+
+def _worker_player(name, options, position, geometry):
+    """Return this worker's player for the given settings and the lock to hold while it plays, creating it once."""
+    key = (name, json.dumps(options, sort_keys=True), position, geometry)
+    with _players_lock:
+        entry = _players.get(key)
+        if entry is not None:
+            _players.move_to_end(key)
+            return entry
+    if registry.player_accepts(name, 'shared_cache'):
+        options = dict(options, shared_cache=options.get('shared_cache', True))
+    entry = (registry.create_player(name, position=position, **options), threading.Lock())
+    with _players_lock:
+        entry = _players.setdefault(key, entry)
+        if len(_players) > MAX_CACHED_PLAYERS:
+            _players.popitem(last=False)
+    return entry
+
+
+def compute_ai_move(job):
+    """Return the move of an AI player for a position; run in the worker processes.
+
+    ``job`` is ``(player, options, position, rows, cols, connections_to_win, gravity, state_code)``. Every worker
+    keeps the players it creates, so ``td_player`` trains once and ``mcts_player`` carries its tree over to the
+    next move of a game. Players supporting the process-wide solution cache use it, so a worker's solved positions
+    serve all its sessions.
+    """
+    name, options, position, rows, cols, connections_to_win, gravity, code = job
+    player, lock = _worker_player(name, options, position, (rows, cols, connections_to_win, gravity))
+    board = BitBoard.from_code(code, rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+    with lock:
+        row, col = player.play(board=board)
+    return row, col
+
+
+class GameSession(object):
+    """One game between a remote human and an AI player, with the latencies of its requests."""
+
+    def __init__(self, session_id, *, ai, ai_options, human, rows, cols, connections_to_win, gravity):
+        self.session_id = session_id
+        self.ai = ai
+        self.ai_options = ai_options
+        self.human = human
+        self.ai_position = PLAYER_TWO if human == PLAYER_ONE else PLAYER_ONE
+        self.board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+        self.status = 'playing'
+        self.winner = None
+        self.lock = asyncio.Lock()  # Requests of one session are handled one at a time
+        self.latencies = []  # seconds per move request, including the AI's reply
+
+    def play(self, row, col):
+        """Apply a move of the side to move and update the game status."""
+        self.board.play_move(row=row, col=col)
+        game_ended, there_is_winner = self.board.game_has_ended()
+        if game_ended:
+            self.status = 'won' if there_is_winner else 'draw'
+            self.winner = self.board.current_player if there_is_winner else None
+        else:
+            self.board.next_player()
+
+    def ai_job(self):
+        board = self.board
+        return (self.ai, self.ai_options, self.ai_position, board.rows, board.cols, board.connections_to_win,
+                board.gravity, board.state_code())
+
+    def state(self):
+        return {'session': self.session_id, 'board': [list(column) for column in self.board.board],
+                'to_move': self.board.current_player, 'status': self.status, 'winner': self.winner}
+
+
+class GameServer(object):
+    """Hosts game sessions, answering requests from TCP connections or directly through :meth:`handle`.
+
+    AI moves run on ``executor``, a process pool of ``workers`` processes (one per CPU by default) unless another
+    executor with that many workers is given.
+    """
+
+    def __init__(self, *, workers=None, max_pending=64, executor=None):
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._slots = None
+        self._server = None
+        self._connections = {}  # handler task of every open connection, by writer
+        self._session_ids = itertools.count(1)
+        self.sessions = {}
+        self.in_flight = 0  # requests being handled
+        self.ai_jobs = 0  # AI moves submitted to the executor and not finished
+        self.peak_ai_jobs = 0
+        self.moves = 0
+        self._latencies = []  # seconds per move request, all sessions
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Listen on ``host``:``port`` (any free port by default) and return the port."""
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            handlers = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.transport.abort()  # Ends the connection's readline, letting its handler finish
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def queue_depth(self):
+        """AI moves waiting for a free worker."""
+        return max(0, self.ai_jobs - self.workers)
+
+    async def handle(self, message):
+        """Answer one request and return the reply."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            return await self._answer(message)
+
+    async def _answer(self, message):
+        self.in_flight += 1
+        reply = {} if 'id' not in message else {'id': message['id']}
+        try:
+            operation = getattr(self, f"_op_{message.get('op')}", None)
+            if operation is None:
+                raise ValueError(f"Unknown op {message.get('op')!r}")
+            reply.update(await operation(message), ok=True)
+        except KeyError as error:
+            reply.update(ok=False, error=f"Missing field {error}")
+        except (ValueError, TypeError) as error:
+            reply.update(ok=False, error=str(error))
+        finally:
+            self.in_flight -= 1
+        return reply
+
+    async def _serve_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(message):
+            try:
+                reply = await self._answer(message)
+            finally:
+                self._slots.release()
+            async with write_lock:
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("Requests must be JSON objects")
+                except ValueError as error:
+                    async with write_lock:
+                        writer.write(json.dumps({'ok': False, 'error': f"Invalid request: {error}"}).encode() + b'\n')
+                        await writer.drain()
+                    continue
+                # Wait for a free slot before reading on, so that a busy server stops reading instead of queueing
+                await self._slots.acquire()
+                task = asyncio.create_task(respond(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass  # The client went away
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    def _session(self, message):
+        session = self.sessions.get(message.get('session'))
+        if session is None:
+            raise ValueError(f"Unknown session {message.get('session')!r}")
+        return session
+
+    async def _ai_move(self, session):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.ai_jobs += 1
+        self.peak_ai_jobs = max(self.peak_ai_jobs, self.ai_jobs)
+        try:
+            row, col = await asyncio.get_running_loop().run_in_executor(self._executor, compute_ai_move,
+                                                                        session.ai_job())
+        except (ValueError, TypeError):
+            raise
+        except Exception as error:
+            raise ValueError(f"The AI player failed: {error!r}") from error
+        finally:
+            self.ai_jobs -= 1
+        session.play(row, col)
+        return [row, col]
+
+    async def _op_new(self, message):
+        ai = message.get('ai', 'mc_player')
+        if not registry.is_registered(ai) or registry.is_interactive(ai):
+            raise ValueError(f"Unknown AI player {ai!r}")
+        human = message.get('human', PLAYER_ONE)
+        if human not in (PLAYER_ONE, PLAYER_TWO):
+            raise ValueError(f"human must be {PLAYER_ONE} or {PLAYER_TWO}")
+        ai_options = message.get('ai_options', {})
+        if not isinstance(ai_options, dict):
+            raise ValueError("ai_options must be an object")
+        rows, cols, connect = (message.get(field, 3) for field in ('rows', 'cols', 'connect'))
+        if not all(type(value) is int and value >= 1 for value in (rows, cols, connect)):
+            raise ValueError("rows, cols and connect must be positive integers")
+        if rows * cols > MAX_CELLS or connect > max(rows, cols):
+            raise ValueError(f"Boards have at most {MAX_CELLS} cells and connect fits in a row or column")
+        session = GameSession(next(self._session_ids), ai=ai, ai_options=ai_options, human=human, rows=rows,
+                              cols=cols, connections_to_win=connect, gravity=bool(message.get('gravity', False)))
+        ai_move = None
+        if session.ai_position == PLAYER_ONE:
+            ai_move = await self._ai_move(session)
+        # Only games whose first AI move succeeded are kept
+        self.sessions[session.session_id] = session
+        return dict(session.state(), ai_move=ai_move)
+
+    async def _op_move(self, message):
+        session = self._session(message)
+        start = time.perf_counter()
+        async with session.lock:
+            move = (message['row'], message['col'])
+            if session.status != 'playing':
+                raise ValueError("The game is over")
+            if session.board.current_player != session.human:
+                raise ValueError("It is not the human player's turn")
+            if move not in session.board.available_moves():
+                raise ValueError(f"Illegal move {list(move)}")
+            session.play(*move)
+            ai_move = None
+            if session.status == 'playing':
+                try:
+                    ai_move = await self._ai_move(session)
+                except BaseException:
+                    # Take the move back so the game is as before the request, with the human to move
+                    session.board.undo_move(row=move[0], col=move[1])
+                    raise
+        seconds = time.perf_counter() - start
+        session.latencies.append(seconds)
+        self._latencies.append(seconds)
+        self.moves += 1
+        return dict(session.state(), ai_move=ai_move)
+
+    async def _op_state(self, message):
+        return self._session(message).state()
+
+    async def _op_close(self, message):
+        session = self._session(message)
+        del self.sessions[session.session_id]
+        return {'session': session.session_id}
+
+    async def _op_stats(self, message):
+        latencies = self._session(message).latencies if 'session' in message else self._latencies
+        latencies = sorted(seconds * 1000 for seconds in latencies)
+        return {
+            'sessions': len(self.sessions),
+            'playing': sum(session.status == 'playing' for session in self.sessions.values()),
+            'in_flight': self.in_flight,
+            'ai_jobs': self.ai_jobs,
+            'queue_depth': self.queue_depth,
+            'peak_ai_jobs': self.peak_ai_jobs,
+            'moves': len(latencies),
+            'latency_ms': {label: percentile(latencies, fraction)
+                           for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+        }
+
+
+class GameClient(object):
+    """Client for a :class:`GameServer` listening on ``host``:``port``, e.g. in the same event loop for tests.
+
+    Requests can be sent concurrently; replies are matched to them by their ``id``.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._waiting = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, op, **fields):
+        """Send a request and return its reply."""
+        request_id = next(self._ids)
+        reply = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = reply
+        self._writer.write(json.dumps(dict(fields, op=op, id=request_id)).encode() + b'\n')
+        await self._writer.drain()
+        return await reply
+
+    async def _receive(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self._waiting.pop(reply.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        for future in self._waiting.values():
+            future.set_exception(ConnectionError("The server closed the connection"))
+        self._waiting.clear()
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._receiver
+
+
+async def serve(host, port, workers, max_pending):
+    server = GameServer(workers=workers, max_pending=max_pending)
+    port = await server.start(host, port)
+    print(f"Serving games on {host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host Tic-Tac-Toe games over a JSON lines TCP protocol')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help='Processes computing AI moves')
+    parser.add_argument('--max-pending', type=int, default=64, help='Requests handled at once before pushing back')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
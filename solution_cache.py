@@ -0,0 +1,226 @@
+"""Process-wide caches of solved positions, shared by the players and games of a process.
+
+:func:`solution_cache` returns one :class:`SolutionCache` per board geometry and key kind, so every
+``DynamicProgrammingPlayer`` or ``SimpleMinimaxPlayer`` created with ``shared_cache=True`` reuses the positions
+solved by the others, across games. The cache is a size-bounded LRU split into shards, each behind its own lock,
+so threads searching different positions rarely wait on each other.
+
+Worker processes can share their results as well: :meth:`SharedSolutionTable.create` allocates a fixed-size
+table in a ``multiprocessing.shared_memory`` segment, and :func:`use_shared_memory` makes the caches of a process
+read through to it and write their new entries to it. Values are ``(value, depth, flag)`` as in
+``transposition.TranspositionTable``.
+"""
+
+from collections import OrderedDict
+import random
+import threading
+
+from transposition import EXACT
+
+_VALID = 1 << 63  # Set in the data word of every used shared slot
+
+
+class SolutionCache(object):
+    """Thread-safe LRU map from position keys to ``(value, depth, flag)``.
+
+    Keys are spread over ``stripes`` shards holding ``capacity / stripes`` entries each; a shard evicts its least
+    recently used entry when it is full. When ``shared`` is a :class:`SharedSolutionTable`, local misses are
+    looked up there and stored entries are written to it, with ``salt`` mixed into the keys to tell geometries
+    apart.
+    """
+
+    def __init__(self, *, capacity=2 ** 20, stripes=16, shared=None, salt=0):
+        if capacity < 1 or stripes < 1:
+            raise ValueError("capacity and stripes must be positive")
+        self.capacity = capacity
+        self.stripes = min(stripes, capacity)
+        self.shared = shared
+        self.salt = salt
+        self._stripe_capacity = -(-capacity // self.stripes)
+        self._shards = [OrderedDict() for _ in range(self.stripes)]
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        # Counted per stripe under that stripe's lock, so threads never lose updates to each other
+        self._hits = [0] * self.stripes
+        self._misses = [0] * self.stripes
+        self._evictions = [0] * self.stripes
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    @property
+    def hits(self):
+        return sum(self._hits)
+
+    @property
+    def misses(self):
+        return sum(self._misses)
+
+    @property
+    def evictions(self):
+        return sum(self._evictions)
+
+    def __contains__(self, key):
+        return key in self._shards[key % self.stripes]
+
+    def lookup(self, key):
+        """Return ``(value, depth, flag)`` stored for ``key``, or ``None`` if it is not in the cache."""
+        stripe = key % self.stripes
+        shard = self._shards[stripe]
+        with self._locks[stripe]:
+            entry = shard.get(key)
+            if entry is not None:
+                shard.move_to_end(key)
+                self._hits[stripe] += 1
+                return entry
+        if self.shared is not None:
+            entry = self.shared.lookup(key ^ self.salt)
+            if entry is not None:
+                self._insert(stripe, key, entry, hit=True)
+                return entry
+        with self._locks[stripe]:
+            self._misses[stripe] += 1
+        return None
+
+    def store(self, key, value, depth, flag=EXACT):
+        """Store a search result as the most recently used entry."""
+        self._insert(key % self.stripes, key, (value, depth, flag))
+        if self.shared is not None:
+            self.shared.store(key ^ self.salt, value, depth, flag)
+
+    def _insert(self, stripe, key, entry, *, hit=False):
+        shard = self._shards[stripe]
+        with self._locks[stripe]:
+            shard[key] = entry
+            shard.move_to_end(key)
+            if len(shard) > self._stripe_capacity:
+                shard.popitem(last=False)
+                self._evictions[stripe] += 1
+            if hit:
+                self._hits[stripe] += 1
+
+    def items(self):
+        """Yield ``(key, value)`` for every entry held in this process."""
+        for stripe, shard in enumerate(self._shards):
+            with self._locks[stripe]:
+                entries = [(key, entry[0]) for key, entry in shard.items()]
+            yield from entries
+
+    def clear(self):
+        for stripe, shard in enumerate(self._shards):
+            with self._locks[stripe]:
+                shard.clear()
+
+
+class SharedSolutionTable(object):
+    """Fixed-size hash table of search results in a shared memory segment, usable from several processes.
+
+    Every slot holds two 64-bit words: the packed ``(value, depth, flag)`` and the key XOR-ed with it. Readers
+    only accept a slot whose words agree, so an entry torn by two processes writing at once reads as a miss
+    instead of a wrong value, and no lock is needed. Colliding positions replace each other unless the stored one
+    was searched deeper.
+    """
+
+    def __init__(self, segment, owner):
+        self._segment = segment
+        self._owner = owner
+        self._words = segment.buf.cast('Q')
+        self.capacity = self._words[0]
+        self._index_mask = self.capacity - 1
+
+    @classmethod
+    def create(cls, *, capacity=2 ** 20, name=None):
+        """Allocate a zeroed table of at least ``capacity`` slots; the creating process should :meth:`unlink` it."""
+        from multiprocessing import shared_memory
+
+        size = 1
+        while size < capacity:
+            size *= 2
+        segment = shared_memory.SharedMemory(name=name, create=True, size=8 * (1 + 2 * size))
+        segment.buf[:] = bytes(segment.size)
+        table = cls(segment, owner=True)
+        table._words[0] = size
+        table.capacity = size
+        table._index_mask = size - 1
+        return table
+
+    @classmethod
+    def attach(cls, name):
+        """Open a table created by another process."""
+        from multiprocessing import shared_memory
+
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self._segment.name
+
+    def lookup(self, key):
+        slot = 1 + 2 * (key & self._index_mask)
+        data = self._words[slot + 1]
+        if data & _VALID and self._words[slot] ^ data == key:
+            value = data & 0xFFFFFFFF
+            return value - (1 << 32) if value >= 1 << 31 else value, data >> 32 & 0xFFFF, data >> 48 & 0xFF
+        return None
+
+    def store(self, key, value, depth, flag=EXACT):
+        slot = 1 + 2 * (key & self._index_mask)
+        stored = self._words[slot + 1]
+        if stored & _VALID and self._words[slot] ^ stored != key and (stored >> 32 & 0xFFFF) > depth:
+            return
+        data = _VALID | flag << 48 | depth << 32 | value & 0xFFFFFFFF
+        self._words[slot + 1] = data
+        self._words[slot] = key ^ data
+
+    def __len__(self):
+        return sum(1 for slot in range(2, 2 + 2 * self.capacity, 2) if self._words[slot] & _VALID)
+
+    def close(self):
+        self._words.release()
+        self._segment.close()
+
+    def unlink(self):
+        """Close the table and free the segment; only the creating process should call this."""
+        self.close()
+        if self._owner:
+            self._segment.unlink()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_shared_table = None
+
+
+def _geometry_salt(geometry):
+    return random.Random(repr(geometry)).getrandbits(64)
+
+
+def solution_cache(*, rows, cols, connections_to_win, gravity, key_kind, capacity=2 ** 20):
+    """Return the process-wide cache of a geometry and key kind, creating it with ``capacity`` on first use."""
+    geometry = (rows, cols, connections_to_win, gravity, key_kind)
+    with _caches_lock:
+        cache = _caches.get(geometry)
+        if cache is None:
+            cache = _caches[geometry] = SolutionCache(capacity=capacity, shared=_shared_table,
+                                                      salt=_geometry_salt(geometry))
+        return cache
+
+
+def use_shared_memory(name):
+    """Back every cache of this process with the :class:`SharedSolutionTable` called ``name``, or none."""
+    global _shared_table
+    with _caches_lock:
+        if _shared_table is not None and (name is None or _shared_table.name != name):
+            for cache in _caches.values():
+                cache.shared = None
+            _shared_table.close()
+            _shared_table = None
+        if name is not None and _shared_table is None:
+            _shared_table = SharedSolutionTable.attach(name)
+            for cache in _caches.values():
+                cache.shared = _shared_table
+
+
+def clear_caches():
+    """Forget every cache of this process."""
+    with _caches_lock:
+        _caches.clear()
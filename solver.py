@@ -0,0 +1,241 @@
+"""Offline retrograde solver producing an opening book for any board geometry.
+
+The solver first enumerates the positions reachable from the empty board one layer (number of pieces) at a
+time, writing every layer to its own file. It then walks the layers backwards, computing for every position
+whether the side to move wins, draws or loses with best play and in how many plies the game ends. Only the
+layer being computed and the values of the layer after it are held in memory, and nothing is recursive. Book
+records are written to a sorted file per layer as well, and merged into the book at the end.
+
+Positions use the usual alternation, player one moving when the piece count is even. Run
+``python solver.py --rows 3 --cols 3 --connect 3 --out book.bin`` to build a book, adding ``--gravity`` for the
+Connect-Four rules where pieces drop to the bottom of their column.
+"""
+
+from array import array
+from functools import lru_cache
+import heapq
+import os
+
+from board import EMPTY_CELL, PLAYER_ONE, PLAYER_TWO, line_masks, playable_cells, zobrist_keys
+from value_store import KEY_BOOK, ValueStore, write_sorted_store
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+MAX_CELLS = 32
+_CHUNK_RECORDS = 65536
+
+
+def encode_book_value(result, distance):
+    """Pack a result for the side to move and the plies until the game ends into one stored value."""
+    return result * 1000 + distance
+
+
+def decode_book_value(value):
+    result = round(value / 1000)
+    return result, int(value - result * 1000)
+
+
+def _layer_path(work_dir, pieces):
+    return os.path.join(work_dir, f'layer_{pieces:03d}.pos')
+
+
+def _book_paths(work_dir, pieces):
+    """Paths of the sorted book keys and of their values for the positions with ``pieces`` pieces."""
+    return (os.path.join(work_dir, f'book_{pieces:03d}.keys'), os.path.join(work_dir, f'book_{pieces:03d}.values'))
+
+
+def _read_book_layer(work_dir, pieces):
+    keys_path, values_path = _book_paths(work_dir, pieces)
+    return zip(_read_array(keys_path, 'Q'), _read_array(values_path, 'd'))
+
+
+def _write_array(path, typecode, values):
+    with open(path, 'wb') as layer_file:
+        array(typecode, values).tofile(layer_file)
+
+
+def _read_array(path, typecode):
+    """Yield the items of a file written by :func:`_write_array`, a chunk at a time."""
+    with open(path, 'rb') as layer_file:
+        while True:
+            chunk = array(typecode)
+            chunk.frombytes(layer_file.read(chunk.itemsize * _CHUNK_RECORDS))
+            if not chunk:
+                return
+            yield from chunk
+
+
+def _has_line(mask, all_lines):
+    for line in all_lines:
+        if mask & line == line:
+            return True
+    return False
+
+
+def _free_cells(occupied, cell_mask, rows, cols, gravity):
+    """Return the mask of the cells the next piece can go to."""
+    if not gravity:
+        return cell_mask & ~occupied
+    mask = 0
+    for cell in playable_cells(occupied, rows=rows, cols=cols, gravity=True):
+        mask |= 1 << cell
+    return mask
+
+
+def solve(*, rows, cols, connections_to_win, book_path=None, book_depth=None, work_dir=None, gravity=False):
+    """Solve a geometry and return a summary; optionally write an opening book to ``book_path``.
+
+    The book holds every position with at most ``book_depth`` pieces (all of them by default), keyed by the
+    position's ``Board.zobrist_key()``; without ``book_path`` no book records are kept. Layer files go to
+    ``work_dir``, or to a temporary directory that is removed afterwards. With ``gravity`` only the lowest empty
+    cell of each column can be played.
+    """
+    size = rows * cols
+    if size > MAX_CELLS:
+        raise ValueError(f"The solver supports boards of up to {MAX_CELLS} cells, got {size}")
+    if work_dir is None:
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            return solve(rows=rows, cols=cols, connections_to_win=connections_to_win, book_path=book_path,
+                         book_depth=book_depth, work_dir=temporary_dir, gravity=gravity)
+
+    _, all_lines = line_masks(rows, cols, connections_to_win)
+    cell_mask = (1 << size) - 1
+    # A position is packed as player one's mask in the low bits and player two's mask above it
+    layer_sizes = _enumerate_layers(rows, cols, gravity, all_lines, work_dir)
+
+    cell_keys, side_keys = zobrist_keys(rows, cols)
+    if book_path is None:
+        book_depth = -1
+    else:
+        book_depth = len(layer_sizes) - 1 if book_depth is None else min(book_depth, len(layer_sizes) - 1)
+    book_entries = 0
+    next_values = {}
+    for pieces in range(len(layer_sizes) - 1, -1, -1):
+        mover, waiting = (PLAYER_ONE, PLAYER_TWO) if pieces % 2 == 0 else (PLAYER_TWO, PLAYER_ONE)
+        mover_shift = 0 if mover == PLAYER_ONE else size
+        values = {}
+        book = []
+        for packed in _read_array(_layer_path(work_dir, pieces), 'Q'):
+            masks = (EMPTY_CELL, packed & cell_mask, packed >> size)
+            if _has_line(masks[waiting], all_lines):
+                result, distance = LOSS, 0
+            elif pieces == size:
+                result, distance = DRAW, 0
+            else:
+                best = None
+                free = _free_cells(masks[PLAYER_ONE] | masks[PLAYER_TWO], cell_mask, rows, cols, gravity)
+                while free:
+                    bit = free & -free
+                    free ^= bit
+                    child_result, child_distance = next_values[packed | bit << mover_shift]
+                    result, distance = -child_result, child_distance + 1
+                    # Prefer wins, then draws, then losses; win fast, lose slowly
+                    rank = (result, -distance if result != LOSS else distance)
+                    if best is None or rank > best[0]:
+                        best = (rank, result, distance)
+                _, result, distance = best
+            values[packed] = (result, distance)
+            if pieces <= book_depth:
+                key = side_keys[mover]
+                for player in (PLAYER_ONE, PLAYER_TWO):
+                    mask = masks[player]
+                    while mask:
+                        bit = mask & -mask
+                        mask ^= bit
+                        key ^= cell_keys[bit.bit_length() - 1][player]
+                book.append((key, encode_book_value(result, distance)))
+        if pieces <= book_depth:
+            book.sort()
+            keys_path, values_path = _book_paths(work_dir, pieces)
+            _write_array(keys_path, 'Q', [key for key, _ in book])
+            _write_array(values_path, 'd', [value for _, value in book])
+            book_entries += len(book)
+        next_values = values
+
+    if book_path is not None:
+        records = heapq.merge(*(_read_book_layer(work_dir, pieces) for pieces in range(book_depth + 1)))
+        write_sorted_store(book_path, records, count=book_entries, rows=rows, cols=cols,
+                           connections_to_win=connections_to_win, key_kind=KEY_BOOK, gravity=gravity)
+    root_result, root_distance = next_values[0]
+    return {'layer_sizes': layer_sizes, 'positions': sum(layer_sizes), 'result': root_result,
+            'distance': root_distance, 'book_entries': book_entries}
+
+
+def _enumerate_layers(rows, cols, gravity, all_lines, work_dir):
+    """Write the sorted positions of every layer to ``work_dir`` and return the layer sizes."""
+    size = rows * cols
+    cell_mask = (1 << size) - 1
+    _write_array(_layer_path(work_dir, 0), 'Q', [0])
+    layer_sizes = [1]
+    for pieces in range(size):
+        mover_shift = 0 if pieces % 2 == 0 else size
+        waiting_shift = size - mover_shift
+        children = set()
+        for packed in _read_array(_layer_path(work_dir, pieces), 'Q'):
+            if _has_line(packed >> waiting_shift & cell_mask, all_lines):
+                continue  # The game is already over
+            free = _free_cells((packed | packed >> size) & cell_mask, cell_mask, rows, cols, gravity)
+            while free:
+                bit = free & -free
+                free ^= bit
+                children.add(packed | bit << mover_shift)
+        if not children:
+            break
+        _write_array(_layer_path(work_dir, pieces + 1), 'Q', sorted(children))
+        layer_sizes.append(len(children))
+    return layer_sizes
+
+
+@lru_cache(maxsize=None)
+def open_book(path, rows, cols, connections_to_win, gravity=False):
+    """Open an opening book once per process and geometry."""
+    return ValueStore(path, rows=rows, cols=cols, connections_to_win=connections_to_win, key_kind=KEY_BOOK,
+                      gravity=gravity)
+
+
+def book_move(path, board):
+    """Return the best move for the side to move according to the book at ``path``, or ``None``.
+
+    ``None`` means the book does not cover every reply, and the caller should search instead.
+    """
+    book = open_book(path, board.rows, board.cols, board.connections_to_win, board.gravity)
+    best = None
+    for row, col in board.available_moves():
+        board.play_move(row=row, col=col)
+        board.next_player()
+        value = book.get(board.zobrist_key())
+        board.undo_move(row=row, col=col)
+        if value is None:
+            return None
+        child_result, child_distance = decode_book_value(value)
+        result, distance = -child_result, child_distance + 1
+        rank = (result, -distance if result != LOSS else distance)
+        if best is None or rank > best[0]:
+            best = (rank, (row, col))
+    return None if best is None else best[1]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Solve a board geometry and write an opening book')
+    parser.add_argument('--rows', type=int, default=3)
+    parser.add_argument('--cols', type=int, default=3)
+    parser.add_argument('--connect', type=int, default=3, help='Connections needed to win')
+    parser.add_argument('--out', required=True, help='Path of the opening book to write')
+    parser.add_argument('--book-depth', type=int, default=None, help='Only keep positions with up to this many pieces')
+    parser.add_argument('--work-dir', default=None, help='Directory for the per-layer files (default: temporary)')
+    parser.add_argument('--gravity', action='store_true', help='Pieces drop to the bottom of their column')
+    args = parser.parse_args()
+    summary = solve(rows=args.rows, cols=args.cols, connections_to_win=args.connect, book_path=args.out,
+                    book_depth=args.book_depth, work_dir=args.work_dir, gravity=args.gravity)
+    outcome = {WIN: 'first player wins', DRAW: 'draw', LOSS: 'second player wins'}[summary['result']]
+    print(f"{summary['positions']} positions in {len(summary['layer_sizes'])} layers: {outcome} "
+          f"in {summary['distance']} plies; {summary['book_entries']} book entries written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
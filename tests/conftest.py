@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import BOARD_TYPES
+
+
+@pytest.fixture(params=sorted(BOARD_TYPES))
+def board_cls(request):
+    return BOARD_TYPES[request.param]
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import arena
+from tic_tac_toe import TicTacToe
+
+
+def test_wilson_interval_and_percentile():
+    low, high = arena.wilson_interval(5, 10)
+    assert 0.2 < low < 0.5 < high < 0.8
+    assert arena.wilson_interval(0, 0) == (0.0, 1.0)
+    assert arena.percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    assert arena.percentile([1.0, 2.0, 3.0, 4.0], 1.0) == 4.0
+
+
+def test_schedule_alternates_colours():
+    tasks = arena.schedule_games(players=['random_player', 'mcts_player', 'alphabeta_player'], games=4,
+                                 geometries=[(3, 3, 3), (4, 4, 3)])
+    assert len(tasks) == 2 * 3 * 4
+    first_pairing = [task for task in tasks if task['pair'] == ('random_player', 'mcts_player')][:4]
+    assert [task['player_one'] for task in first_pairing] == ['random_player', 'mcts_player'] * 2
+    assert len({task['seed'] for task in tasks}) == len(tasks)
+
+
+def test_run_arena_reports_every_game():
+    report = arena.run_arena(players=['random_player', 'alphabeta_player'], games=6, geometries=[(3, 3, 3)])
+    assert report['games'] == 6
+    (pairing,) = report['pairings']
+    assert pairing['wins'] + pairing['draws'] + pairing['losses'] == 6
+    assert pairing['wins'] == 0  # The random player never beats alpha-beta
+    assert {row['player'] for row in report['players']} == {'random_player', 'alphabeta_player'}
+    assert all(row['moves'] > 0 and row['latency_ms']['max'] >= row['latency_ms']['p50'] for row in report['players'])
+
+
+def test_headless_game_on_larger_board_with_player_options():
+    game = TicTacToe(player_one='mc_player', player_two='random_player', display_board=False, rows=4, cols=5,
+                     connections_to_win=4, player_options={'mc_player': {'num_simulations': 20, 'engine': 'batch'}})
+    assert game.current_player.num_simulations == 20
+    winner = game.play_game()
+    assert winner in (None, 1, 2)
+    assert len(game.move_times) == sum(1 for column in game.board.board for cell in column if cell)
+
+
+def test_parse_player_options():
+    options = arena.parse_player_options(['mc_player.num_simulations=200', 'mc_player.engine=batch'])
+    assert options == {'mc_player': {'num_simulations': 200, 'engine': 'batch'}}
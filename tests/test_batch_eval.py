@@ -0,0 +1,54 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from batch_eval import BatchEvaluator
+from board import BitBoard, Board, EMPTY_CELL, PLAYER_ONE, PLAYER_TWO
+
+
+def random_boards(rows, cols, connections_to_win, gravity, count, seed):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+        for _ in range(rng.randrange(rows * cols + 1)):
+            if board.game_has_ended()[0]:
+                break
+            row, col = board.random_move(rng)
+            board.play_move(row=row, col=col)
+            board.next_player()
+        boards.append(board)
+    return boards
+
+
+@pytest.mark.parametrize('geometry', [(3, 3, 3, False), (4, 5, 3, False), (6, 7, 4, True)])
+def test_batch_matches_board_evaluation(geometry):
+    rows, cols, connections_to_win, gravity = geometry
+    boards = random_boards(rows, cols, connections_to_win, gravity, 300, seed=rows * cols)
+    evaluator = BatchEvaluator(rows=rows, cols=cols, connections_to_win=connections_to_win, gravity=gravity)
+    grid_result = evaluator.evaluate([board.board for board in boards])
+    assert evaluator.evaluate_boards(boards) == grid_result
+    for board, terminal, winner, legal in zip(boards, *grid_result):
+        game_ended, there_is_winner = board.game_has_ended()
+        assert terminal == game_ended
+        last_mover = PLAYER_TWO if board.current_player == PLAYER_ONE else PLAYER_ONE
+        assert winner == (last_mover if there_is_winner else EMPTY_CELL)
+        assert legal == sum(1 << col * rows + row for row, col in board.available_moves())
+
+
+def test_masks_and_edge_cases():
+    evaluator = BatchEvaluator(rows=3, cols=3, connections_to_win=3)
+    column = 0b111  # cells 0-2, the first column
+    terminal, winners, legal = evaluator.evaluate_masks([(column, 0b1000), (0, 0), (0b11000, column)])
+    assert terminal == [True, False, True]
+    assert winners == [PLAYER_ONE, EMPTY_CELL, PLAYER_TWO]
+    assert legal == [0b111110000, 0b111111111, 0b111100000]
+    assert evaluator.evaluate([]) == ([], [], [])
+    with pytest.raises(ValueError):
+        evaluator.evaluate([Board(rows=3, cols=4, connections_to_win=3).board])
+    with pytest.raises(ValueError):
+        evaluator.evaluate_masks([(1 << 9, 0)])
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+import bench_suite
+
+
+def test_run_suite_writes_summaries():
+    report = bench_suite.run_suite(repeats=2, warmup=0, calls=10, select='board.bitboard.3x3k3.')
+    assert set(report['results']) == {f'board.bitboard.3x3k3.{op}' for op in bench_suite.BOARD_OPS}
+    result = report['results']['board.bitboard.3x3k3.game_has_ended']
+    assert len(result['samples']) == 2 and result['min'] <= result['median'] <= result['max']
+    assert result['unit'] == 'ns/op' and not result['higher_is_better']
+
+
+def test_compare_flags_regressions_in_both_directions():
+    def report(**medians):
+        return {'results': {name: {'median': median, 'higher_is_better': name.endswith('per_s')}
+                            for name, median in medians.items()}}
+
+    baseline = report(op=100.0, nodes_per_s=1000.0, removed=1.0)
+    current = report(op=125.0, nodes_per_s=950.0, added=1.0)
+    rows = {row[0]: row for row in bench_suite.compare(current, baseline, threshold=0.1)}
+    assert set(rows) == {'op', 'nodes_per_s'}
+    assert rows['op'][3] == 0.25 and rows['op'][4]
+    assert abs(rows['nodes_per_s'][3] - 0.05) < 1e-9 and not rows['nodes_per_s'][4]
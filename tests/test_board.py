@@ -4,18 +4,25 @@ import pytest
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from board import Board, PLAYER_ONE, PLAYER_TWO, EMPTY_CELL
+import copy
+import pickle
+import random
+
+from array import array
+
+from board import (Board, BitBoard, PLAYER_ONE, PLAYER_TWO, EMPTY_CELL, canonical_key, inverse_transform_move,
+                   symmetry_transforms, transform_move, code_width, decode_boards, encode_boards, unpack_codes)
 
 
 def set_board_state(board, rows):
     """Helper to set board state using row-major list of lists."""
     for r, row in enumerate(rows):
         for c, value in enumerate(row):
-            board.board[c][r] = value
+            board.set_cell(row=r, col=c, value=value)
 
 
-def test_str_and_repr():
-    board = Board(rows=3, cols=3, connections_to_win=3)
+def test_str_and_repr(board_cls):
+    board = board_cls(rows=3, cols=3, connections_to_win=3)
     state = [
         [PLAYER_ONE, PLAYER_TWO, EMPTY_CELL],
         [EMPTY_CELL, PLAYER_ONE, EMPTY_CELL],
@@ -35,8 +42,8 @@ def test_str_and_repr():
     assert repr(board) == "1|102|210|002"
 
 
-def test_next_player_and_play_move():
-    board = Board(rows=3, cols=3, connections_to_win=3)
+def test_next_player_and_play_move(board_cls):
+    board = board_cls(rows=3, cols=3, connections_to_win=3)
     assert board.current_player == PLAYER_ONE
     board.play_move(row=0, col=0)
     assert board.board[0][0] == PLAYER_ONE
@@ -46,8 +53,8 @@ def test_next_player_and_play_move():
     assert board.board[1][1] == PLAYER_TWO
 
 
-def test_horizontal_vertical_diagonal_wins():
-    board = Board(rows=3, cols=3, connections_to_win=3)
+def test_horizontal_vertical_diagonal_wins(board_cls):
+    board = board_cls(rows=3, cols=3, connections_to_win=3)
     # horizontal win on first row
     state = [
         [PLAYER_ONE, PLAYER_ONE, PLAYER_ONE],
@@ -89,8 +96,8 @@ def test_horizontal_vertical_diagonal_wins():
     assert board.game_has_ended() == (True, True)
 
 
-def test_draw_condition():
-    board = Board(rows=3, cols=3, connections_to_win=3)
+def test_draw_condition(board_cls):
+    board = board_cls(rows=3, cols=3, connections_to_win=3)
     state = [
         [PLAYER_ONE, PLAYER_TWO, PLAYER_ONE],
         [PLAYER_TWO, PLAYER_ONE, PLAYER_TWO],
@@ -98,3 +105,205 @@ def test_draw_condition():
     ]
     set_board_state(board, state)
     assert board.game_has_ended() == (True, False)
+
+
+@pytest.mark.parametrize('rows,cols,connections_to_win', [(3, 3, 3), (4, 4, 3), (6, 7, 4)])
+def test_bitboard_matches_list_board_on_random_games(rows, cols, connections_to_win):
+    rng = random.Random(1234)
+    for _ in range(50):
+        list_board = Board(rows=rows, cols=cols, connections_to_win=connections_to_win)
+        bit_board = BitBoard(rows=rows, cols=cols, connections_to_win=connections_to_win)
+        moves = [(row, col) for col in range(cols) for row in range(rows)]
+        rng.shuffle(moves)
+        for row, col in moves:
+            for board in (list_board, bit_board):
+                board.play_move(row=row, col=col)
+                board.next_player()
+            assert bit_board.game_has_ended() == list_board.game_has_ended()
+            if list_board.game_has_ended()[0]:
+                break
+
+
+def test_bitboard_tracks_set_cell():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=0, col=0)
+    board.play_move(row=0, col=1)
+    board.play_move(row=0, col=2)
+    assert board.game_has_ended() == (True, True)
+    board.set_cell(row=0, col=2, value=EMPTY_CELL)  # Undo the last move
+    assert board.game_has_ended() == (False, False)
+    board.set_cell(row=0, col=2, value=PLAYER_TWO)
+    assert board.game_has_ended() == (False, False)
+    assert repr(board) == "1|100|100|200"
+
+
+def test_bitboard_undo_never_forgets_whether_a_line_is_complete():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    for row, col in [(0, 0), (1, 1), (0, 1)]:
+        board.play_move(row=row, col=col)
+        board.next_player()
+        board.play_move(row=2, col=2)
+        board.undo_move(row=2, col=2)
+        assert board._no_line is True
+    board.next_player()
+    board.play_move(row=0, col=2)
+    board.play_move(row=2, col=0)  # the second unchecked move settles the first one, which completed the top row
+    assert board._no_line is False
+    board.undo_move(row=2, col=0)
+    assert board.game_has_ended() == (True, True)
+
+
+def test_copy_and_pickle_rebuild_the_board(board_cls):
+    board = board_cls(rows=4, cols=5, connections_to_win=3, gravity=True)
+    for col in [0, 0, 1, 1]:
+        board.play_move(row=board.drop_row(col), col=col)
+        board.next_player()
+    for copied in [copy.deepcopy(board), pickle.loads(pickle.dumps(board))]:
+        assert type(copied) is board_cls and copied.gravity
+        assert repr(copied) == repr(board) and copied.zobrist_key() == board.zobrist_key()
+        assert copied.available_moves() == board.available_moves()
+        copied.play_move(row=copied.drop_row(2), col=2)
+        assert copied.game_has_ended() == (True, True) and board.game_has_ended() == (False, False)
+        copied.undo_move(row=copied.drop_row(2) + 1, col=2)
+        assert copied.state_code() == board.state_code()
+
+
+def test_available_moves_follow_moves_and_undo(board_cls):
+    board = board_cls(rows=3, cols=4, connections_to_win=3)
+    every_move = [(row, col) for col in range(4) for row in range(3)]
+    assert board.available_moves() == every_move
+    board.play_move(row=1, col=2)
+    board.next_player()
+    board.play_move(row=0, col=0)
+    board.next_player()
+    assert board.available_moves() == [move for move in every_move if move not in [(1, 2), (0, 0)]]
+    assert sorted(board.empty_cells) == [1, 2, 3, 4, 5, 6, 8, 9, 10, 11]
+
+    board.undo_move(row=0, col=0)
+    assert board.current_player == PLAYER_TWO
+    board.undo_move(row=1, col=2)
+    assert board.current_player == PLAYER_ONE
+    assert board.available_moves() == every_move
+    assert board.zobrist_key() == board_cls(rows=3, cols=4, connections_to_win=3).zobrist_key()
+
+    board.set_cell(row=2, col=3, value=PLAYER_TWO)  # set_cell keeps the moves up to date as well
+    assert (2, 3) not in board.available_moves()
+
+
+def test_undo_move_restores_game_state(board_cls):
+    rng = random.Random(99)
+    for _ in range(30):
+        board = board_cls(rows=4, cols=4, connections_to_win=3)
+        played = []
+        while not board.game_has_ended()[0]:
+            row, col = board.random_move(rng)
+            board.play_move(row=row, col=col)
+            board.next_player()
+            played.append((row, col, board.game_has_ended()))
+        for row, col, state in reversed(played):
+            assert board.game_has_ended() == state
+            board.undo_move(row=row, col=col)
+        assert board.game_has_ended() == (False, False)
+        assert len(board.empty_cells) == 16
+
+
+def test_undo_move_rejects_empty_cells(board_cls):
+    board = board_cls(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=1, col=1)
+    with pytest.raises(ValueError):
+        board.undo_move(row=0, col=0)
+    board.undo_move(row=1, col=1)
+    with pytest.raises(ValueError):
+        board.undo_move(row=1, col=1)
+    assert len(board.empty_cells) == 9 and board.current_player == PLAYER_ONE
+
+
+def test_random_move_only_returns_empty_cells(board_cls):
+    board = board_cls(rows=3, cols=3, connections_to_win=3)
+    for row, col in [(0, 0), (1, 1), (2, 2), (0, 1)]:
+        board.play_move(row=row, col=col)
+        board.next_player()
+    rng = random.Random(5)
+    assert {board.random_move(rng) for _ in range(200)} == set(board.available_moves())
+
+
+def test_symmetry_group_sizes():
+    assert len(symmetry_transforms(3, 3)) == 8
+    assert len(symmetry_transforms(3, 4)) == 4
+    for transform in symmetry_transforms(4, 3):
+        assert sorted(transform) == list(range(12))
+
+
+def test_canonical_key_is_shared_by_symmetric_positions(board_cls):
+    corner = board_cls(rows=3, cols=3, connections_to_win=3)
+    corner.play_move(row=0, col=0)
+    keys = set()
+    for row, col in [(0, 0), (0, 2), (2, 0), (2, 2)]:
+        board = board_cls(rows=3, cols=3, connections_to_win=3)
+        board.play_move(row=row, col=col)
+        keys.add(canonical_key(board)[0])
+    assert len(keys) == 1
+
+    edge = board_cls(rows=3, cols=3, connections_to_win=3)
+    edge.play_move(row=0, col=1)
+    assert canonical_key(edge)[0] not in keys
+    corner.next_player()
+    assert canonical_key(corner)[0] not in keys
+
+
+def test_transform_move_round_trip():
+    for rows, cols in [(3, 3), (3, 4)]:
+        for transform in range(len(symmetry_transforms(rows, cols))):
+            for col in range(cols):
+                for row in range(rows):
+                    image = transform_move((row, col), transform, rows=rows, cols=cols)
+                    assert inverse_transform_move(image, transform, rows=rows, cols=cols) == (row, col)
+
+
+def test_canonical_transform_maps_board_onto_canonical_image():
+    board = Board(rows=3, cols=4, connections_to_win=3)
+    board.play_move(row=2, col=3)
+    key, transform = canonical_key(board)
+    row, col = transform_move((2, 3), transform, rows=3, cols=4)
+    image = Board(rows=3, cols=4, connections_to_win=3)
+    image.play_move(row=row, col=col)
+    assert image.zobrist_key() == key
+
+
+def test_state_code_tracks_moves_and_rebuilds_board(board_cls):
+    rng = random.Random(4)
+    board = board_cls(rows=4, cols=5, connections_to_win=3)
+    codes = {board.state_code()}
+    while not board.game_has_ended()[0]:
+        row, col = board.random_move(rng)
+        board.play_move(row=row, col=col)
+        board.next_player()
+        fresh = Board(rows=4, cols=5, connections_to_win=3, board=[list(column) for column in board.board],
+                      player_to_move=board.current_player)
+        assert board.state_code() == fresh.state_code()
+        codes.add(board.state_code())
+        rebuilt = board_cls.from_code(board.state_code(), rows=4, cols=5, connections_to_win=3)
+        assert repr(rebuilt) == repr(board) and rebuilt.zobrist_key() == board.zobrist_key()
+    board.undo_move(row=row, col=col)
+    assert board.state_code() in codes
+    assert board.state_code() & 1 == (board.current_player == PLAYER_TWO)
+
+    with pytest.raises(ValueError):
+        Board.from_code(3 << 1, rows=4, cols=5, connections_to_win=3)  # cell value 3
+
+
+def test_bulk_encode_and_decode():
+    boards = []
+    for moves in range(5):
+        board = Board(rows=3, cols=3, connections_to_win=3)
+        for row, col in [(1, 1), (0, 0), (2, 2), (0, 2)][:moves]:
+            board.play_move(row=row, col=col)
+            board.next_player()
+        boards.append(board)
+    data = encode_boards(boards)
+    assert len(data) == 5 * code_width(3, 3) == 5 * 3
+    decoded = decode_boards(data, rows=3, cols=3, connections_to_win=3, board_cls=BitBoard)
+    assert [repr(board) for board in decoded] == [repr(board) for board in boards]
+    assert unpack_codes(array('B', data), rows=3, cols=3) == [board.state_code() for board in boards]
+    with pytest.raises(ValueError):
+        unpack_codes(data[:-1], rows=3, cols=3)
@@ -0,0 +1,75 @@
+import io
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import BitBoard
+from instrumentation import measure_move
+from players import DynamicProgrammingPlayer, MCTSPlayer, MonteCarloPlayer, SimpleMinimaxPlayer
+from tic_tac_toe import TicTacToe
+
+
+def timed_move(player, board):
+    with measure_move(player, board) as stats:
+        move = player.play(board=board)
+    return move, stats
+
+
+@pytest.mark.parametrize('make_player', [
+    lambda: SimpleMinimaxPlayer(position=1, time_budget_ms=50, check_interval=64),
+    lambda: DynamicProgrammingPlayer(position=1, time_budget_ms=50, check_interval=64),
+    lambda: MCTSPlayer(position=1, iterations=10 ** 7, time_budget_ms=50),
+    lambda: MonteCarloPlayer(position=1, num_simulations=10 ** 7, time_budget_ms=50),
+    lambda: MonteCarloPlayer(position=1, num_simulations=10 ** 7, time_budget_ms=50, seed=1),
+])
+def test_time_budget_returns_a_legal_move_in_time(make_player):
+    # Full searches of an empty 4x4 board take far longer than the budget
+    board = BitBoard(rows=4, cols=4, connections_to_win=3)
+    move, stats = timed_move(make_player(), board)
+    assert move in board.available_moves()
+    assert stats.seconds < 0.5
+
+
+def test_node_budget_is_deterministic():
+    board = BitBoard(rows=4, cols=4, connections_to_win=3)
+    moves = set()
+    for _ in range(2):
+        random.seed(5)
+        move, stats = timed_move(MCTSPlayer(position=1, iterations=10 ** 6, node_budget=200), board)
+        moves.add(move)
+        assert stats.rollouts == 200
+    assert len(moves) == 1
+
+    move, stats = timed_move(MonteCarloPlayer(position=1, num_simulations=10 ** 6, node_budget=320, seed=2), board)
+    assert stats.rollouts == 320  # 20 simulations after each of the 16 moves
+    assert move == timed_move(MonteCarloPlayer(position=1, num_simulations=10 ** 6, node_budget=320, seed=2),
+                              board)[0]
+
+    _, stats = timed_move(SimpleMinimaxPlayer(position=1, node_budget=1000), board)
+    assert stats.nodes <= 1000 + len(board.available_moves())
+
+
+def test_unlimited_budget_keeps_the_exact_search():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    for row, col in ((0, 0), (1, 1), (0, 1)):
+        board.play_move(row=row, col=col)
+        board.next_player()
+    assert SimpleMinimaxPlayer(position=2, node_budget=10 ** 6).play(board=board) == (0, 2)
+
+
+def test_game_reports_the_budget():
+    game = TicTacToe(player_one='mcts_player', player_two='random_player', display_board=False, rows=4, cols=4,
+                     player_options={'mcts_player': {'iterations': 10 ** 7}}, stats_output=io.StringIO(),
+                     time_budget_ms=30)
+    assert game.current_player.time_budget_ms == 30
+    start = time.perf_counter()
+    game.play_game()
+    assert time.perf_counter() - start < 8 * 0.2
+    records = game.move_stats
+    assert all(record['time_budget_ms'] == 30 for record in records)
+    assert [record['within_budget'] for record in records].count(False) == len(game.over_budget)
@@ -0,0 +1,143 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import (BitBoard, Board, EMPTY_CELL, canonical_key, playable_cells,
+                   symmetry_transforms)
+from players import AlphaBetaPlayer
+from rollout import RolloutEngine
+import solver
+from tic_tac_toe import TicTacToe
+from value_store import KEY_ZOBRIST, ValueStore, write_store
+
+
+def assert_stacked(board):
+    """Every column is filled from its bottom (last) row upwards, without gaps."""
+    for column in board.board:
+        height = sum(value != EMPTY_CELL for value in column)
+        assert all(value == EMPTY_CELL for value in column[:board.rows - height])
+
+
+def test_moves_are_column_drops(board_cls):
+    board = board_cls(rows=6, cols=7, connections_to_win=4, gravity=True)
+    assert board.available_moves() == [(5, col) for col in range(7)]
+    for _ in range(6):
+        board.play_move(row=board.drop_row(3), col=3)
+        board.next_player()
+    assert board.drop_row(3) == -1
+    assert (3 not in [col for _, col in board.available_moves()]) and len(board.available_moves()) == 6
+    board.undo_move(row=0, col=3)
+    assert board.available_moves()[3] == (0, 3)
+    for row, col in (board.random_move() for _ in range(20)):
+        assert row == board.drop_row(col)
+
+
+def test_bitboard_matches_list_board_on_random_gravity_games():
+    rng = random.Random(7)
+    for _ in range(30):
+        list_board = Board(rows=6, cols=7, connections_to_win=4, gravity=True)
+        bit_board = BitBoard(rows=6, cols=7, connections_to_win=4, gravity=True)
+        while not list_board.game_has_ended()[0]:
+            row, col = list_board.random_move(rng)
+            for board in (list_board, bit_board):
+                board.play_move(row=row, col=col)
+                board.next_player()
+            assert bit_board.game_has_ended() == list_board.game_has_ended()
+        assert_stacked(list_board)
+
+
+def test_playable_cells_and_symmetry():
+    occupied = 0b111 << 3 | 0b100  # column 1 full, one piece at the bottom of column 0
+    assert playable_cells(occupied, rows=3, cols=3) == [0, 1, 6, 7, 8]
+    assert playable_cells(occupied, rows=3, cols=3, gravity=True) == [1, 8]
+    assert symmetry_transforms(3, 3, True) == symmetry_transforms(3, 3)[:2]
+
+    left = Board(rows=4, cols=5, connections_to_win=3, gravity=True)
+    left.play_move(row=3, col=0)
+    right = Board(rows=4, cols=5, connections_to_win=3, gravity=True)
+    right.play_move(row=3, col=4)
+    assert canonical_key(left)[0] == canonical_key(right)[0]
+
+
+def test_gravity_rollouts_only_drop_pieces():
+    # In a single column of five the pieces alternate when dropped, so nobody gets three in a row
+    board = Board(rows=5, cols=1, connections_to_win=3, gravity=True)
+    engine = RolloutEngine(rows=5, cols=1, connections_to_win=3, rng=random.Random(3), gravity=True)
+    assert engine.run(board, 200) == (0, 200, 0)
+    free_engine = RolloutEngine(rows=5, cols=1, connections_to_win=3, rng=random.Random(3))
+    assert free_engine.run(Board(rows=5, cols=1, connections_to_win=3), 200)[1] < 200
+
+
+@pytest.mark.parametrize('player,options', [
+    ('alphabeta_player', {'time_budget_ms': 200}),
+    ('mcts_player', {'iterations': 300}),
+    ('mc_player', {'num_simulations': 30}),
+    ('mc_player', {'num_simulations': 30, 'engine': 'batch'}),
+    ('dp_player', {}),
+    ('minimax_player', {}),
+    ('td_player', {'training_episodes': 500}),
+    ('random_player', {}),
+])
+def test_players_only_make_legal_drops(player, options):
+    rows, cols = (3, 4) if player in ('td_player', 'minimax_player', 'dp_player') else (6, 7)
+    game = TicTacToe(player_one=player, player_two='random_player', display_board=False, board_type='bitboard',
+                     rows=rows, cols=cols, connections_to_win=3, gravity=True, player_options={player: options})
+    legal = []
+    for side in (game.current_player, game.next_player):
+        original_play = side.play
+
+        def checked_play(*, board, original_play=original_play):
+            move = original_play(board=board)
+            legal.append(move in board.available_moves())
+            return move
+        side.play = checked_play
+    game.play_game()
+    assert legal and all(legal)
+    assert_stacked(game.board)
+
+
+def test_gravity_book_and_store_flag(tmp_path):
+    book_path = str(tmp_path / 'book.bin')
+    summary = solver.solve(rows=3, cols=4, connections_to_win=3, book_path=book_path, gravity=True)
+    assert summary['layer_sizes'][1] == 4  # one opening drop per column
+    with pytest.raises(ValueError, match='gravity'):
+        solver.open_book(book_path, 3, 4, 3)
+
+    board = Board(rows=3, cols=4, connections_to_win=3, gravity=True)
+    move = solver.book_move(book_path, board)
+    assert move in board.available_moves()
+
+    store_path = str(tmp_path / 'values.bin')
+    write_store(store_path, [(1, 0.0)], rows=3, cols=3, connections_to_win=3, key_kind=KEY_ZOBRIST)
+    with pytest.raises(ValueError, match='gravity'):
+        ValueStore(store_path, rows=3, cols=3, connections_to_win=3, key_kind=KEY_ZOBRIST, gravity=True)
+
+
+def test_alpha_beta_plays_solved_results_with_gravity(tmp_path):
+    book_path = str(tmp_path / 'book.bin')
+    solver.solve(rows=4, cols=4, connections_to_win=3, book_path=book_path, gravity=True)
+    book = solver.open_book(book_path, 4, 4, 3, True)
+    for seed in range(175, 210):  # Includes positions the search used to cut off after one ply per open column
+        rng = random.Random(seed)
+        board = BitBoard(rows=4, cols=4, connections_to_win=3, gravity=True)
+        for _ in range(rng.randrange(0, 8)):
+            row, col = board.random_move(rng)
+            board.play_move(row=row, col=col)
+            if board.game_has_ended()[0]:
+                break
+            board.next_player()
+        else:
+            results = {}
+            for row, col in board.available_moves():
+                board.play_move(row=row, col=col)
+                board.next_player()
+                results[row, col] = -solver.decode_book_value(book.get(board.zobrist_key()))[0]
+                board.undo_move(row=row, col=col)
+            move = AlphaBetaPlayer(position=board.current_player, time_budget_ms=None).play(board=board)
+            assert results[move] == max(results.values())
+    book.close()
+    solver.open_book.cache_clear()
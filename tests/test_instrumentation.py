@@ -0,0 +1,64 @@
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import BitBoard
+from instrumentation import SearchStats, measure_move
+from players import AlphaBetaPlayer, DynamicProgrammingPlayer, MonteCarloPlayer
+from tic_tac_toe import TicTacToe
+
+
+def test_measure_move_counts_and_detaches():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    player = DynamicProgrammingPlayer(position=1)
+    with measure_move(player, board) as stats:
+        player.play(board=board)
+    assert player.stats is None and board.stats is None
+    assert stats.nodes > 0 and stats.end_checks > 0
+    assert stats.cache_misses == stats.end_checks  # Every miss checks the position once
+    assert stats.cache_hits > 0
+    assert 1 < stats.branching_factor <= 9
+    assert stats.seconds > 0
+
+    # A second move reuses the table, so it is answered from the cache alone
+    board.play_move(row=1, col=1)
+    board.next_player()
+    board.play_move(row=0, col=0)
+    board.next_player()
+    with measure_move(player, board) as stats:
+        player.play(board=board)
+    assert stats.cache_misses == 0
+
+
+def test_disabled_players_count_nothing():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    player = AlphaBetaPlayer(position=1, max_depth=2)
+    player.play(board=board)
+    assert player.stats is None and board.stats is None
+
+    stats = SearchStats()
+    assert stats.as_dict()['branching_factor'] == 0.0
+
+
+def test_play_game_writes_json_lines():
+    output = io.StringIO()
+    game = TicTacToe(player_one='mc_player', player_two='random_player', display_board=False,
+                     player_options={'mc_player': {'num_simulations': 20, 'engine': 'batch'}}, stats_output=output)
+    game.play_game()
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert records == game.move_stats
+    assert [record['move'] for record in records] == list(range(1, len(records) + 1))
+    assert records[0]['player'] == 'mc_player' and records[0]['rollouts'] == 9 * 20
+    assert records[1]['player'] == 'random_player' and records[1]['nodes'] == 0
+    assert set(records[0]) >= {'row', 'col', 'seconds', 'end_checks', 'cache_hits', 'branching_factor'}
+
+
+def test_monte_carlo_counts_deferred_rollouts():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    player = MonteCarloPlayer(position=1, num_simulations=10, seed=3)
+    with measure_move(player, board) as stats:
+        player.play(board=board)
+    assert stats.rollouts == 90 and stats.nodes == 9
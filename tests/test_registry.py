@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+
+from board import PLAYER_ONE
+import registry
+from tic_tac_toe import TicTacToe
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FirstMovePlayer(object):
+    stats = None
+
+    def __init__(self, *, position, column=0):
+        self.position = position
+        self.column = column
+
+    def play(self, *, board):
+        return min(board.available_moves(), key=lambda move: (move[1] != self.column, move))
+
+
+def test_cli_start_up_does_not_import_the_players():
+    code = ("import sys, tic_tac_toe; "
+            "print(sorted(name for name in ('players', 'concurrent.futures', 'multiprocessing', 'inspect') "
+            "if name in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True)
+    assert output.stdout.strip() == '[]'
+
+
+def test_creating_a_simple_player_does_not_import_the_solvers():
+    code = ("import sys, registry; registry.create_player('random_player', position=1); "
+            "print(sorted(name for name in ('solver', 'value_store', 'solution_cache', 'rollout', 'transposition', "
+            "'argparse') if name in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True)
+    assert output.stdout.strip() == '[]'
+
+
+def test_registered_player_is_created_with_options():
+    registry.register_player('first_move_player', FirstMovePlayer)
+    try:
+        assert 'first_move_player' in registry.player_names(interactive=False)
+        assert registry.player_accepts('first_move_player', 'column')
+        assert not registry.player_accepts('first_move_player', 'time_budget_ms')
+        game = TicTacToe(player_one='first_move_player', player_two='random_player', display_board=False,
+                         player_options={'first_move_player': {'column': 2}}, time_budget_ms=50)
+        assert game.current_player.column == 2
+        game.play_game()
+        assert game.board.board[2][0] == PLAYER_ONE
+    finally:
+        registry._players.pop('first_move_player')
+        registry._classes.pop('first_move_player', None)
+
+
+def test_lazy_targets_and_unknown_names():
+    registry.register_player('lazy_random', 'players:RandomPlayer')
+    try:
+        assert registry.create_player('lazy_random', position=PLAYER_ONE).position == PLAYER_ONE
+        assert registry.get_player_class('lazy_random') is registry.get_player_class('random_player')
+    finally:
+        registry._players.pop('lazy_random')
+        registry._classes.pop('lazy_random', None)
+    assert registry.is_interactive('human_user') and 'human_user' not in registry.player_names(interactive=False)
+    with pytest.raises(ValueError):
+        registry.get_player_class('no_such_player')
+
+
+def test_cli_passes_player_options():
+    command = [sys.executable, 'tic_tac_toe.py', '--player-one', 'mc_player', '--player-two', 'random_player',
+               '--option', 'mc_player.num_simulations=5', '--stats', '-']
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True)
+    assert '"move": 1, "player": "mc_player"' in output.stdout and '"rollouts": 45,' in output.stdout  # 9 moves x 5
+    assert all(json.loads(line)['move'] for line in output.stdout.splitlines()) and "Player X's turn" in output.stderr
+    bad = subprocess.run(command[:6] + ['--option', 'mc_player'], cwd=ROOT, capture_output=True, text=True)
+    assert bad.returncode == 2 and 'expected name.option=value' in bad.stderr
+    unknown = subprocess.run(command[:2] + ['--player-one', 'nobody'], cwd=ROOT, capture_output=True, text=True)
+    assert unknown.returncode == 2 and "unknown player 'nobody'" in unknown.stderr
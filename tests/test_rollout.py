@@ -0,0 +1,88 @@
+import os
+import sys
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import Board, PLAYER_ONE, PLAYER_TWO, EMPTY_CELL
+from players import MonteCarloPlayer
+from rollout import RolloutEngine, encode_position, run_batches
+
+
+def test_rollouts_match_board_simulations():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=0, col=0)
+    board.next_player()
+    num_games = 10000
+
+    random.seed(0)
+    player = MonteCarloPlayer(position=PLAYER_ONE)
+    legacy = [player._simulate_game(board) for _ in range(num_games)]
+    legacy_rates = [legacy.count(result) / num_games for result in (1, 0, -1)]
+
+    engine = RolloutEngine(rows=3, cols=3, connections_to_win=3, rng=random.Random(1))
+    wins, draws, losses = engine.run(board, num_games)
+    assert wins + draws + losses == num_games
+    for rate, legacy_rate in zip((wins / num_games, draws / num_games, losses / num_games), legacy_rates):
+        assert abs(rate - legacy_rate) < 0.03
+
+
+def test_rollouts_from_decided_positions():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    state = [
+        [PLAYER_ONE, PLAYER_TWO, PLAYER_ONE],
+        [PLAYER_ONE, PLAYER_TWO, PLAYER_TWO],
+        [PLAYER_TWO, PLAYER_ONE, EMPTY_CELL],
+    ]
+    for r, row in enumerate(state):
+        for c, value in enumerate(row):
+            board.set_cell(row=r, col=c, value=value)
+    board.current_player = PLAYER_ONE
+    engine = RolloutEngine(rows=3, cols=3, connections_to_win=3)
+    assert engine.run(board, 10) == (0, 10, 0)
+
+    board.set_cell(row=2, col=2, value=PLAYER_TWO)
+    board.set_cell(row=2, col=1, value=EMPTY_CELL)
+    board.current_player = PLAYER_TWO
+    # Player two completes the middle column whatever happens
+    assert engine.run(board, 10) == (0, 0, 10)
+
+
+def test_monte_carlo_player_with_batch_engine_finds_winning_move():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    state = [
+        [PLAYER_ONE, PLAYER_ONE, EMPTY_CELL],
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [EMPTY_CELL, EMPTY_CELL, EMPTY_CELL],
+    ]
+    for r, row in enumerate(state):
+        for c, value in enumerate(row):
+            board.set_cell(row=r, col=c, value=value)
+    board.current_player = PLAYER_TWO
+
+    random.seed(0)
+    player = MonteCarloPlayer(position=PLAYER_TWO, num_simulations=500, engine='batch')
+    assert player.play(board=board) == (1, 2)
+
+
+def test_seeded_batches_do_not_depend_on_worker_count():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=1, col=1)
+    board.next_player()
+    positions = [encode_position(board)]
+    board.play_move(row=0, col=0)
+    board.next_player()
+    positions.append(encode_position(board))
+
+    sequential = run_batches(positions, 1500, seed=7, chunk_size=400)
+    assert run_batches(positions, 1500, seed=7, chunk_size=400) == sequential
+    assert run_batches(positions, 1500, seed=7, chunk_size=400, workers=2) == sequential
+    assert run_batches(positions, 1500, seed=8, chunk_size=400) != sequential
+    assert [sum(result) for result in sequential] == [1500, 1500]
+
+
+def test_monte_carlo_player_is_reproducible_with_seed():
+    board = Board(rows=4, cols=4, connections_to_win=3)
+    moves = {MonteCarloPlayer(position=PLAYER_ONE, num_simulations=200, seed=3, workers=workers).play(board=board)
+             for workers in (None, 2)}
+    assert len(moves) == 1
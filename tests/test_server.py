@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import EMPTY_CELL, PLAYER_ONE, PLAYER_TWO, BitBoard
+import registry
+import server as server_module
+from server import GameClient, GameServer
+
+
+def first_empty(board):
+    return next((row, col) for col, column in enumerate(board) for row, value in enumerate(column)
+                if value == EMPTY_CELL)
+
+
+async def play_out(client, **options):
+    reply = await client.request('new', **options)
+    while reply['status'] == 'playing':
+        row, col = first_empty(reply['board'])
+        reply = await client.request('move', session=reply['session'], row=row, col=col)
+        assert reply['ok'], reply
+    return reply
+
+
+def test_many_concurrent_sessions_over_tcp():
+    async def scenario():
+        server = GameServer(workers=2, max_pending=8)
+        port = await server.start()
+        client = await GameClient.connect(port=port)
+        try:
+            results = await asyncio.gather(*(play_out(client, ai='random_player') for _ in range(200)))
+            assert all(result['status'] in ('won', 'draw') for result in results)
+            stats = await client.request('stats')
+            assert stats['sessions'] == 200 and stats['playing'] == 0
+            assert stats['moves'] >= 200 * 3 and stats['latency_ms']['max'] >= stats['latency_ms']['p50'] > 0
+            assert 0 < stats['peak_ai_jobs'] <= 8  # Backpressure caps the AI moves in progress
+            assert stats['ai_jobs'] == 0 and stats['queue_depth'] == 0
+        finally:
+            await client.close()
+            await server.close()
+    asyncio.run(scenario())
+
+
+def test_session_protocol_and_errors():
+    async def scenario():
+        executor = ThreadPoolExecutor(max_workers=1)
+        server = GameServer(workers=1, executor=executor)
+        try:
+            reply = await server.handle({'op': 'new', 'id': 'a', 'ai': 'dp_player', 'human': PLAYER_TWO})
+            assert reply['ok'] and reply['id'] == 'a' and reply['to_move'] == PLAYER_TWO
+            row, col = reply['ai_move']
+            assert reply['board'][col][row] == PLAYER_ONE
+            session = reply['session']
+
+            assert (await server.handle({'op': 'move', 'session': session, 'row': row, 'col': col}))['error'] == \
+                f"Illegal move [{row}, {col}]"
+            assert 'Missing field' in (await server.handle({'op': 'move', 'session': session}))['error']
+            assert not (await server.handle({'op': 'new', 'ai': 'human_user'}))['ok']
+            assert not (await server.handle({'op': 'state', 'session': 99}))['ok']
+            assert (await server.handle({'op': 'fly'}))['error'] == "Unknown op 'fly'"
+
+            # The solving player never loses, so playing the first empty cell ends in its win or a draw
+            client_moves = 0
+            while reply['status'] == 'playing':
+                row, col = first_empty(reply['board'])
+                reply = await server.handle({'op': 'move', 'session': session, 'row': row, 'col': col})
+                client_moves += 1
+            assert reply['winner'] in (PLAYER_ONE, None)
+            assert (await server.handle({'op': 'stats', 'session': session}))['moves'] == client_moves
+            assert (await server.handle({'op': 'move', 'session': session, 'row': 0, 'col': 0}))['error'] == \
+                "The game is over"
+            assert (await server.handle({'op': 'close', 'session': session}))['ok']
+            assert server.sessions == {}
+        finally:
+            await server.close()
+            executor.shutdown()
+    asyncio.run(scenario())
+
+
+def test_invalid_json_lines_get_an_error_reply():
+    async def scenario():
+        server = GameServer(workers=1)
+        port = await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'not json\n[1]\n')
+        await writer.drain()
+        replies = [await reader.readline() for _ in range(2)]
+        assert all(b'"ok": false' in reply for reply in replies)
+        writer.close()
+        await server.close()
+    asyncio.run(scenario())
+
+
+class FailingPlayer(object):
+    stats = None
+
+    def __init__(self, *, position):
+        self.position = position
+
+    def play(self, *, board):
+        raise RuntimeError("no move")
+
+
+def test_failed_ai_moves_leave_no_trace():
+    async def scenario():
+        executor = ThreadPoolExecutor(max_workers=1)
+        server = GameServer(workers=1, executor=executor)
+        registry.register_player('failing_player', FailingPlayer)
+        try:
+            reply = await server.handle({'op': 'new', 'ai': 'random_player', 'ai_options': {'depth': 3},
+                                         'human': PLAYER_TWO})
+            assert not reply['ok'] and server.sessions == {}
+            for size in ({'rows': 0, 'cols': 0}, {'rows': 3, 'cols': 3, 'connect': 4}, {'rows': '3'}):
+                assert not (await server.handle(dict(size, op='new', ai='random_player')))['ok']
+            assert server.sessions == {}
+
+            session = (await server.handle({'op': 'new', 'ai': 'failing_player'}))['session']
+            reply = await server.handle({'op': 'move', 'session': session, 'row': 0, 'col': 0})
+            assert not reply['ok'] and 'The AI player failed' in reply['error']
+            state = await server.handle({'op': 'state', 'session': session})
+            assert state['to_move'] == PLAYER_ONE and state['board'][0][0] == EMPTY_CELL
+
+            server.sessions[session].board.next_player()
+            reply = await server.handle({'op': 'move', 'session': session, 'row': 0, 'col': 0})
+            assert reply['error'] == "It is not the human player's turn"
+        finally:
+            registry._players.pop('failing_player')
+            registry._classes.pop('failing_player', None)
+            await server.close()
+            executor.shutdown()
+    asyncio.run(scenario())
+
+
+def test_workers_keep_their_players_between_moves():
+    server_module._players.clear()
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    job = ('mcts_player', {'iterations': 50}, PLAYER_ONE, 3, 3, 3, False, board.state_code())
+    row, col = server_module.compute_ai_move(job)
+    (player, _), = server_module._players.values()
+    for row, col in ((row, col), next(move for move in board.available_moves() if move != (row, col))):
+        board.play_move(row=row, col=col)  # The AI's move and a reply
+        board.next_player()
+    server_module.compute_ai_move(('mcts_player', {'iterations': 50}, PLAYER_ONE, 3, 3, 3, False,
+                                   board.state_code()))
+    assert list(server_module._players.values())[0][0] is player and len(server_module._players) == 1
+    server_module.compute_ai_move(('mcts_player', {'iterations': 60}, PLAYER_ONE, 3, 3, 3, False,
+                                   board.state_code()))
+    assert len(server_module._players) == 2
+    server_module._players.clear()
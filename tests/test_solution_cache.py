@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import BitBoard
+from instrumentation import measure_move
+from players import DynamicProgrammingPlayer, SimpleMinimaxPlayer
+import solution_cache
+from solution_cache import SharedSolutionTable, SolutionCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    solution_cache.clear_caches()
+    yield
+    solution_cache.use_shared_memory(None)
+    solution_cache.clear_caches()
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = SolutionCache(capacity=2, stripes=1)
+    cache.store(1, 1, 3)
+    cache.store(2, -1, 3)
+    assert cache.lookup(1) == (1, 3, 0)  # 1 is now the most recently used
+    cache.store(3, 0, 1)
+    assert cache.lookup(2) is None
+    assert 1 in cache and 3 in cache and len(cache) == 2
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+
+def test_concurrent_stores_are_all_kept():
+    cache = SolutionCache(capacity=4000, stripes=8)
+
+    def fill(offset):
+        for key in range(offset, 4000, 4):
+            cache.store(key, key % 3 - 1, 2)
+    threads = [threading.Thread(target=fill, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 4000
+    assert all(cache.lookup(key) == (key % 3 - 1, 2, 0) for key in range(4000))
+
+
+def test_concurrent_lookups_count_every_hit_and_miss():
+    cache = SolutionCache(capacity=1000, stripes=4)
+    for key in range(0, 1000, 2):
+        cache.store(key, 0, 1)
+
+    def look_up():
+        for key in range(1000):
+            cache.lookup(key)
+    threads = [threading.Thread(target=look_up) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (cache.hits, cache.misses) == (4000, 4000)
+
+
+def _store_in_child(name):
+    table = SharedSolutionTable.attach(name)
+    table.store(2 ** 63 + 5, -7, 4)
+    table.close()
+
+
+def test_shared_table_is_visible_across_processes():
+    table = SharedSolutionTable.create(capacity=16)
+    try:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            pool.submit(_store_in_child, table.name).result()
+        assert table.lookup(2 ** 63 + 5) == (-7, 4, 0)
+        assert table.lookup(5) is None and len(table) == 1
+        table.store(21, 1, 1)  # Same slot, searched less deep than the stored entry
+        assert table.lookup(21) is None
+    finally:
+        table.unlink()
+
+
+def test_players_share_solved_positions_across_games():
+    board = BitBoard(rows=3, cols=3, connections_to_win=3)
+    first = DynamicProgrammingPlayer(position=1, shared_cache=True)
+    first.play(board=board)
+    second = DynamicProgrammingPlayer(position=1, shared_cache=True)
+    with measure_move(second, board) as stats:
+        second.play(board=board)
+    assert stats.cache_misses == 0 and stats.end_checks == 0
+    assert second.state_values is first.state_values
+
+    # The minimax player reads the same values, from either side
+    board.play_move(row=0, col=0)
+    board.next_player()
+    minimax = SimpleMinimaxPlayer(position=2, shared_cache=True)
+    with measure_move(minimax, board) as stats:
+        assert minimax.play(board=board) == (1, 1)  # The only reply that does not lose
+    assert stats.cache_misses == 0
+
+
+def test_shared_memory_backs_new_caches():
+    table = SharedSolutionTable.create(capacity=2 ** 12)
+    try:
+        solution_cache.use_shared_memory(table.name)
+        DynamicProgrammingPlayer(position=1, shared_cache=True).play(board=BitBoard(rows=3, cols=3,
+                                                                                    connections_to_win=3))
+        assert len(table) > 0
+        solution_cache.clear_caches()  # A new process would start with empty local caches
+        player = DynamicProgrammingPlayer(position=1, shared_cache=True)
+        board = BitBoard(rows=3, cols=3, connections_to_win=3)
+        with measure_move(player, board) as stats:
+            player.play(board=board)
+        assert stats.cache_misses < 100
+    finally:
+        solution_cache.use_shared_memory(None)
+        table.unlink()
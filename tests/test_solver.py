@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import Board, PLAYER_ONE, PLAYER_TWO, EMPTY_CELL
+from players import AlphaBetaPlayer, SimpleMinimaxPlayer
+import solver
+
+
+def test_solve_tic_tac_toe(tmp_path):
+    summary = solver.solve(rows=3, cols=3, connections_to_win=3, work_dir=str(tmp_path))
+    assert summary['layer_sizes'] == [1, 9, 72, 252, 756, 1260, 1520, 1140, 390, 78]
+    assert (summary['result'], summary['distance']) == (solver.DRAW, 9)
+    assert summary['book_entries'] == 0 and len(os.listdir(tmp_path)) == 10  # No book records without a book
+
+
+def test_book_is_merged_from_per_layer_files(tmp_path):
+    book_path = str(tmp_path / 'book.bin')
+    work_dir = tmp_path / 'layers'
+    work_dir.mkdir()
+    summary = solver.solve(rows=3, cols=3, connections_to_win=3, book_path=book_path, work_dir=str(work_dir))
+    assert summary['book_entries'] == summary['positions'] == 5478
+    assert len(os.listdir(work_dir)) == 3 * 10  # Positions, book keys and book values of every layer
+    book = solver.open_book(book_path, 3, 3, 3)
+    empty_board = Board(rows=3, cols=3, connections_to_win=3)
+    assert len(book) == 5478
+    assert solver.decode_book_value(book.get(empty_board.zobrist_key())) == (solver.DRAW, 9)
+
+
+def test_solve_rectangular_board_is_a_first_player_win():
+    summary = solver.solve(rows=3, cols=4, connections_to_win=3)
+    assert summary['result'] == solver.WIN
+    assert summary['distance'] == 7
+
+
+def test_book_values_agree_with_alpha_beta(tmp_path):
+    book_path = str(tmp_path / 'book.bin')
+    solver.solve(rows=3, cols=3, connections_to_win=3, book_path=book_path)
+    book = solver.open_book(book_path, 3, 3, 3)
+
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=0, col=0)
+    board.next_player()
+    board.play_move(row=0, col=1)
+    board.next_player()
+    # X to move after an edge reply to a corner opening wins
+    result, distance = solver.decode_book_value(book.get(board.zobrist_key()))
+    assert result == solver.WIN
+    move = solver.book_move(book_path, board)
+    searched = AlphaBetaPlayer(position=PLAYER_ONE).play(board=board)
+    board.play_move(row=move[0], col=move[1])
+    board.next_player()
+    assert solver.decode_book_value(book.get(board.zobrist_key())) == (solver.LOSS, distance - 1)
+    board.set_cell(row=move[0], col=move[1], value=EMPTY_CELL)
+    board.next_player()
+    board.play_move(row=searched[0], col=searched[1])
+    board.next_player()
+    assert solver.decode_book_value(book.get(board.zobrist_key()))[0] == solver.LOSS
+
+
+def test_players_fall_back_to_search_beyond_the_book(tmp_path):
+    book_path = str(tmp_path / 'book.bin')
+    summary = solver.solve(rows=3, cols=3, connections_to_win=3, book_path=book_path, book_depth=2)
+    assert summary['book_entries'] == 1 + 9 + 72
+
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    assert solver.book_move(book_path, board) is not None
+    state = [
+        [PLAYER_ONE, PLAYER_ONE, EMPTY_CELL],
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [EMPTY_CELL, EMPTY_CELL, EMPTY_CELL],
+    ]
+    for r, row in enumerate(state):
+        for c, value in enumerate(row):
+            board.set_cell(row=r, col=c, value=value)
+    assert solver.book_move(book_path, board) is None
+    assert SimpleMinimaxPlayer(position=PLAYER_ONE, book=book_path).play(board=board) == (0, 2)
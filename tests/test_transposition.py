@@ -0,0 +1,85 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import Board, PLAYER_ONE, PLAYER_TWO, EMPTY_CELL
+from players import DynamicProgrammingPlayer
+from transposition import TranspositionTable, LOWER_BOUND
+
+
+def test_lookup_and_store_counters():
+    table = TranspositionTable(capacity=8)
+    assert table.lookup(3) is None
+    table.store(3, -1, depth=4, flag=LOWER_BOUND)
+    assert table.lookup(3) == (-1, 4, LOWER_BOUND)
+    assert 3 in table and 11 not in table
+    assert len(table) == 1
+    assert (table.hits, table.misses, table.evictions) == (1, 1, 0)
+
+
+def test_depth_preferred_replacement_keeps_deeper_entry():
+    table = TranspositionTable(capacity=8, replacement='depth')
+    table.store(3, 1, depth=5)
+    table.store(11, 0, depth=2)  # same slot, shallower
+    assert table.lookup(3) == (1, 5, 0)
+    assert table.lookup(11) is None
+    table.store(11, 0, depth=7)
+    assert table.lookup(11) == (0, 7, 0)
+    assert table.evictions == 1
+
+
+def test_always_replace_keeps_newest_entry():
+    table = TranspositionTable(capacity=8, replacement='always')
+    table.store(3, 1, depth=5)
+    table.store(11, 0, depth=2)
+    assert table.lookup(3) is None
+    assert table.lookup(11) == (0, 2, 0)
+    assert table.evictions == 1
+
+
+def test_zobrist_hash_is_incremental_and_order_independent():
+    first = Board(rows=3, cols=3, connections_to_win=3)
+    second = Board(rows=3, cols=3, connections_to_win=3)
+    first.play_move(row=0, col=0)
+    first.next_player()
+    first.play_move(row=1, col=1)
+    second.set_cell(row=1, col=1, value=PLAYER_TWO)
+    second.set_cell(row=0, col=0, value=PLAYER_ONE)
+    assert first.zobrist_hash == second.zobrist_hash
+    first.set_cell(row=1, col=1, value=EMPTY_CELL)  # Undo the move
+    first.set_cell(row=0, col=0, value=EMPTY_CELL)
+    assert first.zobrist_hash == 0
+    assert first.zobrist_key() != Board(rows=3, cols=3, connections_to_win=3, player_to_move=PLAYER_ONE).zobrist_key()
+
+
+def test_dynamic_programming_player_with_tiny_table_blocks_opponent():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    state = [
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [PLAYER_ONE, EMPTY_CELL, EMPTY_CELL],
+        [EMPTY_CELL, EMPTY_CELL, PLAYER_ONE],
+    ]
+    for r, row in enumerate(state):
+        for c, value in enumerate(row):
+            board.set_cell(row=r, col=c, value=value)
+    board.current_player = PLAYER_ONE
+
+    for replacement in TranspositionTable.REPLACEMENT_POLICIES:
+        player = DynamicProgrammingPlayer(position=PLAYER_ONE, table_capacity=16, replacement=replacement)
+        assert player.play(board=board) == (0, 2)
+        assert len(player.state_values) <= 16
+
+
+def test_dynamic_programming_player_with_symmetry_stores_fewer_states():
+    plain = DynamicProgrammingPlayer(position=PLAYER_TWO)
+    symmetric = DynamicProgrammingPlayer(position=PLAYER_TWO, use_symmetry=True)
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=1, col=1)
+    board.next_player()
+    plain_move = plain.play(board=board)
+    symmetric_move = symmetric.play(board=board)
+    # Player two must answer the centre with a corner, every edge loses
+    assert plain_move in {(0, 0), (0, 2), (2, 0), (2, 2)}
+    assert symmetric_move in {(0, 0), (0, 2), (2, 0), (2, 2)}
+    assert len(symmetric.state_values) < len(plain.state_values) / 4
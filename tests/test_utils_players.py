@@ -1,18 +1,23 @@
+from collections import Counter
 import os
 import sys
 import random
+import time
+
+import pytest
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from board import Board, PLAYER_ONE, PLAYER_TWO, EMPTY_CELL
-from players import RandomPlayer, SimpleMinimaxPlayer, MonteCarloPlayer
+from instrumentation import measure_move
+from players import RandomPlayer, SimpleMinimaxPlayer, AlphaBetaPlayer, MCTSPlayer, MonteCarloPlayer, TDLearningPlayer
 import utils
 
 
 def set_board_state(board, rows):
     for r, row in enumerate(rows):
         for c, value in enumerate(row):
-            board.board[c][r] = value
+            board.set_cell(row=r, col=c, value=value)
 
 
 def test_get_available_moves_and_random_player():
@@ -62,3 +67,152 @@ def test_monte_carlo_player_finds_winning_move():
     player = MonteCarloPlayer(position=PLAYER_ONE, num_simulations=50)
     winning_move = player.play(board=board)
     assert winning_move == (0, 2)
+
+
+def test_monte_carlo_halving_blocks_threat_with_fewer_rollouts():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    set_board_state(board, [
+        [PLAYER_ONE, EMPTY_CELL, EMPTY_CELL],
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [EMPTY_CELL, PLAYER_ONE, EMPTY_CELL],
+    ])
+    board.current_player = PLAYER_ONE
+    rollouts = {}
+    for allocation in MonteCarloPlayer.ALLOCATIONS:
+        player = MonteCarloPlayer(position=PLAYER_ONE, num_simulations=400, seed=1, allocation=allocation)
+        with measure_move(player, board) as stats:
+            assert player.play(board=board) == (1, 2)
+        rollouts[allocation] = stats.rollouts
+    assert rollouts['uniform'] == 5 * 400
+    assert rollouts['halving'] < rollouts['uniform'] / 2
+
+    # A single candidate move, the only drop into a one-column board, needs no simulations at all
+    column = Board(rows=3, cols=1, connections_to_win=3, gravity=True)
+    player = MonteCarloPlayer(position=PLAYER_ONE, num_simulations=400, allocation='halving')
+    with measure_move(player, column) as stats:
+        assert player.play(board=column) == (2, 0)
+    assert stats.rollouts == 0
+
+    with pytest.raises(ValueError):
+        MonteCarloPlayer(position=PLAYER_ONE, allocation='greedy')
+
+
+def test_alpha_beta_player_finds_winning_move():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    state = [
+        [PLAYER_ONE, PLAYER_ONE, EMPTY_CELL],
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [EMPTY_CELL, EMPTY_CELL, EMPTY_CELL],
+    ]
+    set_board_state(board, state)
+    board.current_player = PLAYER_ONE
+    assert AlphaBetaPlayer(position=PLAYER_ONE).play(board=board) == (0, 2)
+
+    board.set_cell(row=0, col=1, value=EMPTY_CELL)
+    board.current_player = PLAYER_TWO
+    # Player two prefers its own win on the middle row over blocking
+    assert AlphaBetaPlayer(position=PLAYER_TWO).play(board=board) == (1, 2)
+
+
+def test_alpha_beta_self_play_is_a_draw_and_respects_time_budget():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    players = [AlphaBetaPlayer(position=PLAYER_ONE), AlphaBetaPlayer(position=PLAYER_TWO)]
+    while True:
+        row, col = players[0].play(board=board)
+        board.play_move(row=row, col=col)
+        game_ended, there_is_winner = board.game_has_ended()
+        if game_ended:
+            break
+        players.reverse()
+        board.next_player()
+    assert there_is_winner is False
+
+    large_board = Board(rows=6, cols=7, connections_to_win=4)
+    player = AlphaBetaPlayer(position=PLAYER_ONE, time_budget_ms=50, check_interval=64)
+    start = time.perf_counter()
+    row, col = player.play(board=large_board)
+    assert time.perf_counter() - start < 1.0
+    assert large_board.board[col][row] == EMPTY_CELL
+
+
+def test_mcts_player_finds_winning_move():
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    state = [
+        [PLAYER_ONE, PLAYER_ONE, EMPTY_CELL],
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [EMPTY_CELL, EMPTY_CELL, EMPTY_CELL],
+    ]
+    set_board_state(board, state)
+    board.current_player = PLAYER_ONE
+
+    random.seed(0)
+    player = MCTSPlayer(position=PLAYER_ONE, iterations=500)
+    assert player.play(board=board) == (0, 2)
+
+
+def test_mcts_player_reuses_subtree_after_opponent_move():
+    random.seed(0)
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    player = MCTSPlayer(position=PLAYER_ONE, iterations=2000)
+    row, col = player.play(board=board)
+    assert player.reused_visits == 0
+    board.play_move(row=row, col=col)
+    board.next_player()
+    reply = utils.get_available_moves(board)[0]
+    board.play_move(row=reply[0], col=reply[1])
+    board.next_player()
+
+    row, col = player.play(board=board)
+    assert player.reused_visits > 0
+    assert board.board[col][row] == EMPTY_CELL
+
+    # A position that does not follow from the previous one starts a fresh tree
+    player.play(board=Board(rows=3, cols=3, connections_to_win=3))
+    assert player.reused_visits == 0
+
+
+def test_td_learning_player_learns_to_win_and_block():
+    player = TDLearningPlayer(position=PLAYER_ONE, training_episodes=20000, seed=0)
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    state = [
+        [PLAYER_ONE, PLAYER_ONE, EMPTY_CELL],
+        [PLAYER_TWO, PLAYER_TWO, EMPTY_CELL],
+        [EMPTY_CELL, EMPTY_CELL, EMPTY_CELL],
+    ]
+    set_board_state(board, state)
+    board.current_player = PLAYER_ONE
+    assert player.play(board=board) == (0, 2)
+    assert len(player.values) == 3 ** 9
+    assert player.episodes_trained == 20000
+
+    board.set_cell(row=0, col=2, value=PLAYER_TWO)
+    board.set_cell(row=0, col=1, value=EMPTY_CELL)
+    # Player one cannot win at once and must stop the middle row
+    assert player.play(board=board) == (1, 2)
+
+
+def test_td_learning_player_breaks_ties_uniformly():
+    player = TDLearningPlayer(position=PLAYER_ONE, training_episodes=0, seed=3)
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    counts = Counter(player.play(board=board) for _ in range(900))  # every opening is worth 0.5 before training
+    assert len(counts) == 9 and all(60 <= count <= 140 for count in counts.values())
+
+
+def test_td_learning_rate_schedules_and_limits():
+    player = TDLearningPlayer(position=PLAYER_ONE, learning_rate=0.4, min_learning_rate=0.1, schedule='linear')
+    assert player.learning_rate_at(0, 11) == 0.4
+    assert abs(player.learning_rate_at(10, 11) - 0.1) < 1e-12
+    player.schedule = 'exponential'
+    assert abs(player.learning_rate_at(5, 11) - 0.2) < 1e-12
+
+    with pytest.raises(ValueError):  # A 4x4 value table is too large
+        player.train(1, rows=4, cols=4, connections_to_win=4)
+
+
+def test_td_learning_player_with_symmetry_shares_values():
+    player = TDLearningPlayer(position=PLAYER_ONE, training_episodes=0, use_symmetry=True, seed=0)
+    player.train(2000)
+    corner_values = [player.values[3 ** cell] for cell in (0, 2, 6, 8)]
+    # Only the canonical image of an opening corner move is ever updated, the other corners keep their initial value
+    assert corner_values[0] != 0.5
+    assert corner_values[1:] == [0.5, 0.5, 0.5]
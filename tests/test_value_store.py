@@ -0,0 +1,90 @@
+import os
+import sys
+import struct
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from board import Board, PLAYER_ONE, PLAYER_TWO
+from players import DynamicProgrammingPlayer, TDLearningPlayer
+from value_store import FORMAT_VERSION, KEY_BASE3, KEY_ZOBRIST, ValueStore, write_sorted_store, write_store
+
+
+def test_round_trip_and_lookup(tmp_path):
+    path = str(tmp_path / 'values.bin')
+    write_store(path, [(30, 1.0), (2 ** 64 - 1, -1.0), (7, 0.25)], rows=3, cols=3, connections_to_win=3,
+                key_kind=KEY_ZOBRIST)
+    with ValueStore(path, rows=3, cols=3, connections_to_win=3, key_kind=KEY_ZOBRIST) as store:
+        assert len(store) == 3
+        assert store.get(7) == 0.25
+        assert store.get(2 ** 64 - 1) == -1.0
+        assert store.get(8) is None
+        assert 30 in store and 31 not in store
+        assert list(store.items()) == [(7, 0.25), (30, 1.0), (2 ** 64 - 1, -1.0)]
+
+
+def test_stale_or_damaged_files_are_rejected(tmp_path):
+    path = str(tmp_path / 'values.bin')
+    write_store(path, [(1, 1.0), (2, 0.0)], rows=3, cols=3, connections_to_win=3, key_kind=KEY_ZOBRIST)
+
+    with pytest.raises(ValueError, match='board'):
+        ValueStore(path, rows=4, cols=4, connections_to_win=3, key_kind=KEY_ZOBRIST)
+    with pytest.raises(ValueError, match='key kind'):
+        ValueStore(path, rows=3, cols=3, connections_to_win=3, key_kind=KEY_BASE3)
+
+    with open(path, 'rb') as store_file:
+        data = bytearray(store_file.read())
+    damaged = bytearray(data)
+    damaged[-1] ^= 0xFF
+    newer = bytearray(data)
+    struct.pack_into('<H', newer, 4, FORMAT_VERSION + 1)
+    for name, content, message in [('damaged', damaged, 'checksum'), ('newer', newer, 'version'),
+                                   ('truncated', data[:-4], 'truncated'), ('other', b'not a store' * 4, 'not a')]:
+        other_path = str(tmp_path / name)
+        with open(other_path, 'wb') as store_file:
+            store_file.write(content)
+        with pytest.raises(ValueError, match=message):
+            ValueStore(other_path, rows=3, cols=3, connections_to_win=3, key_kind=KEY_ZOBRIST)
+
+
+def test_dynamic_programming_player_plays_from_saved_values(tmp_path):
+    path = str(tmp_path / 'dp.bin')
+    solver = DynamicProgrammingPlayer(position=PLAYER_ONE)
+    solver.play(board=Board(rows=3, cols=3, connections_to_win=3))
+    solver.save_values(path)
+
+    board = Board(rows=3, cols=3, connections_to_win=3)
+    board.play_move(row=0, col=1)
+    board.next_player()
+    player = DynamicProgrammingPlayer(position=PLAYER_TWO, store=path)
+    # Answers to an edge opening that keep the draw
+    assert player.play(board=board) in {(0, 0), (0, 2), (1, 1), (2, 1)}
+    assert player.state_values is None  # Every position came from the store, no table was needed
+
+    with pytest.raises(ValueError):
+        DynamicProgrammingPlayer(position=PLAYER_ONE, store=path).play(board=Board(rows=4, cols=4,
+                                                                                   connections_to_win=3))
+
+
+def test_td_learning_player_values_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'td.bin')
+    trained = TDLearningPlayer(position=PLAYER_ONE, training_episodes=2000, seed=0)
+    trained.play(board=Board(rows=3, cols=3, connections_to_win=3))
+    trained.save_values(path)
+
+    restored = TDLearningPlayer(position=PLAYER_ONE, training_episodes=2000, store=path)
+    restored.play(board=Board(rows=3, cols=3, connections_to_win=3))
+    assert restored.values == trained.values
+
+
+def test_sorted_store_is_written_in_chunks(tmp_path):
+    items = [(key * 7919, key / 4) for key in range(1000)]
+    write_store(str(tmp_path / 'whole.bin'), reversed(items), rows=3, cols=3, connections_to_win=3,
+                key_kind=KEY_ZOBRIST)
+    write_sorted_store(str(tmp_path / 'chunks.bin'), iter(items), count=len(items), rows=3, cols=3,
+                       connections_to_win=3, key_kind=KEY_ZOBRIST, chunk_records=64)
+    assert (tmp_path / 'chunks.bin').read_bytes() == (tmp_path / 'whole.bin').read_bytes()
+    with pytest.raises(ValueError, match='Expected 1001 records'):
+        write_sorted_store(str(tmp_path / 'short.bin'), items, count=1001, rows=3, cols=3, connections_to_win=3,
+                           key_kind=KEY_ZOBRIST)
@@ -1,39 +1,83 @@
 """Command line interface to play Tic-Tac-Toe with different player types."""
 
 import argparse
-from board import Board, PLAYER_ONE, PLAYER_TWO
-from players import HumanPlayer, RandomPlayer, SimpleMinimaxPlayer, DynamicProgrammingPlayer, MonteCarloPlayer
-
-_player_categories = {
-    'human_user': HumanPlayer,
-    'random_player': RandomPlayer,
-    'minimax_player': SimpleMinimaxPlayer,
-    'dp_player': DynamicProgrammingPlayer,
-    'mc_player': MonteCarloPlayer,
-}
+import contextlib
+import json
+import sys
+import time
+from board import BOARD_TYPES, PLAYER_ONE, PLAYER_TWO
+from instrumentation import measure_move
+import registry
 
 
 class TicTacToe(object):
-    """High level game controller managing turns and player interaction."""
+    """High level game controller managing turns and player interaction.
+
+    When ``stats_output`` is a writable text file, every move is measured with ``instrumentation.measure_move``
+    and its record is written to it as one JSON line, and kept in ``move_stats``.
+
+    ``time_budget_ms`` and ``node_budget`` are handed to every player that supports them, unless its
+    ``player_options`` already set them. Moves taking longer than the time budget are kept in ``over_budget``.
+    """
 
-    def __init__(self, *, player_one, player_two, display_board=True, debug_minimax=False):
-        self.board = Board(rows=3, cols=3, connections_to_win=3)
+    def __init__(self, *, player_one, player_two, display_board=True, board_type='list', rows=3, cols=3,
+                 connections_to_win=3, gravity=False, player_options=None, stats_output=None, time_budget_ms=None,
+                 node_budget=None):
+        self.board = BOARD_TYPES[board_type](rows=rows, cols=cols, connections_to_win=connections_to_win,
+                                             gravity=gravity)
         self.display_board = display_board
-        if _player_categories[player_one] is SimpleMinimaxPlayer:
-            self.current_player = _player_categories[player_one](position=PLAYER_ONE, debug=debug_minimax)
-        else:
-            self.current_player = _player_categories[player_one](position=PLAYER_ONE)
-        if _player_categories[player_two] is SimpleMinimaxPlayer:
-            self.next_player = _player_categories[player_two](position=PLAYER_TWO, debug=debug_minimax)
-        else:
-            self.next_player = _player_categories[player_two](position=PLAYER_TWO)
+        self.stats_output = stats_output
+        self.time_budget_ms = time_budget_ms
+        self.node_budget = node_budget
+        player_options = player_options or {}
+        self.player_names = {PLAYER_ONE: player_one, PLAYER_TWO: player_two}
+        self.current_player = self._create_player(player_one, PLAYER_ONE, player_options.get(player_one, {}))
+        self.next_player = self._create_player(player_two, PLAYER_TWO, player_options.get(player_two, {}))
+        self.move_times = []  # (position, seconds) for every move of the last game
+        self.move_stats = []  # instrumentation records of the last game, when stats_output is given
+        self.over_budget = []  # (position, seconds) for every move of the last game exceeding time_budget_ms
+
+    def _create_player(self, name, position, options):
+        options = dict(options)
+        for option in ('time_budget_ms', 'node_budget'):
+            if getattr(self, option) is not None and registry.player_accepts(name, option):
+                options.setdefault(option, getattr(self, option))
+        return registry.create_player(name, position=position, **options)
+
+    def _within_budget(self, seconds):
+        return self.time_budget_ms is None or seconds * 1000 <= self.time_budget_ms
+
+    def _play_measured(self):
+        player = self.current_player
+        with measure_move(player, self.board) as stats:
+            row, col = player.play(board=self.board)
+        record = {'move': len(self.move_stats) + 1, 'player': self.player_names[player.position],
+                  'position': player.position, 'row': row, 'col': col, **stats.as_dict(),
+                  'time_budget_ms': self.time_budget_ms, 'within_budget': self._within_budget(stats.seconds)}
+        self.move_stats.append(record)
+        self.stats_output.write(json.dumps(record) + '\n')
+        return row, col
 
     def play_game(self):
+        """Play one game and return the position of the winner, or ``None`` for a draw."""
+        self.move_times = []
+        self.move_stats = []
+        self.over_budget = []
         while True:
             if self.display_board:
                 print(self.board)
                 print(f"Player {'X' if self.current_player.position == PLAYER_ONE else 'O'}'s turn\n\n")
-            row, col = self.current_player.play(board=self.board)
+            start = time.perf_counter()
+            if self.stats_output is None:
+                row, col = self.current_player.play(board=self.board)
+            else:
+                row, col = self._play_measured()
+            seconds = time.perf_counter() - start
+            self.move_times.append((self.current_player.position, seconds))
+            if not self._within_budget(seconds):
+                self.over_budget.append((self.current_player.position, seconds))
+            if self.display_board and self.time_budget_ms is not None:
+                print(f"Move took {seconds * 1000:.0f} ms of a {self.time_budget_ms} ms budget")
             self.board.play_move(row=row, col=col)
             game_ended, there_is_winner = self.board.game_has_ended()
             if game_ended:
@@ -43,18 +87,61 @@ class TicTacToe(object):
                         print(f"Player {'X' if self.current_player.position == PLAYER_ONE else 'O'} wins!")
                     else:
                         print("It's a draw!")
-                break
+                return self.current_player.position if there_is_winner else None
             self.current_player, self.next_player = self.next_player, self.current_player
             self.board.next_player()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Play Tic-Tac-Toe')
-    parser.add_argument('--player-one', choices=_player_categories.keys(), default='human_user')
-    parser.add_argument('--player-two', choices=_player_categories.keys(), default='mc_player')
-    parser.add_argument('--show-minimax', action='store_true', help='Display minimax evaluation steps')
+    # Player names are checked after parsing, so that listing them as choices does not scan for plugins
+    parser.add_argument('--player-one', default='human_user', help=f"One of {', '.join(registry.player_names())}")
+    parser.add_argument('--player-two', default='mc_player', help=f"One of {', '.join(registry.player_names())}")
+    parser.add_argument('--board-type', choices=BOARD_TYPES.keys(), default='list',
+                        help='Board representation: list of lists or per-player bit masks')
+    parser.add_argument('--rows', type=int, default=3)
+    parser.add_argument('--cols', type=int, default=3)
+    parser.add_argument('--connect', type=int, default=3, help='Connections needed to win')
+    parser.add_argument('--gravity', action='store_true',
+                        help='Connect-Four rules: pieces drop to the lowest empty row of their column')
+    parser.add_argument('--stats', metavar='PATH',
+                        help='Write per-move search statistics as JSON lines to PATH ("-" for standard output, '
+                             'the board is then printed to standard error)')
+    parser.add_argument('--time-budget-ms', type=int, default=None,
+                        help='Per-move time budget for the search and simulation players')
+    parser.add_argument('--node-budget', type=int, default=None,
+                        help='Per-move budget of search nodes, iterations or simulations')
+    parser.add_argument('--option', action='append', default=[], metavar='NAME.OPTION=VALUE',
+                        help='Constructor option of a player type, e.g. mc_player.num_simulations=200')
     args = parser.parse_args()
+    for player_name in (args.player_one, args.player_two):
+        if not registry.is_registered(player_name):
+            parser.error(f"unknown player {player_name!r}, expected one of {', '.join(registry.player_names())}")
+    try:
+        player_options = registry.parse_player_options(args.option)
+    except ValueError as error:
+        parser.error(str(error))
+    stats_output = None
+    display_output = contextlib.nullcontext()
+    if args.stats == '-':
+        stats_output = sys.stdout
+        display_output = contextlib.redirect_stdout(sys.stderr)  # so standard output only holds the JSON lines
+    elif args.stats:
+        stats_output = open(args.stats, 'w')
     game = TicTacToe(player_one=args.player_one,
                      player_two=args.player_two,
-                     debug_minimax=args.show_minimax)
-    game.play_game()
+                     board_type=args.board_type,
+                     rows=args.rows,
+                     cols=args.cols,
+                     connections_to_win=args.connect,
+                     gravity=args.gravity,
+                     player_options=player_options,
+                     stats_output=stats_output,
+                     time_budget_ms=args.time_budget_ms,
+                     node_budget=args.node_budget)
+    try:
+        with display_output:
+            game.play_game()
+    finally:
+        if stats_output is not None and stats_output is not sys.stdout:
+            stats_output.close()
@@ -0,0 +1,92 @@
+"""Fixed-capacity transposition table for the search players."""
+
+from array import array
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class TranspositionTable(object):
+    """Hash table of search results keyed by Zobrist hashes, with a fixed number of slots.
+
+    Each key maps to a single slot. When two positions collide, the replacement policy decides which one is
+    kept: ``'depth'`` keeps the entry searched to the greater depth, ``'always'`` keeps the newest one.
+    """
+
+    REPLACEMENT_POLICIES = ('depth', 'always')
+
+    def __init__(self, *, capacity=2 ** 20, replacement='depth'):
+        if replacement not in self.REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy {replacement!r}, "
+                             f"expected one of {self.REPLACEMENT_POLICIES}")
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.capacity = size
+        self.replacement = replacement
+        self._index_mask = size - 1
+        self._keys = array('Q', bytes(8 * size))
+        self._values = array('i', bytes(4 * size))
+        self._depths = array('H', bytes(2 * size))  # depth + 1, so that 0 marks an empty slot
+        self._flags = array('B', bytes(size))
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        index = key & self._index_mask
+        return self._depths[index] != 0 and self._keys[index] == key
+
+    def lookup(self, key):
+        """Return ``(value, depth, flag)`` stored for ``key``, or ``None`` if it is not in the table."""
+        index = key & self._index_mask
+        if self._depths[index] and self._keys[index] == key:
+            self.hits += 1
+            return self._values[index], self._depths[index] - 1, self._flags[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, value, depth, flag=EXACT):
+        """Store a search result, subject to the replacement policy when the slot holds another position."""
+        index = key & self._index_mask
+        stored_depth = self._depths[index]
+        if not stored_depth:
+            self._size += 1
+        elif self._keys[index] != key:
+            if self.replacement == 'depth' and stored_depth > depth + 1:
+                return
+            self.evictions += 1
+        self._keys[index] = key
+        self._values[index] = value
+        self._depths[index] = depth + 1
+        self._flags[index] = flag
+
+    def items(self):
+        """Yield ``(key, value)`` for every stored entry."""
+        for index in range(self.capacity):
+            if self._depths[index]:
+                yield self._keys[index], self._values[index]
+
+    def clear(self):
+        size = self.capacity
+        self._keys = array('Q', bytes(8 * size))
+        self._values = array('i', bytes(4 * size))
+        self._depths = array('H', bytes(2 * size))
+        self._flags = array('B', bytes(size))
+        self._size = 0
+
+    def stats(self):
+        return {
+            'capacity': self.capacity,
+            'entries': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
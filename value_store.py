@@ -0,0 +1,167 @@
+"""Binary on-disk store of solved or learned state values, read through ``mmap``.
+
+File layout, all little endian:
+
+* a 32 byte header: magic ``TTTV``, format version, rows, cols, connections to win, key kind, flags (bit 0 set
+  for gravity boards), record count and the CRC32 of the two blocks below,
+* the record keys as sorted unsigned 64-bit integers,
+* the record values as 64-bit floats, in the same order.
+
+Lookups binary-search the key block in place, so opening a store costs no more than reading its header.
+"""
+
+from bisect import bisect_left
+from itertools import islice
+import mmap
+import struct
+import zlib
+
+MAGIC = b'TTTV'
+FORMAT_VERSION = 1
+KEY_ZOBRIST = 0  # Board.zobrist_key()
+KEY_CANONICAL = 1  # board.canonical_key()
+KEY_BASE3 = 2  # base-3 encoding of the cells, as used by TDLearningPlayer
+KEY_CANONICAL_BASE3 = 3  # smallest base-3 encoding among the symmetric images of the board
+KEY_BOOK = 4  # Board.zobrist_key(), values packed by solver.encode_book_value()
+KEY_KINDS = (KEY_ZOBRIST, KEY_CANONICAL, KEY_BASE3, KEY_CANONICAL_BASE3, KEY_BOOK)
+FLAG_GRAVITY = 1
+
+_HEADER = struct.Struct('<4sHHHHHHQI4x')
+
+
+def write_store(path, items, *, rows, cols, connections_to_win, key_kind, gravity=False):
+    """Write ``(key, value)`` pairs to ``path``; later pairs win when a key is repeated."""
+    if key_kind not in KEY_KINDS:
+        raise ValueError(f"Unknown key kind {key_kind!r}")
+    records = dict(items)
+    keys = sorted(records)
+    key_bytes = struct.pack(f'<{len(keys)}Q', *keys)
+    value_bytes = struct.pack(f'<{len(keys)}d', *(records[key] for key in keys))
+    checksum = zlib.crc32(value_bytes, zlib.crc32(key_bytes))
+    with open(path, 'wb') as store_file:
+        store_file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, rows, cols, connections_to_win, key_kind,
+                                      FLAG_GRAVITY if gravity else 0, len(keys), checksum))
+        store_file.write(key_bytes)
+        store_file.write(value_bytes)
+
+
+def write_sorted_store(path, items, *, count, rows, cols, connections_to_win, key_kind, gravity=False,
+                       chunk_records=4096):
+    """Write ``count`` ``(key, value)`` pairs to ``path`` like :func:`write_store`, a chunk at a time.
+
+    ``items`` can be any iterable, e.g. a merge of sorted files, and must give unique keys in increasing order. Only
+    ``chunk_records`` pairs are held in memory at once.
+    """
+    if key_kind not in KEY_KINDS:
+        raise ValueError(f"Unknown key kind {key_kind!r}")
+    items = iter(items)
+    keys_at = _HEADER.size
+    values_at = keys_at + 8 * count
+    checksum = 0
+    written = 0
+    with open(path, 'wb+') as store_file:
+        while True:
+            chunk = list(islice(items, chunk_records))
+            if not chunk:
+                break
+            if written + len(chunk) > count:
+                raise ValueError(f"More than {count} records given")
+            key_bytes = struct.pack(f'<{len(chunk)}Q', *(key for key, _ in chunk))
+            checksum = zlib.crc32(key_bytes, checksum)
+            store_file.seek(keys_at + 8 * written)
+            store_file.write(key_bytes)
+            store_file.seek(values_at + 8 * written)
+            store_file.write(struct.pack(f'<{len(chunk)}d', *(value for _, value in chunk)))
+            written += len(chunk)
+        if written != count:
+            raise ValueError(f"Expected {count} records, got {written}")
+        # The checksum covers the key block, then the value block
+        store_file.seek(values_at)
+        while True:
+            value_bytes = store_file.read(8 * chunk_records)
+            if not value_bytes:
+                break
+            checksum = zlib.crc32(value_bytes, checksum)
+        store_file.seek(0)
+        store_file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, rows, cols, connections_to_win, key_kind,
+                                      FLAG_GRAVITY if gravity else 0, count, checksum))
+
+
+class ValueStore(object):
+    """Read-only view of a value store file.
+
+    The file is rejected with ``ValueError`` when it is not a store, has another format version, was written for
+    another board geometry, gravity mode or key kind, or (with ``verify``) fails its checksum.
+    """
+
+    def __init__(self, path, *, rows, cols, connections_to_win, key_kind, gravity=False, verify=True):
+        self.path = path
+        with open(path, 'rb') as store_file:
+            self._mmap = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open(rows, cols, connections_to_win, key_kind, gravity, verify)
+        except ValueError:
+            self.close()
+            raise
+
+    def _open(self, rows, cols, connections_to_win, key_kind, gravity, verify):
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"{self.path} is too short to be a value store")
+        (magic, version, stored_rows, stored_cols, stored_connections, stored_kind, flags, count,
+         checksum) = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a value store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has format version {version}, expected {FORMAT_VERSION}")
+        if (stored_rows, stored_cols, stored_connections) != (rows, cols, connections_to_win):
+            raise ValueError(f"{self.path} holds values for a {stored_rows}x{stored_cols} board with "
+                             f"{stored_connections} to win, not {rows}x{cols} with {connections_to_win}")
+        if bool(flags & FLAG_GRAVITY) != gravity:
+            raise ValueError(f"{self.path} holds values for a board {'with' if flags & FLAG_GRAVITY else 'without'} "
+                             f"gravity")
+        if stored_kind != key_kind:
+            raise ValueError(f"{self.path} uses key kind {stored_kind}, expected {key_kind}")
+        if len(self._mmap) != _HEADER.size + 16 * count:
+            raise ValueError(f"{self.path} is truncated or has trailing data")
+
+        data = memoryview(self._mmap)
+        key_block = data[_HEADER.size:_HEADER.size + 8 * count]
+        value_block = data[_HEADER.size + 8 * count:]
+        self._views = [data, key_block, value_block]
+        if verify and zlib.crc32(value_block, zlib.crc32(key_block)) != checksum:
+            raise ValueError(f"{self.path} failed its checksum")
+        # Casting reads the little-endian blocks in place, which assumes a little-endian machine
+        self._keys = key_block.cast('Q')
+        self._values = value_block.cast('d')
+        self._views += [self._keys, self._values]
+        self.rows, self.cols, self.connections_to_win, self.key_kind = rows, cols, connections_to_win, key_kind
+        self.gravity = gravity
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        index = bisect_left(self._keys, key)
+        return index < len(self._keys) and self._keys[index] == key
+
+    def get(self, key, default=None):
+        keys = self._keys
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            return self._values[index]
+        return default
+
+    def items(self):
+        return zip(self._keys, self._values)
+
+    def close(self):
+        for view in reversed(self.__dict__.pop('_views', [])):
+            view.release()
+        if not self._mmap.closed:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()